@@ -0,0 +1,8 @@
+"""Run the afluent command line with `python -m afluent`."""
+
+import sys
+
+from afluent import cli
+
+if __name__ == "__main__":
+    sys.exit(cli.main())
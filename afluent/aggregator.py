@@ -0,0 +1,224 @@
+"""Fold the coverage of finished test cases into per-line counters."""
+
+import queue
+import threading
+import time
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from afluent import coverage_matrix, line, spectrum_parser
+
+
+# pylint: disable=R0902
+class SpectrumAggregator:
+    """Aggregate the spectrum of a session while its test cases run.
+
+    Every finished test case is folded on a worker thread into the number of
+    passed, failed and skipped test cases covering each line, so only the
+    scores and ranking are left when the session ends. Names are only kept
+    for the failing test cases, which are the ones a ranking is explained by.
+    """
+
+    def __init__(
+        self,
+        snapshot_every: int = 0,
+        snapshot: Optional[Callable[["SpectrumAggregator", bool], None]] = None,
+        keep_failed_coverage=False,
+    ) -> None:
+        """Initialize an empty aggregator and start its worker thread.
+
+        Args:
+            snapshot_every (int): number of test cases folded between snapshots
+            once a test case failed, no snapshots are taken when it's 0
+            snapshot (Callable[[SpectrumAggregator, bool], None], optional):
+            function taking a snapshot of the aggregator on its worker thread,
+            the second argument tells if the session is finished
+            keep_failed_coverage (bool): keep the coverage of the failing test
+            cases so pack can send it, only pytest-xdist workers need it
+        """
+        # registry of the failing test cases only
+        self.matrix = coverage_matrix.CoverageMatrix()
+        # bitset row of failing test cases and coverage counts of every line
+        self.rows: Dict[str, Dict[int, Tuple[bytearray, List[int]]]] = {}
+        self.totals = {"passed": 0, "failed": 0, "skipped": 0}
+        # coverage of the failing test cases, sent by pytest-xdist workers
+        self.keep_failed_coverage = keep_failed_coverage
+        self.failed_coverage: Dict[str, Dict[str, List[int]]] = {}
+        # seconds the worker thread spent folding test cases
+        self.seconds = 0.0
+        self.snapshot_every = snapshot_every
+        self.snapshot = snapshot
+        # test cases folded since the last snapshot
+        self.pending_snapshot = 0
+        self.error: Optional[Exception] = None
+        self.queue: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self.thread = threading.Thread(
+            target=self.run, name="afluent-aggregator", daemon=True
+        )
+        self.thread.start()
+
+    def add(self, test_name: str, test_info: Dict[str, Any]) -> None:
+        """Queue a finished test case to be folded into the counters.
+
+        Args:
+            test_name (str): name of the test case
+            test_info (Dict[str, Any]): coverage and result of the test case
+        """
+        self.queue.put((self.fold, (test_name, test_info)))
+
+    def merge(self, packed: Dict[str, Any]) -> None:
+        """Queue the counters of another aggregator created by pack."""
+        self.queue.put((self.merge_packed, (packed,)))
+
+    def run(self) -> None:
+        """Fold queued test cases until the aggregator is closed."""
+        while True:
+            task: Optional[Tuple[Callable[..., None], Tuple[Any, ...]]]
+            task = self.queue.get()
+            if task is None:
+                return
+            function, args = task
+            start = time.perf_counter()
+            try:
+                function(*args)
+            except Exception as error:  # pylint: disable=W0703
+                # raised again on the main thread by close
+                if self.error is None:
+                    self.error = error
+            self.seconds += time.perf_counter() - start
+
+    def close(self) -> None:
+        """Wait until every queued test case is folded.
+
+        Raises:
+            Exception: when a test case couldn't be folded
+        """
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        if self.error is None and self.snapshot_every > 0 and self.totals["failed"]:
+            self.take_snapshot(finished=True)
+        if self.error is not None:
+            raise Exception(
+                f"ERROR: Unable to aggregate the spectrum: {self.error}"
+            ) from self.error
+
+    def entry(self, file_name: str, line_number: int) -> Tuple[bytearray, List[int]]:
+        """Return the row and counts of a line, creating them when needed."""
+        file_rows = self.rows.get(file_name)
+        if file_rows is None:
+            file_rows = self.rows[file_name] = {}
+        line_entry = file_rows.get(line_number)
+        if line_entry is None:
+            line_entry = file_rows[line_number] = (bytearray(), [0, 0, 0])
+        return line_entry
+
+    def cover_failed(self, test_name: str, coverage: Dict[str, List[int]]) -> None:
+        """Set the bit of a failing test case in the rows of the lines it covers."""
+        test_id = self.matrix.add_test(test_name, "failed")
+        if self.keep_failed_coverage:
+            self.failed_coverage[test_name] = coverage
+        byte_index = test_id >> 3
+        bit = 1 << (test_id & 7)
+        for file_name, lines_covered in coverage.items():
+            for line_number in lines_covered:
+                row = self.entry(file_name, line_number)[0]
+                if byte_index >= len(row):
+                    row.extend(bytes(byte_index - len(row) + 1))
+                row[byte_index] |= bit
+
+    def fold(self, test_name: str, test_info: Dict[str, Any]) -> None:
+        """Add the coverage of a finished test case to the counters."""
+        test_result = test_info["result"]
+        outcome = coverage_matrix.OUTCOMES[test_result]
+        self.totals[test_result] += 1
+        for file_name, lines_covered in test_info["coverage"].items():
+            for line_number in lines_covered:
+                self.entry(file_name, line_number)[1][outcome] += 1
+        if outcome == coverage_matrix.FAILED:
+            self.cover_failed(test_name, test_info["coverage"])
+        if self.snapshot_every > 0 and self.totals["failed"]:
+            # the first snapshot is taken as soon as a test case fails
+            self.pending_snapshot += 1
+            first_failure = (
+                outcome == coverage_matrix.FAILED and self.totals["failed"] == 1
+            )
+            if first_failure or self.pending_snapshot >= self.snapshot_every:
+                self.take_snapshot()
+
+    def take_snapshot(self, finished=False) -> None:
+        """Call the snapshot function and start counting test cases again."""
+        self.pending_snapshot = 0
+        if self.snapshot is not None:
+            self.snapshot(self, finished)
+
+    def top_lines(self, method: str, items_num: int, power=3) -> List[line.Line]:
+        """Rank the lines covered by failing test cases by their current scores.
+
+        Every other line has a score of 0 with all methods once test cases
+        passed and failed, so only these lines are scored then.
+
+        Args:
+            method (str): name of the suspiciousness score used for ranking
+            items_num (int): number of lines to return
+            power (int): power to use when calculating scores using dstar
+        """
+        candidates = []
+        cone_only = spectrum_parser.Spectrum.cone_ranks_equally(self.totals)
+        for file_name, file_rows in self.rows.items():
+            for line_number, (row, counts) in file_rows.items():
+                if cone_only and not counts[coverage_matrix.FAILED]:
+                    continue
+                line_obj = line.Line(file_name, line_number, self.matrix)
+                line_obj.row = row
+                line_obj.cover_counts = list(counts)
+                line_obj.sus_all(self.totals["passed"], self.totals["failed"], power)
+                candidates.append(line_obj)
+        return spectrum_parser.Spectrum.select_top(candidates, method, items_num)
+
+    def merge_packed(self, packed: Dict[str, Any]) -> None:
+        """Add the counters and failing test cases of a packed aggregator."""
+        for test_result, total in packed["totals"].items():
+            self.totals[test_result] += total
+        for file_name, values in packed["counts"]:
+            for position in range(0, len(values), 4):
+                counts = self.entry(file_name, values[position])[1]
+                for outcome in range(3):
+                    counts[outcome] += values[position + outcome + 1]
+        for test_name, coverage in packed["failed"]:
+            self.cover_failed(test_name, dict(coverage))
+
+    def pack(self) -> Dict[str, Any]:
+        """Return the counters as lists, strings and integers for pytest-xdist.
+
+        The aggregator has to be closed first, and created with
+        keep_failed_coverage to include the failing test cases.
+        """
+        counts = []
+        for file_name, file_rows in self.rows.items():
+            values = []
+            for line_number, (_, line_counts) in file_rows.items():
+                values.append(line_number)
+                values.extend(line_counts)
+            counts.append([file_name, values])
+        return {
+            "totals": dict(self.totals),
+            "counts": counts,
+            "failed": [
+                [
+                    test_name,
+                    [[file_name, list(lines)] for file_name, lines in coverage.items()],
+                ]
+                for test_name, coverage in self.failed_coverage.items()
+            ],
+        }
+
+    def spectrum(self, **spectrum_options) -> spectrum_parser.Spectrum:
+        """Create a spectrum from the counters, the aggregator has to be closed first.
+
+        Args:
+            spectrum_options: keyword arguments of the Spectrum initializer
+        """
+        return spectrum_parser.Spectrum.from_rows(
+            self.matrix, self.rows, self.totals, **spectrum_options
+        )
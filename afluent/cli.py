@@ -0,0 +1,130 @@
+"""Re-rank saved spectra from the command line without running the test suite."""
+
+import argparse
+import os
+
+from typing import List, Optional
+
+from afluent import main as plugin
+from afluent import spectrum_io, spectrum_parser, tiebreak_cache
+
+
+def create_parser() -> argparse.ArgumentParser:
+    """Create the parser of the afluent command line arguments."""
+    parser = argparse.ArgumentParser(
+        prog="afluent",
+        description="Localize faults using a spectrum saved by a previous "
+        + "AFLuent session without running the tests again.",
+    )
+    parser.add_argument(
+        "spectrum",
+        help="Binary spectrum file, per-test json report, or line-delimited log.",
+    )
+    for method in spectrum_parser.METHOD_NAMES:
+        parser.add_argument(
+            f"--{method}",
+            dest="methods",
+            action="append_const",
+            const=method,
+            help=f"Enable fault localization using {method.capitalize()}",
+        )
+    parser.add_argument(
+        "--dstar-pow",
+        default=3,
+        type=int,
+        help="Power to use when calculating Dstar score, default to 3",
+    )
+    parser.add_argument(
+        "--results",
+        default=20,
+        type=int,
+        help="Number of results to display in the score report, default to 20",
+    )
+    parser.add_argument(
+        "--tiebreaker",
+        default="random",
+        type=plugin.parse_tiebreakers,
+        help="Type of tie breaking approach, a comma separated list applies "
+        + "every tiebreaker only to the ties left by the previous ones.",
+    )
+    parser.add_argument(
+        "--report",
+        default=None,
+        choices=["json", "csv", "sqlite", "eval"],
+        help="Store report after the analysis.",
+    )
+    parser.add_argument(
+        "--eval-combined",
+        action="store_true",
+        help="Store every eval report combination as columns of a single file.",
+    )
+    parser.add_argument(
+        "--prune",
+        action="store_true",
+        help="Only rank the lines covered by a failing test case.",
+    )
+    parser.add_argument(
+        "--save",
+        default=None,
+        help="Store the spectrum in a compact binary file.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=os.environ.get("AFLUENT_CACHE_DIR"),
+        help="Directory to keep tiebreaker datasets in between sessions, "
+        + "defaults to $AFLUENT_CACHE_DIR.",
+    )
+    parser.add_argument(
+        "--cache-size",
+        default=64,
+        type=int,
+        help="Size limit of the tiebreaker cache in megabytes, 0 disables it, default to 64",
+    )
+    parser.add_argument(
+        "--workers",
+        default=1,
+        type=int,
+        help="Number of processes used to calculate tiebreakers, 0 uses all CPUs, default to 1",
+    )
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Load a saved spectrum, print its ranking and store the requested reports.
+
+    Args:
+        argv (List[str], optional): command line arguments, defaults to the
+        arguments of the process
+
+    Returns:
+        int: exit status of the command
+    """
+    args = create_parser().parse_args(argv)
+    methods = args.methods or ["dstar", "tarantula", "ochiai", "ochiai2"]
+    cache = None
+    if args.cache_dir and args.cache_size > 0:
+        cache = tiebreak_cache.TiebreakCache(
+            args.cache_dir, max_size=args.cache_size * 1024 * 1024
+        )
+    spectrum_obj = spectrum_io.load_spectrum(
+        args.spectrum,
+        dstar_pow=args.dstar_pow,
+        tiebreaker=args.tiebreaker,
+        eval_mode=args.report == "eval",
+        cache=cache,
+        workers=args.workers if args.workers > 0 else os.cpu_count() or 1,
+        lazy_tiebreak=True,
+        prune=args.prune,
+    )
+    # reports list every line, so every tie has to be settled
+    spectrum_obj.print_report(methods, args.results, full_ranking=bool(args.report))
+    if args.report:
+        print(f"Storing {args.report} report...")
+        spectrum_obj.store_report(args.report, combined_eval=args.eval_combined)
+    if args.save:
+        if args.prune:
+            # lines left out by pruning can't be ranked again from the file
+            spectrum_obj = spectrum_io.load_spectrum(args.spectrum, lazy_tiebreak=True)
+        print(f"Storing spectrum in {args.save}...")
+        spectrum_io.write_binary_spectrum(args.save, spectrum_obj)
+    return 0
@@ -0,0 +1,322 @@
+"""Measure the lines covered by every test case using interchangeable backends."""
+
+import fnmatch
+import os
+import sys
+import sysconfig
+import threading
+import time
+
+from typing import Any, Dict, List, Optional, Set
+
+import coverage  # type: ignore[import]
+
+from afluent import timing
+
+COVERAGE = "coverage"
+CONTEXTS = "contexts"
+MONITORING = "monitoring"
+COLLECTORS = [COVERAGE, CONTEXTS, MONITORING]
+
+
+class CoverageCollector:
+    """Measure every test case in its own coverage session, tracing lines only."""
+
+    name = COVERAGE
+    # the coverage of a test case is only complete once finish is called
+    deferred = False
+
+    def __init__(self, ignore: Optional[List[str]] = None) -> None:
+        """Initialize a collector object.
+
+        Args:
+            ignore (List[str], optional): file patterns to leave out of the
+            measurement
+        """
+        self.cov = coverage.Coverage(
+            data_file=None,
+            auto_data=False,
+            branch=False,
+            config_file=False,
+            omit=ignore,
+        )
+        # time spent starting and stopping the measurement, added up without
+        # calling any function that the measurement would trace
+        self.start_seconds = 0.0
+        self.stop_seconds = 0.0
+        # time spent extracting covered lines once the measurement is stopped
+        self.timer = timing.PhaseTimer()
+
+    def start_test(self, item_key: str) -> None:  # pylint: disable=W0613
+        """Start measuring the coverage of a test case."""
+        start = time.perf_counter()
+        self.cov.start()
+        self.start_seconds += time.perf_counter() - start
+
+    def stop_test(self, item_key: str) -> Dict[str, List[int]]:  # pylint: disable=W0613
+        """Stop measuring and return the lines covered by the test case."""
+        try:
+            start = time.perf_counter()
+            self.cov.stop()
+            self.stop_seconds += time.perf_counter() - start
+            with self.timer.phase("extract"):
+                coverage_data = self.cov.get_data()
+                return {
+                    measured_file: coverage_data.lines(measured_file) or []
+                    for measured_file in coverage_data.measured_files()
+                }
+        finally:
+            self.cov.erase()
+
+    def finish(self, session_spectrum: Dict[str, Any]) -> None:
+        """Complete the coverage of the test cases once the session ends."""
+
+    def ignore_thread(self, thread_id: int) -> None:
+        """Leave a thread of AFLuent out of the measurement.
+
+        Coverage only traces the threads started while it measures, so the
+        threads started by AFLuent before the test cases are never measured.
+        """
+
+    def overhead(self) -> Dict[str, float]:
+        """Return the seconds spent starting, stopping and extracting coverage."""
+        return {
+            "start": self.start_seconds,
+            "stop": self.stop_seconds,
+            "extract": self.timer.totals.get("extract", 0.0),
+        }
+
+    def tracer(self) -> str:
+        """Return the name of the tracer measuring the test cases."""
+        info = dict(self.cov.sys_info())
+        # coverage 7.4 renamed the tracer entry to core
+        return info.get("core") or info.get("tracer") or "-none-"
+
+    def describe(self) -> str:
+        """Return the name of the collector and of its tracer."""
+        return f"{self.name} ({self.tracer()})"
+
+
+class ContextCollector(CoverageCollector):
+    """Keep one coverage session running with a dynamic context per test case."""
+
+    name = CONTEXTS
+    deferred = True
+
+    def __init__(self, ignore: Optional[List[str]] = None) -> None:
+        """Initialize a collector object.
+
+        Args:
+            ignore (List[str], optional): file patterns to leave out of the
+            measurement
+        """
+        super().__init__(ignore)
+        self.started = False
+
+    def start_test(self, item_key: str) -> None:
+        """Record the coverage of a test case under its own dynamic context."""
+        start = time.perf_counter()
+        if not self.started:
+            self.cov.start()
+            self.started = True
+        self.cov.switch_context(item_key)
+        self.start_seconds += time.perf_counter() - start
+
+    def stop_test(self, item_key: str) -> Dict[str, List[int]]:
+        """Leave the context of the test case, lines are extracted by finish."""
+        start = time.perf_counter()
+        # code running between test cases isn't part of any test case
+        self.cov.switch_context("")
+        self.stop_seconds += time.perf_counter() - start
+        return {}
+
+    def finish(self, session_spectrum: Dict[str, Any]) -> None:
+        """Extract the covered lines of every test case from the coverage session."""
+        if not self.started:
+            return
+        start = time.perf_counter()
+        self.cov.stop()
+        self.stop_seconds += time.perf_counter() - start
+        self.started = False
+        with self.timer.phase("extract"):
+            coverage_data = self.cov.get_data()
+            for measured_file in coverage_data.measured_files():
+                contexts_by_lineno = coverage_data.contexts_by_lineno(measured_file)
+                for line_number, contexts in contexts_by_lineno.items():
+                    for context in contexts:
+                        test_info = session_spectrum.get(context)
+                        if test_info is None:
+                            continue
+                        test_info["coverage"].setdefault(measured_file, []).append(
+                            line_number
+                        )
+        self.cov.erase()
+
+
+# pylint: disable=R0902
+class MonitoringCollector:
+    """Measure covered lines with sys.monitoring, available on Python 3.12+.
+
+    Every line location is disabled after its first hit in a test case, and
+    code objects outside of the measured files never get line events.
+    """
+
+    name = MONITORING
+    deferred = False
+
+    def __init__(self, ignore: Optional[List[str]] = None) -> None:
+        """Initialize a collector object.
+
+        Args:
+            ignore (List[str], optional): file patterns to leave out of the
+            measurement
+
+        Raises:
+            Exception: when sys.monitoring isn't available or its coverage tool
+            id is already used
+        """
+        if not hasattr(sys, "monitoring"):
+            raise Exception("ERROR: sys.monitoring requires Python 3.12 or newer")
+        self.monitoring: Any = getattr(sys, "monitoring")
+        self.tool_id = self.monitoring.COVERAGE_ID
+        if self.monitoring.get_tool(self.tool_id) is not None:
+            raise Exception(
+                "ERROR: sys.monitoring coverage tool is used by "
+                + self.monitoring.get_tool(self.tool_id)
+            )
+        # relative patterns match from the current directory like coverage omit
+        self.ignore = [
+            pattern
+            if pattern.startswith("*") or os.path.isabs(pattern)
+            else os.path.join(os.getcwd(), pattern)
+            for pattern in ignore or []
+        ]
+        # installed packages and the standard library are left out like coverage
+        library_paths = {
+            sysconfig.get_path(name)
+            for name in ("stdlib", "platstdlib", "purelib", "platlib")
+        }
+        self.excluded_dirs = tuple(
+            os.path.join(path, "") for path in library_paths if path
+        )
+        self.decisions: Dict[str, Optional[str]] = {}
+        self.measured: Dict[str, Set[int]] = {}
+        # line events are sent for every thread, AFLuent's own are skipped
+        self.ignored_threads: Set[int] = set()
+        self.active = False
+        # time spent starting and stopping the measurement, added up without
+        # calling any function that the measurement would trace
+        self.start_seconds = 0.0
+        self.stop_seconds = 0.0
+        # time spent extracting covered lines once the measurement is stopped
+        self.timer = timing.PhaseTimer()
+        self.monitoring.use_tool_id(self.tool_id, "afluent")
+        self.monitoring.register_callback(
+            self.tool_id, self.monitoring.events.PY_START, self.on_start
+        )
+        self.monitoring.register_callback(
+            self.tool_id, self.monitoring.events.LINE, self.on_line
+        )
+
+    def measured_path(self, file_name: str) -> Optional[str]:
+        """Return the absolute path of a file to measure or None to skip it."""
+        if file_name in self.decisions:
+            return self.decisions[file_name]
+        path: Optional[str] = None
+        if not file_name.startswith("<"):
+            path = os.path.abspath(file_name)
+            if path.startswith(self.excluded_dirs) or any(
+                fnmatch.fnmatch(path, pattern) for pattern in self.ignore
+            ):
+                path = None
+        self.decisions[file_name] = path
+        return path
+
+    def on_start(self, code, instruction_offset):  # pylint: disable=W0613
+        """Enable line events for code objects of measured files."""
+        if self.active and self.measured_path(code.co_filename) is not None:
+            self.monitoring.set_local_events(
+                self.tool_id, code, self.monitoring.events.LINE
+            )
+        return self.monitoring.DISABLE
+
+    def on_line(self, code, line_number):
+        """Record the first hit of a line and disable its location."""
+        if self.active:
+            if threading.get_ident() in self.ignored_threads:
+                # the location stays enabled for the thread of the test case
+                return None
+            path = self.measured_path(code.co_filename)
+            if path is not None:
+                self.measured.setdefault(path, set()).add(line_number)
+        return self.monitoring.DISABLE
+
+    def ignore_thread(self, thread_id: int) -> None:
+        """Leave a thread of AFLuent out of the measurement."""
+        self.ignored_threads.add(thread_id)
+
+    def start_test(self, item_key: str) -> None:  # pylint: disable=W0613
+        """Start measuring the coverage of a test case."""
+        start = time.perf_counter()
+        self.measured = {}
+        self.active = True
+        # locations disabled during the previous test case have to fire again
+        self.monitoring.restart_events()
+        self.monitoring.set_events(self.tool_id, self.monitoring.events.PY_START)
+        self.start_seconds += time.perf_counter() - start
+
+    def stop_test(self, item_key: str) -> Dict[str, List[int]]:  # pylint: disable=W0613
+        """Stop measuring and return the lines covered by the test case."""
+        start = time.perf_counter()
+        self.monitoring.set_events(self.tool_id, 0)
+        self.active = False
+        self.stop_seconds += time.perf_counter() - start
+        with self.timer.phase("extract"):
+            return {path: sorted(lines) for path, lines in self.measured.items()}
+
+    def finish(self, session_spectrum: Dict[str, Any]) -> None:  # pylint: disable=W0613
+        """Release the sys.monitoring tool id once the session ends."""
+        self.monitoring.set_events(self.tool_id, 0)
+        self.monitoring.register_callback(
+            self.tool_id, self.monitoring.events.PY_START, None
+        )
+        self.monitoring.register_callback(
+            self.tool_id, self.monitoring.events.LINE, None
+        )
+        self.monitoring.free_tool_id(self.tool_id)
+
+    def overhead(self) -> Dict[str, float]:
+        """Return the seconds spent starting, stopping and extracting coverage."""
+        return {
+            "start": self.start_seconds,
+            "stop": self.stop_seconds,
+            "extract": self.timer.totals.get("extract", 0.0),
+        }
+
+    def tracer(self) -> str:
+        """Return the name of the tracer measuring the test cases."""
+        return "sys.monitoring"
+
+    def describe(self) -> str:
+        """Return the name of the collector and of its tracer."""
+        return f"{self.name} ({self.tracer()})"
+
+
+def create_collector(name: str, ignore: Optional[List[str]] = None):
+    """Create a line collector by its name.
+
+    Args:
+        name (str): one of `coverage`, `contexts` or `monitoring`
+        ignore (List[str], optional): file patterns to leave out of the
+        measurement
+
+    Raises:
+        Exception: when the name of the collector is unknown
+    """
+    if name == COVERAGE:
+        return CoverageCollector(ignore)
+    if name == CONTEXTS:
+        return ContextCollector(ignore)
+    if name == MONITORING:
+        return MonitoringCollector(ignore)
+    raise Exception(f"Error:Unknown collector {name}.")
@@ -0,0 +1,89 @@
+"""Store test case names and outcomes behind compact integer identifiers."""
+
+from typing import Dict, Iterator, List
+
+# Outcome codes
+PASSED = 0
+FAILED = 1
+SKIPPED = 2
+
+OUTCOMES = {"passed": PASSED, "failed": FAILED, "skipped": SKIPPED}
+OUTCOME_NAMES = ["passed", "failed", "skipped"]
+
+
+class CoverageMatrix:
+    """Register test cases once and hand out integer ids for coverage rows."""
+
+    def __init__(self) -> None:
+        """Initialize an empty test case registry."""
+        self.names: List[str] = []
+        self.ids: Dict[str, int] = {}
+        self.outcomes = bytearray()
+
+    @classmethod
+    def from_tests(cls, names: List[str], outcomes: bytearray) -> "CoverageMatrix":
+        """Create a registry from test case names and outcome codes ordered by id.
+
+        Args:
+            names (List[str]): names of the test cases
+            outcomes (bytearray): outcome code of every test case
+        """
+        matrix = cls()
+        matrix.names = list(names)
+        matrix.ids = {name: test_id for test_id, name in enumerate(matrix.names)}
+        matrix.outcomes = bytearray(outcomes)
+        return matrix
+
+    def __len__(self) -> int:
+        """Return the number of registered test cases."""
+        return len(self.names)
+
+    def add_test(self, test_case_name: str, test_result: str) -> int:
+        """Register a test case and return its integer id.
+
+        Args:
+            test_case_name (str): name of the test case
+            test_result (str): one of three possible values `passed` `failed` or `skipped`
+
+        Raises:
+            Exception: when a result is not one of the three possible values
+
+        Returns:
+            int: id of the test case, the same name always gets the same id
+        """
+        if test_result not in OUTCOMES:
+            raise Exception(f"Unknown test result for {test_case_name}")
+        test_id = self.ids.get(test_case_name)
+        if test_id is None:
+            test_id = len(self.names)
+            self.ids[test_case_name] = test_id
+            self.names.append(test_case_name)
+            self.outcomes.append(OUTCOMES[test_result])
+        return test_id
+
+    def outcome(self, test_id: int) -> int:
+        """Return the outcome code of a registered test case."""
+        return self.outcomes[test_id]
+
+    def iter_ids(self, row: bytearray) -> Iterator[int]:
+        """Yield the ids of every test case set in a bitset row, in order."""
+        for byte_index, byte in enumerate(row):
+            if not byte:
+                continue
+            base = byte_index << 3
+            for bit in range(8):
+                if byte & (1 << bit):
+                    yield base + bit
+
+    def names_for(self, row: bytearray, outcome: int) -> List[str]:
+        """Return the names of test cases in a row that have the given outcome.
+
+        Args:
+            row (bytearray): bitset of test case ids covering a line
+            outcome (int): one of the outcome codes `PASSED` `FAILED` `SKIPPED`
+        """
+        return [
+            self.names[test_id]
+            for test_id in self.iter_ids(row)
+            if self.outcomes[test_id] == outcome
+        ]
@@ -1,7 +1,9 @@
 """Create object oriented structure to keep track of line information."""
 
 import math
-from typing import List
+from typing import List, Optional
+
+from afluent import coverage_matrix
 
 # Scores:
 TARAN = "tarantula"
@@ -21,18 +23,39 @@ ENHANCED = "enhanced"
 class Line:
     """Implement the line object and suspiciousness calculation."""
 
-    def __init__(self, file_path: str, line_num: int) -> None:
+    __slots__ = (
+        "path",
+        "number",
+        "matrix",
+        "row",
+        "cover_counts",
+        "sus_scores",
+        "tiebreakers",
+    )
+
+    def __init__(
+        self,
+        file_path: str,
+        line_num: int,
+        matrix: Optional[coverage_matrix.CoverageMatrix] = None,
+    ) -> None:
         """Initialize a line object.
 
         Args:
             file_path (str): Path to the file where the line exists
             line_num (int): number of the line in the file
+            matrix (CoverageMatrix, optional): registry of the test cases
+            covering the line, shared by all lines of a spectrum
         """
         self.path = file_path
         self.number = line_num
-        self.passed_by: List[str] = []
-        self.failed_by: List[str] = []
-        self.skipped_by: List[str] = []
+        if matrix is None:
+            matrix = coverage_matrix.CoverageMatrix()
+        self.matrix = matrix
+        # bitset of the ids of the test cases covering this line
+        self.row = bytearray()
+        # number of passed, failed, and skipped test cases covering this line
+        self.cover_counts = [0, 0, 0]
         self.sus_scores = {
             TARAN: -1.0,
             OCHIAI: -1.0,
@@ -47,31 +70,100 @@ class Line:
             RANDOM: 0.0,
         }
 
+    @property
+    def passed_by(self) -> List[str]:
+        """Return the names of passed test cases covering the line."""
+        return self.matrix.names_for(self.row, coverage_matrix.PASSED)
+
+    @passed_by.setter
+    def passed_by(self, test_names: List[str]) -> None:
+        self.set_covered_by(test_names, "passed")
+
+    @property
+    def failed_by(self) -> List[str]:
+        """Return the names of failed test cases covering the line."""
+        return self.matrix.names_for(self.row, coverage_matrix.FAILED)
+
+    @failed_by.setter
+    def failed_by(self, test_names: List[str]) -> None:
+        self.set_covered_by(test_names, "failed")
+
+    @property
+    def skipped_by(self) -> List[str]:
+        """Return the names of skipped test cases covering the line."""
+        return self.matrix.names_for(self.row, coverage_matrix.SKIPPED)
+
+    @skipped_by.setter
+    def skipped_by(self, test_names: List[str]) -> None:
+        self.set_covered_by(test_names, "skipped")
+
+    def cover(self, test_id: int) -> None:
+        """Mark the line as covered by a registered test case.
+
+        Args:
+            test_id (int): id of the test case in the line's matrix
+        """
+        byte_index = test_id >> 3
+        bit = 1 << (test_id & 7)
+        row = self.row
+        if byte_index >= len(row):
+            row.extend(bytes(byte_index - len(row) + 1))
+        elif row[byte_index] & bit:
+            return
+        row[byte_index] |= bit
+        self.cover_counts[self.matrix.outcome(test_id)] += 1
+
+    def set_covered_by(self, test_names: List[str], test_result: str) -> None:
+        """Replace the test cases of one result that cover the line.
+
+        Args:
+            test_names (List[str]): names of the test cases covering the line
+            test_result (str): one of three possible values `passed` `failed` or `skipped`
+        """
+        outcome = coverage_matrix.OUTCOMES[test_result]
+        for test_id in list(self.matrix.iter_ids(self.row)):
+            if self.matrix.outcome(test_id) == outcome:
+                self.row[test_id >> 3] &= ~(1 << (test_id & 7)) & 0xFF
+        self.cover_counts[outcome] = 0
+        for test_name in test_names:
+            self.cover(self.matrix.add_test(test_name, test_result))
+
+    @property
+    def passed_cover(self) -> int:
+        """Return the number of passed test cases covering the line."""
+        return self.cover_counts[coverage_matrix.PASSED]
+
+    @property
+    def failed_cover(self) -> int:
+        """Return the number of failed test cases covering the line."""
+        return self.cover_counts[coverage_matrix.FAILED]
+
     def sus(self, method: str, passed_total: int, failed_total: int, power=3):
         """Calculate the suspiciousness score using the passed method.
 
         Args:
             method (str): name of the method to use
         """
-        if method.lower() == TARAN:
+        method = method.lower()
+        if method == TARAN:
             self.sus_scores[TARAN] = Line.tarantula(
-                len(self.failed_by),
-                len(self.passed_by),
+                self.failed_cover,
+                self.passed_cover,
                 passed_total,
                 failed_total,
             )
-        elif method.lower() == OCHIAI:
+        elif method == OCHIAI:
             self.sus_scores[OCHIAI] = Line.ochiai(
-                len(self.failed_by), len(self.passed_by), failed_total
+                self.failed_cover, self.passed_cover, failed_total
             )
-        elif method.lower() == DSTAR:
+        elif method == DSTAR:
             self.sus_scores[DSTAR] = Line.dstar(
-                len(self.failed_by), len(self.passed_by), failed_total, power
+                self.failed_cover, self.passed_cover, failed_total, power
             )
-        elif method.lower() == OCHIAI2:
+        elif method == OCHIAI2:
             self.sus_scores[OCHIAI2] = Line.ochiai2(
-                len(self.failed_by),
-                len(self.passed_by),
+                self.failed_cover,
+                self.passed_cover,
                 passed_total,
                 failed_total,
             )
@@ -87,7 +179,17 @@ class Line:
 
     def as_dict(self):
         """Return line information as json writable dictionary."""
-        return self.__dict__
+        return {
+            "path": self.path,
+            "number": self.number,
+            "passed_by": self.passed_by,
+            "failed_by": self.failed_by,
+            "skipped_by": self.skipped_by,
+            # the names may only be kept for the failing test cases
+            "cover_counts": dict(zip(coverage_matrix.OUTCOME_NAMES, self.cover_counts)),
+            "sus_scores": self.sus_scores,
+            "tiebreakers": self.tiebreakers,
+        }
 
     def as_csv(self):
         """Return line information as csv writable list."""
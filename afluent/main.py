@@ -1,13 +1,26 @@
 """Define Pytest Hooks that run AFLuent."""
 
+import argparse
 import json
+import os
+import sys
+import tracemalloc
 
 from time import time
 import coverage  # type: ignore[import]
 import pytest  # type: ignore[import]
 from console import bg, fg, fx  # type: ignore[import]
 
-from afluent import spectrum_parser
+from afluent import (
+    aggregator,
+    collectors,
+    report_writer,
+    reuse_cache,
+    spectrum_io,
+    spectrum_parser,
+    tiebreak_cache,
+    timing,
+)
 
 
 WARNING = fx.bold + fg.white + bg.orange
@@ -15,6 +28,32 @@ ERROR = fx.bold + fg.white + bg.red
 VALID = fx.bold + fg.white + bg.green
 
 CONFLICTING_PLUGINS = ["pytest_cov"]
+# key of the packed spectrum sent from pytest-xdist workers to the controller
+WORKER_OUTPUT_KEY = "afluent_spectrum"
+# key of the per-line counters aggregated by a pytest-xdist worker
+WORKER_AGGREGATE_KEY = "afluent_aggregate"
+# key of the node ids of the test cases ran or reused by a pytest-xdist worker
+WORKER_NODES_KEY = "afluent_nodes"
+# key of the coverage overhead measured by a pytest-xdist worker
+WORKER_TIMINGS_KEY = "afluent_timings"
+# snapshot of the top lines written during the session by --afl-live
+LIVE_FILE = "afluent_live.json"
+# number of test cases with the highest coverage overhead in the timings
+SLOWEST_TESTS = 10
+TIEBREAKERS = ["random", "cyclomatic", "logical", "enhanced"]
+
+
+def parse_tiebreakers(value):
+    """Split a comma separated cascade of tiebreakers and validate the names."""
+    tiebreakers = [name.strip() for name in value.split(",") if name.strip()]
+    if not tiebreakers:
+        raise argparse.ArgumentTypeError("no tiebreaker given")
+    for name in tiebreakers:
+        if name not in TIEBREAKERS:
+            raise argparse.ArgumentTypeError(
+                f"invalid choice: '{name}' (choose from {', '.join(TIEBREAKERS)})"
+            )
+    return tiebreakers
 
 
 def pytest_addoption(parser):
@@ -86,9 +125,16 @@ def pytest_addoption(parser):
         action="store",
         default=None,
         type=str,
-        choices=["json", "csv", "eval"],
+        choices=["json", "csv", "sqlite", "eval"],
         help="Store report after AFLuent run.",
     )
+    afluent_group.addoption(
+        "--afl-eval-combined",
+        dest="afl_eval_combined",
+        action="store_true",
+        default=False,
+        help="Store every eval report combination as columns of a single file.",
+    )
     afluent_group.addoption(
         "--per-test-report",
         dest="per_test",
@@ -100,9 +146,126 @@ def pytest_addoption(parser):
         dest="tiebreaker",
         action="store",
         default="random",
+        type=parse_tiebreakers,
+        help="Type of tie breaking approach, a comma separated list applies "
+        + "every tiebreaker only to the ties left by the previous ones.",
+    )
+    afluent_group.addoption(
+        "--afl-cache-dir",
+        dest="afl_cache_dir",
+        action="store",
+        default=os.environ.get("AFLUENT_CACHE_DIR"),
         type=str,
-        choices=["random", "cyclomatic", "logical", "enhanced"],
-        help="Type of tie breaking approach.",
+        help="Directory to keep tiebreaker datasets in between sessions, "
+        + "defaults to $AFLUENT_CACHE_DIR or the pytest cache directory.",
+    )
+    afluent_group.addoption(
+        "--afl-cache-size",
+        dest="afl_cache_size",
+        default=64,
+        action="store",
+        type=int,
+        help="Size limit of the tiebreaker cache in megabytes, 0 disables it, default to 64",
+    )
+    afluent_group.addoption(
+        "--afl-workers",
+        dest="afl_workers",
+        default=1,
+        action="store",
+        type=int,
+        help="Number of processes used to calculate tiebreakers, 0 uses all CPUs, default to 1",
+    )
+    afluent_group.addoption(
+        "--afl-spectrum-file",
+        dest="afl_spectrum_file",
+        action="store",
+        default=None,
+        type=str,
+        help="Store the spectrum of the session in a compact binary file.",
+    )
+    afluent_group.addoption(
+        "--afl-log",
+        dest="afl_log",
+        action="store",
+        default=None,
+        type=str,
+        help="Append the coverage and result of every test case to a "
+        + "line-delimited log as soon as it finishes.",
+    )
+    afluent_group.addoption(
+        "--afl-resume",
+        dest="afl_resume",
+        action="store_true",
+        default=False,
+        help="Keep the test cases recorded in the --afl-log file of an interrupted "
+        + "session and only run the remaining ones.",
+    )
+    afluent_group.addoption(
+        "--afl-collector",
+        dest="afl_collector",
+        action="store",
+        default=collectors.COVERAGE,
+        type=str,
+        choices=collectors.COLLECTORS,
+        help="Backend measuring the lines covered by each test case, default to coverage.",
+    )
+    afluent_group.addoption(
+        "--afl-contexts",
+        dest="afl_contexts",
+        action="store_true",
+        default=False,
+        help="Measure coverage in a single session with a dynamic context per test case.",
+    )
+    afluent_group.addoption(
+        "--afl-reuse",
+        dest="afl_reuse",
+        action="store_true",
+        default=False,
+        help="Reuse the coverage of the previous session and only run the test cases "
+        + "whose covered files changed and the ones that failed.",
+    )
+    afluent_group.addoption(
+        "--afl-memprofile",
+        dest="afl_memprofile",
+        action="store_true",
+        default=False,
+        help="Trace memory allocations and store the peak memory of every phase "
+        + "and the size of the spectrum in afluent_memory.json.",
+    )
+    afluent_group.addoption(
+        "--afl-incremental",
+        dest="afl_incremental",
+        action="store_true",
+        default=False,
+        help="Fold the coverage of every test case into per-line counters as soon "
+        + "as it finishes and only keep the names of failing test cases.",
+    )
+    afluent_group.addoption(
+        "--afl-prune",
+        dest="afl_prune",
+        action="store_true",
+        default=False,
+        help="Only rank the lines covered by a failing test case and count the "
+        + "others per file.",
+    )
+    afluent_group.addoption(
+        "--afl-live",
+        dest="afl_live",
+        action="store",
+        default=0,
+        type=int,
+        help="Store the current top lines in afluent_live.json every N test cases "
+        + "once a test case failed, implies --afl-incremental. With pytest-xdist "
+        + "every worker ranks its own test cases in afluent_live_<worker>.json.",
+    )
+    afluent_group.addoption(
+        "--afl-report-timeout",
+        dest="afl_report_timeout",
+        action="store",
+        default=300.0,
+        type=float,
+        help="Seconds to wait for the reports written in the background at the end "
+        + "of the session, default to 300.",
     )
 
 
@@ -142,6 +305,57 @@ def pytest_cmdline_main(config):
         print()
 
 
+def is_xdist_worker(config):
+    """Return True when the session runs inside a pytest-xdist worker."""
+    return hasattr(config, "workerinput")
+
+
+def get_cache_dir(config, name):
+    """Return a directory inside the pytest cache or None when it's disabled."""
+    cache = getattr(config, "cache", None)
+    if cache is None:
+        return None
+    # pytest 7 renamed makedir to mkdir
+    make_directory = getattr(cache, "mkdir", None) or cache.makedir
+    return str(make_directory(name))
+
+
+def get_tiebreak_cache(config):
+    """Create the tiebreaker dataset cache from the command line options."""
+    cache_size = config.getoption("afl_cache_size")
+    if cache_size <= 0:
+        return None
+    cache_dir = config.getoption("afl_cache_dir") or get_cache_dir(
+        config, "afluent_tiebreakers"
+    )
+    if not cache_dir:
+        return None
+    return tiebreak_cache.TiebreakCache(cache_dir, max_size=cache_size * 1024 * 1024)
+
+
+def get_reuse_cache(config):
+    """Create the cache of the spectrum reused between sessions."""
+    cache_dir = get_cache_dir(config, "afluent_reuse")
+    if not cache_dir:
+        return None
+    return reuse_cache.ReuseCache(cache_dir)
+
+
+def get_live_path(config):
+    """Return the path of the live snapshot, every pytest-xdist worker has its own."""
+    if is_xdist_worker(config):
+        return f"afluent_live_{config.workerinput['workerid']}.json"
+    return LIVE_FILE
+
+
+def get_last_failed(config):
+    """Return the node ids of the test cases that failed in the last session."""
+    cache = getattr(config, "cache", None)
+    if cache is None:
+        return set()
+    return set(cache.get("cache/lastfailed", {}))
+
+
 class Afluent:
     """Contain all the functionalities and hooks of the AFLuent plugin."""
 
@@ -157,40 +371,173 @@ class Afluent:
         self.ignore = pytest_config.getoption("afl_ignore")
         self.report = pytest_config.getoption("report_type")
         self.per_test = pytest_config.getoption("per_test")
+        self.prune = pytest_config.getoption("afl_prune")
+        self.report_timeout = pytest_config.getoption("afl_report_timeout")
+        self.eval_combined = pytest_config.getoption("afl_eval_combined")
         self.tiebreaker = pytest_config.getoption("tiebreaker")
+        self.workers = pytest_config.getoption("afl_workers")
+        if self.workers <= 0:
+            self.workers = os.cpu_count() or 1
         if self.report == "eval":
             self.eval_mode = True
         else:
             self.eval_mode = False
         self.session_spectrum = {}
-        self.cov = coverage.Coverage(
-            data_file=None,
-            auto_data=False,
-            branch=True,
-            config_file=False,
-            omit=self.ignore,
+        collector_name = pytest_config.getoption("afl_collector")
+        if pytest_config.getoption("afl_contexts"):
+            collector_name = collectors.CONTEXTS
+        if collector_name == collectors.MONITORING and not hasattr(sys, "monitoring"):
+            print(
+                WARNING(
+                    "\nThe monitoring collector requires Python 3.12 or newer, "
+                    + "using the coverage collector instead.\n"
+                )
+            )
+            collector_name = collectors.COVERAGE
+        self.collector = collectors.create_collector(collector_name, self.ignore)
+        self.spectrum_file = pytest_config.getoption("afl_spectrum_file")
+        self.log_path = pytest_config.getoption("afl_log")
+        self.resume = pytest_config.getoption("afl_resume") and bool(self.log_path)
+        self.log = self.create_log(pytest_config)
+        self.reuse = pytest_config.getoption("afl_reuse")
+        # node id and file of every test case ran, to store them for reuse
+        self.test_nodes = {}
+        # node ids of the test cases whose coverage is taken from the cache
+        self.reused_nodes = set()
+        self.live = max(0, pytest_config.getoption("afl_live"))
+        self.live_path = get_live_path(pytest_config)
+        incremental_option = None
+        if self.live > 0:
+            incremental_option = "--afl-live"
+        elif pytest_config.getoption("afl_incremental"):
+            incremental_option = "--afl-incremental"
+        self.aggregator = self.create_aggregator(
+            incremental_option, is_xdist_worker(pytest_config)
         )
+        self.memprofile = pytest_config.getoption("afl_memprofile")
+        if self.memprofile and not tracemalloc.is_tracing():
+            # started before the test cases run to include the collected spectrum
+            tracemalloc.start()
+        # time spent in every phase after the test cases ran
+        self.timer = timing.PhaseTimer(trace_memory=self.memprofile)
+        # memory of the phases of every pytest-xdist worker
+        self.worker_memory = []
+        # coverage overhead of every test case and of the pytest-xdist workers
+        self.test_overhead = {}
+        self.worker_overhead = timing.PhaseTimer()
+
+    def create_log(self, pytest_config):
+        """Prepare the log of the session when one is requested."""
+        if not self.log_path:
+            return None
+        # workers append to the log prepared by the controller
+        if not is_xdist_worker(pytest_config):
+            if self.resume:
+                spectrum_io.repair_log(self.log_path)
+            else:
+                spectrum_io.reset_log(self.log_path)
+        return spectrum_io.SpectrumLog(self.log_path)
+
+    def create_aggregator(self, option, worker=False):
+        """Create an aggregator when no option needs the coverage of every test case.
+
+        Args:
+            option (str, optional): command line option enabling the aggregator,
+            no aggregator is created when it's None
+            worker (bool): the session runs inside a pytest-xdist worker
+        """
+        if option is None:
+            return None
+        conflicts = [
+            option
+            for option, enabled in (
+                ("--per-test-report", self.per_test),
+                ("--afl-reuse", self.reuse),
+                ("--afl-log", self.log is not None),
+                ("the contexts collector", self.collector.deferred),
+            )
+            if enabled
+        ]
+        if conflicts:
+            print(
+                WARNING(
+                    f"\n{option} can't be used with {', '.join(conflicts)}, "
+                    + "keeping the coverage of every test case instead.\n"
+                )
+            )
+            return None
+        aggregator_object = aggregator.SpectrumAggregator(
+            snapshot_every=self.live,
+            snapshot=self.write_live_snapshot,
+            # the controller reassembles the failing test cases of every worker
+            keep_failed_coverage=worker,
+        )
+        # folding overlaps with the next test case
+        self.collector.ignore_thread(aggregator_object.thread.ident)
+        return aggregator_object
+
+    def write_live_snapshot(self, aggregator_object, finished):
+        """Store the top lines of the test cases folded so far."""
+        ranked_lines = aggregator_object.top_lines(
+            self.methods[0], self.results_num, self.dstar_pow
+        )
+        report_writer.write_json(
+            self.live_path,
+            {
+                "finished": finished,
+                "tests": dict(aggregator_object.totals),
+                "method": self.methods[0],
+                "ranking": [
+                    {
+                        "path": line_obj.path,
+                        "number": line_obj.number,
+                        "sus_scores": {
+                            method: line_obj.sus_scores[method]
+                            for method in self.methods
+                        },
+                        "failed_by": line_obj.failed_by,
+                    }
+                    for line_obj in ranked_lines
+                ],
+            },
+        )
+
+    def session_tests(self):
+        """Stream the test cases of the session, the logged ones from the log."""
+        yield from self.session_spectrum.items()
+        if self.log is not None:
+            yield from spectrum_io.read_log(self.log_path)
+
+    def create_spectrum(self, **spectrum_options):
+        """Create the spectrum of the session from the aggregated or per-test coverage."""
+        if self.aggregator is not None:
+            return self.aggregator.spectrum(**spectrum_options)
+        if self.log is not None:
+            # only one logged test case is held in memory at a time
+            return spectrum_parser.Spectrum.from_tests(
+                self.session_tests(), **spectrum_options
+            )
+        return spectrum_parser.Spectrum(self.session_spectrum, **spectrum_options)
 
     @pytest.hookimpl(hookwrapper=True)
     def pytest_pyfunc_call(self, pyfuncitem):
         """Calculate the coverage of each test case and add it to spectrum."""
+        item_key = f"{pyfuncitem.parent.name}_{pyfuncitem.name}"
+        if self.reuse:
+            self.test_nodes[item_key] = [pyfuncitem.nodeid, str(pyfuncitem.fspath)]
+        overhead = sum(self.collector.overhead().values())
         try:
-            self.cov.start()
+            self.collector.start_test(item_key)
             yield
-            self.cov.stop()
-            coverage_data = self.cov.get_data()
-            item_key = f"{pyfuncitem.parent.name}_{pyfuncitem.name}"
             self.session_spectrum[item_key] = {
-                "coverage": {},
+                "coverage": self.collector.stop_test(item_key),
                 "result": "notSet",
             }
-            for measured_file in coverage_data.measured_files():
-                self.session_spectrum[item_key]["coverage"][
-                    measured_file
-                ] = self.cov.get_data().lines(measured_file)
         except coverage.exceptions.CoverageWarning:
             pass
-        self.cov.erase()
+        self.test_overhead[item_key] = (
+            sum(self.collector.overhead().values()) - overhead
+        )
 
     @pytest.hookimpl(hookwrapper=True)
     def pytest_runtest_makereport(self, item):
@@ -199,20 +546,170 @@ class Afluent:
         item_key = f"{item.parent.name}_{item.name}"
         if outcome.get_result().when == "call" and item_key in self.session_spectrum:
             self.session_spectrum[item_key]["result"] = outcome.get_result().outcome
+            if self.aggregator is not None:
+                # folded on the worker thread, off the path of the next test case
+                self.aggregator.add(item_key, self.session_spectrum.pop(item_key))
+            elif self.log is not None and not self.collector.deferred:
+                # the log keeps the test case, it's streamed at the end
+                self.log.append(item_key, self.session_spectrum.pop(item_key))
+
+    def pytest_collection_modifyitems(self, session, config, items):
+        """Deselect the test cases recorded by the interrupted session or reused."""
+        # pylint: disable=W0613
+        recorded = set()
+        if self.resume and os.path.exists(self.log_path):
+            recorded = {
+                test_name for test_name, _ in spectrum_io.read_log(self.log_path)
+            }
+        reusable = {}
+        if self.reuse:
+            cache = get_reuse_cache(config)
+            if cache is not None:
+                reusable = cache.reusable(cache.load(), get_last_failed(config))
+        remaining = []
+        deselected = []
+        for item in items:
+            if f"{item.parent.name}_{item.name}" in recorded:
+                deselected.append(item)
+            elif item.nodeid in reusable:
+                self.reused_nodes.add(item.nodeid)
+                deselected.append(item)
+            else:
+                remaining.append(item)
+        if deselected:
+            config.hook.pytest_deselected(items=deselected)
+            items[:] = remaining
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node, error):  # pylint: disable=W0613
+        """Merge the spectrum collected by a pytest-xdist worker."""
+        packed = getattr(node, "workeroutput", {}).get(WORKER_OUTPUT_KEY)
+        if packed is not None:
+            spectrum_io.merge_spectrum(self.session_spectrum, packed)
+        counters = getattr(node, "workeroutput", {}).get(WORKER_AGGREGATE_KEY)
+        if counters is not None and self.aggregator is not None:
+            self.aggregator.merge(counters)
+        timings = getattr(node, "workeroutput", {}).get(WORKER_TIMINGS_KEY)
+        if timings is not None:
+            self.worker_overhead.merge(timings["overhead"])
+            self.test_overhead.update(timings["slowest"])
+            if timings.get("memory"):
+                self.worker_memory.append(timings["memory"])
+        nodes = getattr(node, "workeroutput", {}).get(WORKER_NODES_KEY)
+        if nodes is not None:
+            self.test_nodes.update(nodes["tests"])
+            self.reused_nodes.update(nodes["reused"])
+
+    def finish_collection(self):
+        """Complete the coverage of every test case and fold or log the last ones."""
+        self.collector.finish(self.session_spectrum)
+        if self.collector.tracer() == "PyTracer":
+            print(
+                WARNING(
+                    "\nCoverage is measured with the slow Python tracer, "
+                    + "install coverage with its C extension to reduce the overhead.\n"
+                )
+            )
+        if self.aggregator is not None:
+            for item_key in list(self.session_spectrum):
+                self.aggregator.add(item_key, self.session_spectrum.pop(item_key))
+            self.aggregator.close()
+            # spent while the test cases ran, apart from the last ones
+            self.timer.add("aggregate", self.aggregator.seconds)
+        if self.log is not None:
+            for item_key in list(self.session_spectrum):
+                self.log.append(item_key, self.session_spectrum.pop(item_key))
+            self.log.close()
+
+    def reuse_spectrum(self, config):
+        """Merge the reused test cases into the spectrum and store it for the next session."""
+        cache = get_reuse_cache(config)
+        if cache is None:
+            return
+        records = cache.load()
+        for nodeid in self.reused_nodes:
+            record = records.get(nodeid)
+            if record is None:
+                continue
+            self.session_spectrum.setdefault(
+                record["test"],
+                {"coverage": record["coverage"], "result": record["result"]},
+            )
+            self.test_nodes.setdefault(record["test"], [nodeid, record["source"]])
+        cache.store(
+            {
+                self.test_nodes[item_key][0]: {
+                    "test": item_key,
+                    "source": self.test_nodes[item_key][1],
+                    "result": test_info["result"],
+                    "coverage": test_info["coverage"],
+                }
+                for item_key, test_info in self.session_tests()
+                if item_key in self.test_nodes
+            },
+            # test cases left out of this session are kept for the next ones
+            records,
+        )
+
+    def save_spectrum(self, full_spectrum=None):
+        """Store the spectrum of the session in the compact binary format."""
+        if full_spectrum is None:
+            full_spectrum = self.create_spectrum(lazy_tiebreak=True, timer=self.timer)
+        print(f"Storing spectrum in {self.spectrum_file}...")
+        with self.timer.phase("spectrum_file"):
+            spectrum_io.write_binary_spectrum(self.spectrum_file, full_spectrum)
+
+    def slowest_tests(self):
+        """Return the test cases with the highest coverage overhead, slowest first."""
+        return sorted(
+            self.test_overhead.items(), key=lambda item: item[1], reverse=True
+        )[:SLOWEST_TESTS]
+
+    def coverage_timings(self):
+        """Return the coverage overhead of the session as a json writable dictionary."""
+        overhead = timing.PhaseTimer()
+        overhead.merge(self.collector.overhead())
+        overhead.merge(self.worker_overhead.totals)
+        return {
+            "collector": self.collector.name,
+            **overhead.as_dict(),
+            "slowest_tests": [
+                {"test": item_key, "seconds": round(seconds, 6)}
+                for item_key, seconds in self.slowest_tests()
+            ],
+        }
 
     def pytest_sessionfinish(self, session, exitstatus):
         """Perform the spectrum analysis if at least one test fails."""
         test_end_time = time()
+        # the peak since tracing started covers the test cases and their coverage
+        self.timer.mark("tests")
+        with self.timer.phase("finish_collection"):
+            self.finish_collection()
+        if is_xdist_worker(session.config):
+            self.send_worker_output(session.config.workeroutput)
+            return
         reporter = session.config.pluginmanager.get_plugin("terminalreporter")
         # pylint: disable=W0212
         test_time = round(test_end_time - reporter._sessionstarttime, 6)
         localization_time = 0
+        full_spectrum = None
+        # reports are written while the ranking is calculated and displayed,
+        # the allocations of a memory profile are only attributed without threads
+        writer = report_writer.ReportWriter(background=not self.memprofile)
+        if self.reuse:
+            with self.timer.phase("reuse"):
+                self.reuse_spectrum(session.config)
         # Store generated json
         if self.per_test:
-            with open(
-                "afluent_per_test_report.json", "w+", encoding="utf-8"
-            ) as outfile:
-                json.dump(self.session_spectrum, outfile, indent=4)
+            writer.submit("per-test report", self.write_per_test_report)
+        # failures may have been recorded before the session was interrupted
+        # and the test cases of a reused spectrum may not have run at all
+        if (self.resume or self.reused_nodes) and exitstatus in (0, 5):
+            if any(
+                test_info["result"] == "failed" for _, test_info in self.session_tests()
+            ):
+                exitstatus = 1
         # Tests passed, exit status is 0
         if exitstatus == 0:
             exit_message = VALID(
@@ -225,19 +722,149 @@ class Afluent:
                 "\n\nFailing tests detected. Diagnosing using AFLuent..."
             )
             print(f"{exit_message}")
+            print(f"Coverage collector: {self.collector.describe()}")
             start_time = time()
-            full_spectrum = spectrum_parser.Spectrum(
-                self.session_spectrum,
+            cache = None
+            if self.tiebreaker != ["random"] or self.eval_mode:
+                cache = get_tiebreak_cache(session.config)
+            full_spectrum = self.create_spectrum(
                 dstar_pow=self.dstar_pow,
                 tiebreaker=self.tiebreaker,
                 eval_mode=self.eval_mode,
+                cache=cache,
+                workers=self.workers,
+                lazy_tiebreak=True,
+                timer=self.timer,
+                prune=self.prune,
+            )
+            # reports list every line, so every tie has to be settled
+            full_ranking = bool(self.report)
+            full_spectrum.resolve_tiebreakers(
+                self.methods[0], -1 if full_ranking else self.results_num
             )
             end_time = time()
             localization_time = round(end_time - start_time, 6)
-            full_spectrum.print_report(self.methods, self.results_num)
             if self.report:
+                # the displayed table is the head of the ranking in the report
+                full_spectrum.rank_all_lines(self.methods[0])
                 print(f"Storing {self.report} report...")
-                full_spectrum.store_report(self.report)
-        timings = {"test_time": test_time, "localization_time": localization_time}
+                writer.submit(
+                    f"{self.report} report",
+                    full_spectrum.store_report,
+                    self.report,
+                    self.eval_combined,
+                )
+            full_spectrum.print_report(
+                self.methods, self.results_num, full_ranking=full_ranking
+            )
+        if self.spectrum_file:
+            # lines left out by pruning can't be ranked again from the file
+            self.save_spectrum(None if self.prune else full_spectrum)
+        unfinished = self.wait_for_reports(writer)
+        self.store_timings(test_time, localization_time, full_spectrum, unfinished)
+        if self.memprofile:
+            self.store_memory_profile(full_spectrum)
+
+    def write_per_test_report(self):
+        """Store the coverage and result of every test case in a json file."""
+        with self.timer.phase("per_test_report"):
+            report_writer.write_json_items(
+                "afluent_per_test_report.json", self.session_tests()
+            )
+
+    def wait_for_reports(self, writer):
+        """Wait for the reports written in the background and return the unfinished ones."""
+        unfinished = writer.wait(self.report_timeout)
+        if unfinished:
+            print(
+                WARNING(
+                    f"\nStopped waiting for the {', '.join(unfinished)} after "
+                    + f"{self.report_timeout} seconds, the previous files were kept.\n"
+                )
+            )
+        return unfinished
+
+    def send_worker_output(self, workeroutput):
+        """Send the spectrum and measurements of a pytest-xdist worker to the controller."""
+        # the controller analyzes the spectra of every worker together
+        workeroutput[WORKER_OUTPUT_KEY] = spectrum_io.pack_spectrum(
+            self.session_spectrum
+        )
+        workeroutput[WORKER_TIMINGS_KEY] = {
+            "overhead": self.collector.overhead(),
+            "slowest": dict(self.slowest_tests()),
+            "memory": self.timer.memory,
+        }
+        if self.aggregator is not None:
+            workeroutput[WORKER_AGGREGATE_KEY] = self.aggregator.pack()
+        if self.reuse:
+            workeroutput[WORKER_NODES_KEY] = {
+                "tests": self.test_nodes,
+                "reused": sorted(self.reused_nodes),
+            }
+
+    def store_timings(
+        self, test_time, localization_time, full_spectrum=None, unfinished=()
+    ):
+        """Store the time of the test cases and of every phase of the localization.
+
+        Args:
+            test_time (float): seconds taken by the test cases
+            localization_time (float): seconds taken by the localization
+            full_spectrum (Spectrum, optional): spectrum of the session
+            unfinished (Iterable[str]): reports still written when the session
+            stopped waiting, their phases are missing from the timings
+        """
+        timings = {
+            "test_time": test_time,
+            "localization_time": localization_time,
+            "coverage": self.coverage_timings(),
+            "phases": self.timer.as_dict(),
+            "unfinished_reports": list(unfinished),
+            "tiebreaker_files": {},
+        }
+        if full_spectrum is not None:
+            timings["tiebreaker_files"] = {
+                file_name: round(seconds, 6)
+                for file_name, seconds in sorted(
+                    full_spectrum.analysis_times.items(),
+                    key=lambda item: item[1],
+                    reverse=True,
+                )
+            }
         with open("afluent_timings.json", "w+", encoding="utf-8") as outfile:
             json.dump(timings, outfile, indent=4)
+
+    def store_memory_profile(self, full_spectrum=None):
+        """Store the peak memory of every phase and the size of the spectrum."""
+        seen = set()
+        sizes = {
+            "session_spectrum": {
+                "tests": len(self.session_spectrum),
+                "line_entries": sum(
+                    len(covered_lines)
+                    for test_info in self.session_spectrum.values()
+                    for covered_lines in test_info["coverage"].values()
+                ),
+                "bytes": timing.deep_size(self.session_spectrum, seen),
+            }
+        }
+        if self.aggregator is not None:
+            sizes["aggregate"] = {
+                "files": len(self.aggregator.rows),
+                "lines": sum(len(rows) for rows in self.aggregator.rows.values()),
+                "bytes": timing.deep_size(self.aggregator.rows, seen),
+            }
+        if full_spectrum is not None:
+            sizes.update(full_spectrum.memory_sizes())
+        profile = {
+            "peak_bytes": max(
+                (phase["peak_bytes"] for phase in self.timer.memory.values()),
+                default=0,
+            ),
+            "phases": self.timer.memory,
+            "sizes": sizes,
+            "workers": self.worker_memory,
+        }
+        with open("afluent_memory.json", "w+", encoding="utf-8") as outfile:
+            json.dump(profile, outfile, indent=4)
@@ -1,25 +1,34 @@
 """Create object oriented structure for files carrying line coverage information."""
-from typing import Dict
+from typing import Any, Dict, List, Optional
 
-from afluent import tiebreak_generator
+from afluent import tiebreak_cache, tiebreak_generator
 
-from afluent import line
+from afluent import coverage_matrix, line
 
 
 class ProjFile:
     """Store coverage information about python files under test."""
 
-    def __init__(self, name: str) -> None:
+    def __init__(
+        self, name: str, matrix: Optional[coverage_matrix.CoverageMatrix] = None
+    ) -> None:
         """Initialize a ProjFile object.
 
         Args:
             name (str): path of the file under test
+            matrix (CoverageMatrix, optional): registry of test cases shared by
+            all files of a spectrum
         """
         self.name = name
+        if matrix is None:
+            matrix = coverage_matrix.CoverageMatrix()
+        self.matrix = matrix
         self.lines: Dict[int, line.Line] = {}
         self.cyclomatic_complexity_data: Dict[int, int] = {}
         self.logical_tiebreak_data: Dict[int, int] = {}
         self.enhanced_tiebreak_data: Dict[int, float] = {}
+        # content hash of the file, known once the tiebreaker cache is used
+        self.digest = ""
 
     def update_file(
         self, covered_lines: list[int], test_result: str, test_case_name: str
@@ -34,10 +43,11 @@ class ProjFile:
         Raises:
             Exception: when a result is not one of the three possible values
         """
+        test_id = self.matrix.add_test(test_case_name, test_result)
         for line_number in covered_lines:
             # Line doesn't exist in the dataset, create new one
             if line_number not in self.lines:
-                line_obj = line.Line(self.name, line_number)
+                line_obj = line.Line(self.name, line_number, self.matrix)
                 if self.cyclomatic_complexity_data:
                     # get the complexity of the line
                     line_obj.tiebreakers[
@@ -53,14 +63,28 @@ class ProjFile:
                     ]
 
                 self.lines[line_number] = line_obj
-            if test_result == "passed":
-                self.lines[line_number].passed_by.append(test_case_name)
-            elif test_result == "failed":
-                self.lines[line_number].failed_by.append(test_case_name)
-            elif test_result == "skipped":
-                self.lines[line_number].skipped_by.append(test_case_name)
+            line_obj = self.lines[line_number]
+            if line_obj.matrix is self.matrix:
+                line_obj.cover(test_id)
             else:
-                raise Exception(f"Unknown test result for {test_case_name}")
+                # line was created with its own registry outside of this file
+                line_obj.cover(line_obj.matrix.add_test(test_case_name, test_result))
+
+    def assign_tiebreakers(self):
+        """Copy the values of the tiebreaker datasets into the existing lines."""
+        for line_number, line_obj in self.lines.items():
+            if self.cyclomatic_complexity_data:
+                line_obj.tiebreakers[line.CYCLOMATIC] = self.cyclomatic_complexity_data[
+                    line_number
+                ]
+            if self.logical_tiebreak_data:
+                line_obj.tiebreakers[line.LOGICAL] = self.logical_tiebreak_data[
+                    line_number
+                ]
+            if self.enhanced_tiebreak_data:
+                line_obj.tiebreakers[line.ENHANCED] = self.enhanced_tiebreak_data[
+                    line_number
+                ]
 
     def get_cyclomatic_tiebreaker_dataset(self):
         """Use the file path to calculate cyclomatic complexity and update the data."""
@@ -81,6 +105,85 @@ class ProjFile:
         generator.calculate_mutant_density()
         self.enhanced_tiebreak_data = generator.score
 
+    def get_tiebreaker_datasets(
+        self,
+        tiebreakers: List[str],
+        cache: Optional[tiebreak_cache.TiebreakCache] = None,
+    ):
+        """Calculate the datasets of several tiebreakers from a single parse of the file.
+
+        Args:
+            tiebreakers (List[str]): names of the tiebreakers to calculate, the
+            random tiebreaker doesn't need a dataset and is ignored
+            cache (TiebreakCache, optional): datasets stored by previous
+            sessions, the file is only parsed when one of them is missing
+        """
+        missing = self.load_cached_datasets(tiebreakers, cache)
+        if missing:
+            self.set_tiebreaker_datasets(
+                tiebreak_generator.calculate_datasets(self.name, missing), cache
+            )
+
+    def load_cached_datasets(
+        self,
+        tiebreakers: List[str],
+        cache: Optional[tiebreak_cache.TiebreakCache] = None,
+    ) -> List[str]:
+        """Use the datasets stored in the cache and return the names of missing ones.
+
+        Args:
+            tiebreakers (List[str]): names of the tiebreakers needed, the
+            random tiebreaker doesn't need a dataset and is ignored
+            cache (TiebreakCache, optional): datasets stored by previous sessions
+        """
+        tiebreakers = [
+            name
+            for name in tiebreakers
+            if name != line.RANDOM and not self.tiebreaker_dataset(name)
+        ]
+        if cache is None or not tiebreakers:
+            return tiebreakers
+        self.digest = tiebreak_cache.content_hash(self.name)
+        datasets = {}
+        for tiebreaker in tiebreakers:
+            stored = cache.get(self.digest, tiebreaker)
+            if stored is not None:
+                datasets[tiebreaker] = stored
+        self.set_tiebreaker_datasets(datasets)
+        return [name for name in tiebreakers if name not in datasets]
+
+    def tiebreaker_dataset(self, tiebreaker: str) -> Dict[int, Any]:
+        """Return the dataset of a tiebreaker, empty when it wasn't calculated."""
+        if tiebreaker == line.CYCLOMATIC:
+            return self.cyclomatic_complexity_data
+        if tiebreaker == line.LOGICAL:
+            return self.logical_tiebreak_data
+        if tiebreaker == line.ENHANCED:
+            return self.enhanced_tiebreak_data
+        return {}
+
+    def set_tiebreaker_datasets(
+        self,
+        datasets: Dict[str, Dict[int, Any]],
+        cache: Optional[tiebreak_cache.TiebreakCache] = None,
+    ):
+        """Store calculated tiebreaker datasets in the file and optionally the cache.
+
+        Args:
+            datasets (Dict[str, Dict[int, Any]]): tiebreaker values of every
+            line in the file, keyed by tiebreaker name
+            cache (TiebreakCache, optional): cache to keep the datasets in
+        """
+        if line.CYCLOMATIC in datasets:
+            self.cyclomatic_complexity_data = datasets[line.CYCLOMATIC]
+        if line.LOGICAL in datasets:
+            self.logical_tiebreak_data = datasets[line.LOGICAL]
+        if line.ENHANCED in datasets:
+            self.enhanced_tiebreak_data = datasets[line.ENHANCED]
+        if cache is not None:
+            for tiebreaker, data in datasets.items():
+                cache.put(self.digest, tiebreaker, data)
+
     def as_dict(self):
         """Return lines as a json writable dictionary."""
         data_dictionary = {}
@@ -0,0 +1,189 @@
+"""Write report files atomically, optionally on background threads."""
+
+import atexit
+import contextlib
+import json
+import os
+import threading
+import time
+
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Set, TextIO, Tuple
+
+# temporary files of the writes in progress, removed at exit when a job
+# didn't finish in time and its daemon thread is stopped
+PENDING_PATHS: Set[str] = set()
+PENDING_LOCK = threading.Lock()
+
+
+def temporary_path(path: str) -> str:
+    """Return the path of the temporary file written before replacing a file."""
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with PENDING_LOCK:
+        PENDING_PATHS.add(temp_path)
+    return temp_path
+
+
+def release(temp_path: str) -> None:
+    """Stop tracking the temporary file of a finished write."""
+    with PENDING_LOCK:
+        PENDING_PATHS.discard(temp_path)
+
+
+def discard(temp_path: str) -> None:
+    """Remove the temporary file of an interrupted write."""
+    release(temp_path)
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+
+@atexit.register
+def discard_pending() -> None:
+    """Remove the temporary files of the writes that are still in progress."""
+    with PENDING_LOCK:
+        pending = list(PENDING_PATHS)
+    for temp_path in pending:
+        try:
+            discard(temp_path)
+        except OSError:
+            pass
+
+
+@contextlib.contextmanager
+def replacing(path: str) -> Iterator[str]:
+    """Provide a temporary path that replaces the file at path once it's complete.
+
+    Readers of the path only ever see the previous file or the complete new
+    one, and an interrupted write leaves the previous file untouched.
+
+    Args:
+        path (str): path of the file to write
+    """
+    temp_path = temporary_path(path)
+    try:
+        yield temp_path
+        os.replace(temp_path, path)
+        release(temp_path)
+    except BaseException:
+        discard(temp_path)
+        raise
+
+
+@contextlib.contextmanager
+def atomic_write(path: str) -> Iterator[TextIO]:
+    """Open a text file that replaces the file at path once it's complete.
+
+    Args:
+        path (str): path of the file to write
+    """
+    temp_path = temporary_path(path)
+    try:
+        with open(temp_path, "w+", encoding="utf-8") as outfile:
+            yield outfile
+        os.replace(temp_path, path)
+        release(temp_path)
+    except BaseException:
+        discard(temp_path)
+        raise
+
+
+def write_json(path: str, data: Any, indent=4) -> None:
+    """Store data in a json file atomically."""
+    with atomic_write(path) as outfile:
+        json.dump(data, outfile, indent=indent)
+
+
+def write_json_items(path: str, items: Iterable[Tuple[str, Any]], indent=4) -> None:
+    """Store a stream of keys and values as a json object atomically.
+
+    Only one value is serialized at a time, the file is the same as the one
+    json.dump writes for a dictionary of the items.
+
+    Args:
+        path (str): path of the file to write
+        items (Iterable[Tuple[str, Any]]): keys and values of the object
+        indent (int): number of spaces to indent every level
+    """
+    padding = " " * indent
+    with atomic_write(path) as outfile:
+        separator = "{"
+        for key, value in items:
+            serialized = json.dumps(value, indent=indent).replace("\n", "\n" + padding)
+            outfile.write(f"{separator}\n{padding}{json.dumps(key)}: {serialized}")
+            separator = ","
+        outfile.write("{}" if separator == "{" else "\n}")
+
+
+class ReportWriter:
+    """Run report writing jobs on daemon threads so the session can go on.
+
+    Daemon threads don't keep the interpreter alive, so the wait at the end
+    of a session is bounded and a job that doesn't finish in time never
+    replaces its file, its temporary file is removed at exit.
+    """
+
+    def __init__(self, background=True) -> None:
+        """Initialize a writer.
+
+        Args:
+            background (bool): run jobs on background threads, otherwise every
+            job runs as soon as it's submitted
+        """
+        self.background = background
+        self.jobs: List[Tuple[str, threading.Thread]] = []
+        self.errors: List[Tuple[str, Exception]] = []
+        # seconds taken by every finished job
+        self.seconds: Dict[str, float] = {}
+
+    def submit(self, name: str, function: Callable[..., Any], *args) -> None:
+        """Run a job that writes a report.
+
+        Args:
+            name (str): description of the report in messages
+            function (Callable[..., Any]): function writing the report
+        """
+        if not self.background:
+            start = time.perf_counter()
+            function(*args)
+            self.seconds[name] = time.perf_counter() - start
+            return
+        thread = threading.Thread(
+            target=self.run,
+            args=(name, function) + args,
+            name=f"afluent-{name}",
+            daemon=True,
+        )
+        self.jobs.append((name, thread))
+        thread.start()
+
+    def run(self, name: str, function: Callable[..., Any], *args) -> None:
+        """Run a job on the current thread and keep the error it raises."""
+        start = time.perf_counter()
+        try:
+            function(*args)
+        except Exception as error:  # pylint: disable=W0703
+            # raised again on the main thread by wait
+            self.errors.append((name, error))
+        self.seconds[name] = time.perf_counter() - start
+
+    def wait(self, timeout=None) -> List[str]:
+        """Wait for the submitted jobs and return the names of unfinished ones.
+
+        Args:
+            timeout (float, optional): seconds to wait for all jobs together,
+            no limit when it's None
+
+        Raises:
+            Exception: when a job failed to write its report
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for _, thread in self.jobs:
+            remaining = None
+            if deadline is not None:
+                remaining = max(0.0, deadline - time.monotonic())
+            thread.join(remaining)
+        unfinished = [name for name, thread in self.jobs if thread.is_alive()]
+        self.jobs = [(name, thread) for name, thread in self.jobs if thread.is_alive()]
+        if self.errors:
+            name, error = self.errors[0]
+            raise Exception(f"ERROR: Unable to write {name}: {error}") from error
+        return unfinished
@@ -0,0 +1,147 @@
+"""Keep the spectrum of the previous session to only rerun tests of changed files."""
+
+import json
+import os
+import tempfile
+
+from typing import Any, Dict, Iterable, Optional, Set
+
+from afluent import tiebreak_cache
+
+RECORDS_FILE = "spectrum.jsonl"
+HASHES_FILE = "hashes.json"
+
+
+class ReuseCache:
+    """Store per-test coverage keyed by node id with the hashes of covered files."""
+
+    def __init__(self, directory: str) -> None:
+        """Initialize a cache object.
+
+        Args:
+            directory (str): path of the cache directory, created when missing
+        """
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+        self.records_path = os.path.join(directory, RECORDS_FILE)
+        self.hashes_path = os.path.join(directory, HASHES_FILE)
+        self.current_hashes: Dict[str, Optional[str]] = {}
+
+    def current_hash(self, path: str) -> Optional[str]:
+        """Return the content hash of a file now, None when it doesn't exist."""
+        if path not in self.current_hashes:
+            try:
+                self.current_hashes[path] = tiebreak_cache.content_hash(path)
+            except OSError:
+                self.current_hashes[path] = None
+        return self.current_hashes[path]
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """Return the stored test cases keyed by node id, empty when nothing is stored."""
+        records = {}
+        try:
+            with open(self.records_path, "r", encoding="utf-8") as infile:
+                for record_line in infile:
+                    record = json.loads(record_line)
+                    records[record["nodeid"]] = record
+        except (OSError, ValueError):
+            return {}
+        return records
+
+    def load_hashes(self) -> Dict[str, str]:
+        """Return the stored hash of every covered file, empty when nothing is stored."""
+        try:
+            with open(self.hashes_path, "r", encoding="utf-8") as infile:
+                return json.load(infile)
+        except (OSError, ValueError):
+            return {}
+
+    def reusable(
+        self, records: Dict[str, Dict[str, Any]], last_failed: Iterable[str] = ()
+    ) -> Dict[str, Dict[str, Any]]:
+        """Return the stored test cases that don't have to run again.
+
+        A test case is reused when it didn't fail and neither its own file nor
+        any file it covered changed since it was stored.
+
+        Args:
+            records (Dict[str, Dict[str, Any]]): stored test cases keyed by node id
+            last_failed (Iterable[str]): node ids of test cases that failed in
+            the last session
+        """
+        stored_hashes = self.load_hashes()
+        if not stored_hashes:
+            return {}
+        failed: Set[str] = set(last_failed)
+        reusable_records = {}
+        for nodeid, record in records.items():
+            if record["result"] == "failed" or nodeid in failed:
+                continue
+            paths = [record["source"]] + list(record["coverage"])
+            if all(
+                path in stored_hashes and self.current_hash(path) == stored_hashes[path]
+                for path in paths
+            ):
+                reusable_records[nodeid] = record
+        return reusable_records
+
+    def store(
+        self,
+        records: Dict[str, Dict[str, Any]],
+        stored: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> None:
+        """Store test cases and the hashes of the files they cover.
+
+        Stored test cases that aren't in records, like the ones left out of a
+        session running a subset of the suite, are kept with their hashes. A
+        kept test case is only dropped when it covers a file that changed
+        since, because the file can only have one hash and it couldn't be
+        reused anyway.
+
+        Args:
+            records (Dict[str, Dict[str, Any]]): test cases keyed by node id with
+            their name, source file, result and coverage
+            stored (Dict[str, Dict[str, Any]], optional): test cases returned by
+            load, they're loaded when it's None
+        """
+        if stored is None:
+            stored = self.load()
+        hashes = {}
+        for record in records.values():
+            for path in [record["source"]] + list(record["coverage"]):
+                if path not in hashes:
+                    current = self.current_hash(path)
+                    if current is not None:
+                        hashes[path] = current
+        stored_hashes = self.load_hashes()
+        kept = {}
+        for nodeid, record in stored.items():
+            paths = [record["source"]] + list(record["coverage"])
+            if nodeid not in records and all(
+                path in stored_hashes
+                and hashes.get(path, stored_hashes[path]) == stored_hashes[path]
+                for path in paths
+            ):
+                kept[nodeid] = record
+                for path in paths:
+                    hashes.setdefault(path, stored_hashes[path])
+        self.replace(
+            self.records_path,
+            "".join(
+                json.dumps(dict(record, nodeid=nodeid), separators=(",", ":")) + "\n"
+                for nodeid, record in {**kept, **records}.items()
+            ),
+        )
+        self.replace(self.hashes_path, json.dumps(hashes))
+
+    def replace(self, path: str, content: str) -> None:
+        """Write a file of the cache atomically."""
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, "w", encoding="utf-8") as outfile:
+                outfile.write(content)
+            os.replace(temp_path, path)
+        except OSError:
+            # a cache that can't be written to shouldn't stop the analysis
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
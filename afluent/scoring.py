@@ -0,0 +1,85 @@
+"""Calculate suspiciousness scores for many lines in a single batch."""
+
+from typing import Dict, List, Sequence, Tuple
+
+from afluent import line
+
+
+def score_all(
+    failed_cover: Sequence[int],
+    passed_cover: Sequence[int],
+    total_passed: int,
+    total_failed: int,
+    power=3,
+) -> Dict[str, List[float]]:
+    """Calculate every suspiciousness score for a batch of lines.
+
+    Lines that share the same coverage counts share the same scores, so every
+    distinct pair of counts is only scored once using the formulas in Line.
+
+    Args:
+        failed_cover (Sequence[int]): number of failed test cases covering each line
+        passed_cover (Sequence[int]): number of passed test cases covering each line
+        total_passed (int): total number of passed test cases
+        total_failed (int): total number of failed test cases
+        power (int, optional): Power to use in the dstar equation. Defaults to 3.
+
+    Returns:
+        Dict[str, List[float]]: scores of every line keyed by method name, in
+        the same order as the input counts
+    """
+    if len(failed_cover) != len(passed_cover):
+        raise Exception("ERROR: coverage counts must have the same length")
+    seen: Dict[Tuple[int, int], Tuple[float, float, float, float]] = {}
+    taran_scores: List[float] = []
+    ochiai_scores: List[float] = []
+    dstar_scores: List[float] = []
+    ochiai2_scores: List[float] = []
+    for counts in zip(failed_cover, passed_cover):
+        scores = seen.get(counts)
+        if scores is None:
+            failed, passed = counts
+            scores = (
+                line.Line.tarantula(failed, passed, total_passed, total_failed),
+                line.Line.ochiai(failed, passed, total_failed),
+                line.Line.dstar(failed, passed, total_failed, power),
+                line.Line.ochiai2(failed, passed, total_passed, total_failed),
+            )
+            seen[counts] = scores
+        taran_scores.append(scores[0])
+        ochiai_scores.append(scores[1])
+        dstar_scores.append(scores[2])
+        ochiai2_scores.append(scores[3])
+    return {
+        line.TARAN: taran_scores,
+        line.OCHIAI: ochiai_scores,
+        line.DSTAR: dstar_scores,
+        line.OCHIAI2: ochiai2_scores,
+    }
+
+
+def score_lines(
+    lines: Sequence[line.Line], total_passed: int, total_failed: int, power=3
+) -> None:
+    """Calculate and store every suspiciousness score of a batch of lines.
+
+    Args:
+        lines (Sequence[line.Line]): line objects to score
+        total_passed (int): total number of passed test cases
+        total_failed (int): total number of failed test cases
+        power (int, optional): Power to use in the dstar equation. Defaults to 3.
+    """
+    scores = score_all(
+        [line_obj.failed_cover for line_obj in lines],
+        [line_obj.passed_cover for line_obj in lines],
+        total_passed,
+        total_failed,
+        power=power,
+    )
+    for index, line_obj in enumerate(lines):
+        line_obj.sus_scores = {
+            line.TARAN: scores[line.TARAN][index],
+            line.OCHIAI: scores[line.OCHIAI][index],
+            line.DSTAR: scores[line.DSTAR][index],
+            line.OCHIAI2: scores[line.OCHIAI2][index],
+        }
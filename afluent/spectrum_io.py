@@ -0,0 +1,457 @@
+"""Pack, log and load per-test coverage spectra outside of the plugin process."""
+
+import array
+import json
+import os
+import struct
+import sys
+import zlib
+
+from typing import Any, Dict, Iterator, List, Tuple
+
+from afluent import coverage_matrix, report_writer, spectrum_parser
+
+# header of binary spectrum files: magic bytes, format version, the number of
+# test cases, files, integers and row bytes stored in the compressed payload,
+# and the number of passed, failed and skipped test cases
+BINARY_MAGIC = b"AFLS"
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct("<4sB7I")
+
+
+def pack_spectrum(session_spectrum: Dict[str, Any]) -> Dict[str, Any]:
+    """Pack a per-test coverage spectrum with every file path stored once.
+
+    The packed spectrum only holds lists, strings and integers so that it can
+    be sent through pytest-xdist workeroutput.
+
+    Args:
+        session_spectrum (Dict[str, Any]): coverage and result of every test
+        case keyed by test case name
+
+    Returns:
+        Dict[str, Any]: table of file paths and one row per test case with its
+        name, result and covered lines grouped by file index
+    """
+    files: List[str] = []
+    file_ids: Dict[str, int] = {}
+    tests = []
+    for test_name, test_info in session_spectrum.items():
+        covered = []
+        for file_name, lines in test_info["coverage"].items():
+            file_id = file_ids.get(file_name)
+            if file_id is None:
+                file_id = len(files)
+                file_ids[file_name] = file_id
+                files.append(file_name)
+            covered.append([file_id, sorted(lines)])
+        tests.append([test_name, test_info["result"], covered])
+    return {"files": files, "tests": tests}
+
+
+def unpack_spectrum(packed: Dict[str, Any]) -> Dict[str, Any]:
+    """Rebuild the per-test coverage spectrum from its packed form.
+
+    Args:
+        packed (Dict[str, Any]): spectrum created by pack_spectrum
+
+    Returns:
+        Dict[str, Any]: coverage and result of every test case keyed by test
+        case name
+    """
+    files = packed["files"]
+    session_spectrum = {}
+    for test_name, result, covered in packed["tests"]:
+        session_spectrum[test_name] = {
+            "coverage": {files[file_id]: lines for file_id, lines in covered},
+            "result": result,
+        }
+    return session_spectrum
+
+
+def merge_spectrum(session_spectrum: Dict[str, Any], packed: Dict[str, Any]) -> None:
+    """Add the test cases of a packed spectrum to a per-test coverage spectrum.
+
+    Args:
+        session_spectrum (Dict[str, Any]): spectrum to update in place
+        packed (Dict[str, Any]): spectrum created by pack_spectrum
+    """
+    session_spectrum.update(unpack_spectrum(packed))
+
+
+class SpectrumLog:
+    """Append the coverage and result of every test case to a line-delimited log.
+
+    Every record is a self-contained json line written with a single append, so
+    several processes can share a log and a killed session keeps every test
+    case that finished before it stopped.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Initialize a log object, creating the file when it's missing.
+
+        Args:
+            path (str): path of the log file
+        """
+        self.path = path
+        self.file_descriptor = os.open(
+            path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644
+        )
+
+    def append(self, test_name: str, test_info: Dict[str, Any]) -> None:
+        """Append the record of one test case to the log.
+
+        Args:
+            test_name (str): name of the test case
+            test_info (Dict[str, Any]): coverage and result of the test case
+        """
+        record = {
+            "test": test_name,
+            "result": test_info["result"],
+            "coverage": {
+                file_name: sorted(lines)
+                for file_name, lines in test_info["coverage"].items()
+            },
+        }
+        encoded = (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+        os.write(self.file_descriptor, encoded)
+
+    def close(self) -> None:
+        """Close the log file."""
+        if self.file_descriptor >= 0:
+            os.close(self.file_descriptor)
+            self.file_descriptor = -1
+
+
+def reset_log(path: str) -> None:
+    """Empty the log file to start a new session."""
+    with open(path, "w", encoding="utf-8"):
+        pass
+
+
+def repair_log(path: str) -> None:
+    """Remove the partially written record a killed session left at the end of a log.
+
+    Args:
+        path (str): path of the log file, nothing happens when it doesn't exist
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as log_file:
+        content_end = log_file.seek(0, os.SEEK_END)
+        # look for the end of the last complete record from the end of the file
+        position = content_end
+        while position > 0:
+            chunk_start = max(0, position - (1 << 16))
+            log_file.seek(chunk_start)
+            newline = log_file.read(position - chunk_start).rfind(b"\n")
+            if newline >= 0:
+                log_file.truncate(chunk_start + newline + 1)
+                return
+            position = chunk_start
+        log_file.truncate(0)
+
+
+def read_log(path: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Stream the test cases recorded in a log, ignoring a partial last record.
+
+    Args:
+        path (str): path of the log file
+
+    Yields:
+        Tuple[str, Dict[str, Any]]: name of the test case and its coverage and
+        result
+    """
+    with open(path, "r", encoding="utf-8") as log_file:
+        for record_line in log_file:
+            if not record_line.endswith("\n"):
+                # the session was stopped while writing this record
+                return
+            record = json.loads(record_line)
+            yield record["test"], {
+                "coverage": record["coverage"],
+                "result": record["result"],
+            }
+
+
+def load_log(path: str) -> Dict[str, Any]:
+    """Return the per-test coverage spectrum recorded in a log."""
+    return dict(read_log(path))
+
+
+def write_binary_spectrum(path: str, spectrum_obj: spectrum_parser.Spectrum) -> None:
+    """Store the coverage of a spectrum in the compact binary format.
+
+    Test case names and paths are stored once in a string table, results as
+    outcome codes and the test cases covering every line as the bitset rows
+    used by Line, all compressed with zlib.
+
+    Args:
+        path (str): path of the binary spectrum file
+        spectrum_obj (Spectrum): spectrum with the reassembled coverage to store
+
+    Raises:
+        Exception: when lines were pruned from the spectrum, they couldn't be
+        ranked again from the file
+    """
+    if any(spectrum_obj.pruned_lines.values()):
+        raise Exception(
+            "ERROR: Unable to store a pruned spectrum, create it without pruning"
+        )
+    matrix = spectrum_obj.matrix
+    strings = list(matrix.names) + list(spectrum_obj.reassembled_data)
+    integers = array.array("I")
+    rows = bytearray()
+    for file_id, file_obj in enumerate(spectrum_obj.reassembled_data.values()):
+        integers.extend((len(matrix.names) + file_id, len(file_obj.lines)))
+        for line_number, line_obj in file_obj.lines.items():
+            integers.extend((line_number, len(line_obj.row)))
+            integers.extend(line_obj.cover_counts)
+            rows += line_obj.row
+    if sys.byteorder == "big":
+        integers.byteswap()
+    string_blob = "\0".join(strings).encode("utf-8")
+    payload = b"".join(
+        (
+            struct.pack("<I", len(string_blob)),
+            string_blob,
+            bytes(matrix.outcomes),
+            integers.tobytes(),
+            rows,
+        )
+    )
+    header = BINARY_HEADER.pack(
+        BINARY_MAGIC,
+        BINARY_VERSION,
+        len(matrix.names),
+        len(spectrum_obj.reassembled_data),
+        len(integers),
+        len(rows),
+        spectrum_obj.totals["passed"],
+        spectrum_obj.totals["failed"],
+        spectrum_obj.totals["skipped"],
+    )
+    # an interrupted write keeps the previous spectrum readable
+    with report_writer.replacing(path) as temp_path:
+        with open(temp_path, "wb") as outfile:
+            outfile.write(header)
+            outfile.write(zlib.compress(payload))
+
+
+def read_binary_spectrum(path: str, **spectrum_options) -> spectrum_parser.Spectrum:
+    """Create a spectrum from a file stored in the compact binary format.
+
+    Lines get their bitset rows and coverage counts directly from the file, so
+    no per-test coverage has to be reassembled.
+
+    Args:
+        path (str): path of the binary spectrum file
+        spectrum_options: keyword arguments passed to the Spectrum
+
+    Raises:
+        Exception: when the file isn't a binary spectrum of a supported version
+
+    Returns:
+        Spectrum: spectrum with the scores of every stored line
+    """
+    with open(path, "rb") as infile:
+        header = infile.read(BINARY_HEADER.size)
+        compressed = infile.read()
+    if len(header) < BINARY_HEADER.size:
+        raise Exception(f"ERROR: {path} is not an AFLuent spectrum file")
+    fields = BINARY_HEADER.unpack(header)
+    if fields[0] != BINARY_MAGIC or fields[1] != BINARY_VERSION:
+        raise Exception(f"ERROR: {path} is not an AFLuent spectrum file")
+    tests_num, files_num = fields[2], fields[3]
+    strings, outcomes, values, rows = split_payload(
+        memoryview(zlib.decompress(compressed)), fields
+    )
+    return spectrum_parser.Spectrum.from_rows(
+        coverage_matrix.CoverageMatrix.from_tests(strings[:tests_num], outcomes),
+        decode_rows(strings, values, rows, files_num),
+        {"passed": fields[6], "failed": fields[7], "skipped": fields[8]},
+        **spectrum_options,
+    )
+
+
+def split_payload(
+    payload: memoryview, fields: Tuple[Any, ...]
+) -> Tuple[List[str], bytearray, List[int], memoryview]:
+    """Split the decompressed payload of a binary spectrum into its sections.
+
+    Args:
+        payload (memoryview): decompressed payload of the file
+        fields (Tuple[Any, ...]): values of the file header
+
+    Raises:
+        Exception: when the sizes of the sections don't match the header
+
+    Returns:
+        Tuple[List[str], bytearray, List[int], memoryview]: string table,
+        outcome codes, integers and concatenated rows of the spectrum
+    """
+    tests_num, files_num, integers_num, rows_size = fields[2:6]
+    (blob_size,) = struct.unpack_from("<I", payload)
+    strings_end = 4 + blob_size
+    strings = []
+    if tests_num + files_num:
+        strings = bytes(payload[4:strings_end]).decode("utf-8").split("\0")
+    outcomes_end = strings_end + tests_num
+    integers_end = outcomes_end + 4 * integers_num
+    integers = array.array("I")
+    integers.frombytes(payload[outcomes_end:integers_end])
+    if sys.byteorder == "big":
+        integers.byteswap()
+    rows = payload[integers_end:]
+    if len(strings) != tests_num + files_num or len(rows) != rows_size:
+        raise Exception("ERROR: corrupted AFLuent spectrum file")
+    return (
+        strings,
+        bytearray(payload[strings_end:outcomes_end]),
+        integers.tolist(),
+        rows,
+    )
+
+
+def decode_rows(
+    strings: List[str], values: List[int], rows: memoryview, files_num: int
+) -> Dict[str, Dict[int, Tuple[bytearray, List[int]]]]:
+    """Rebuild the bitset rows and coverage counts of every stored line.
+
+    Args:
+        strings (List[str]): string table of test case names and paths
+        values (List[int]): path id and line count of every file followed by
+        the number, row size and coverage counts of its lines
+        rows (memoryview): concatenated bitset rows of every line
+        files_num (int): number of files in the spectrum
+
+    Returns:
+        Dict[str, Dict[int, Tuple[bytearray, List[int]]]]: row and passed,
+        failed and skipped counts of every line keyed by path and line number
+    """
+    coverage_rows: Dict[str, Dict[int, Tuple[bytearray, List[int]]]] = {}
+    position = 0
+    row_start = 0
+    for _ in range(files_num):
+        path_id, lines_num = values[position], values[position + 1]
+        position += 2
+        file_rows = {}
+        for _ in range(lines_num):
+            line_number, row_size = values[position], values[position + 1]
+            row_end = row_start + row_size
+            counts_start = position + 2
+            position += 5
+            file_rows[line_number] = (
+                bytearray(rows[row_start:row_end]),
+                values[counts_start:position],
+            )
+            row_start = row_end
+        coverage_rows[strings[path_id]] = file_rows
+    return coverage_rows
+
+
+def read_per_test_report(
+    path: str, chunk_size: int = 1 << 16
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Stream the test cases of a per-test json report one at a time.
+
+    An empty file, like the one of a session that ran no test cases, has no
+    test cases.
+
+    Args:
+        path (str): path of the per-test report
+        chunk_size (int, optional): number of characters read at a time
+
+    Raises:
+        Exception: when the report isn't a json object of test cases
+
+    Yields:
+        Tuple[str, Dict[str, Any]]: name of the test case and its coverage and
+        result
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as infile:
+        buffer = ""
+        position = 0
+        exhausted = False
+
+        def next_token() -> str:
+            nonlocal buffer, position, exhausted
+            while True:
+                while position < len(buffer) and buffer[position].isspace():
+                    position += 1
+                if position < len(buffer):
+                    return buffer[position]
+                if exhausted:
+                    return ""
+                # the parsed part of the buffer isn't needed anymore
+                buffer = infile.read(chunk_size)
+                position = 0
+                exhausted = not buffer
+
+        def decode() -> Any:
+            nonlocal buffer, position, exhausted
+            while True:
+                try:
+                    value, position = decoder.raw_decode(buffer, position)
+                    return value
+                except json.JSONDecodeError:
+                    if exhausted:
+                        raise
+                    chunk = infile.read(chunk_size)
+                    exhausted = not chunk
+                    buffer = buffer[position:] + chunk
+                    position = 0
+
+        first_token = next_token()
+        if not first_token:
+            # a session that ran no test cases, or a log reset by --afl-resume
+            return
+        if first_token != "{":
+            raise Exception(f"ERROR: {path} is not a per-test report")
+        position += 1
+        while next_token() not in ("}", ""):
+            test_name = decode()
+            if next_token() != ":":
+                raise Exception(f"ERROR: {path} is not a per-test report")
+            position += 1
+            next_token()
+            yield test_name, decode()
+            if next_token() == ",":
+                position += 1
+
+
+def read_tests(path: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Stream the test cases of a per-test json report or of a log.
+
+    Args:
+        path (str): path of the per-test report or of the line-delimited log
+    """
+    with open(path, "r", encoding="utf-8") as infile:
+        first_line = infile.readline()
+    try:
+        first_record = json.loads(first_line)
+    except ValueError:
+        first_record = None
+    if isinstance(first_record, dict) and {"test", "result", "coverage"} <= set(
+        first_record
+    ):
+        return read_log(path)
+    return read_per_test_report(path)
+
+
+def load_spectrum(path: str, **spectrum_options) -> spectrum_parser.Spectrum:
+    """Create a spectrum from a binary spectrum, a per-test report or a log.
+
+    Test cases of per-test reports and logs are streamed into the spectrum
+    without loading the whole file.
+
+    Args:
+        path (str): path of the saved spectrum
+        spectrum_options: keyword arguments passed to the Spectrum
+    """
+    with open(path, "rb") as infile:
+        magic = infile.read(len(BINARY_MAGIC))
+    if magic == BINARY_MAGIC:
+        return read_binary_spectrum(path, **spectrum_options)
+    return spectrum_parser.Spectrum.from_tests(read_tests(path), **spectrum_options)
@@ -1,14 +1,19 @@
 """Implement parsing and reassembling functions for coverage data."""
 
+import collections
+import concurrent.futures
 import csv
-import json
+import heapq
+import itertools
 import random
+import sys
 
-from typing import Any, Dict, List, Tuple
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
 
 from console import fg, bg, fx  # type: ignore[import]
 from tabulate import tabulate
-from afluent import proj_file, line
+from afluent import coverage_matrix, proj_file, line, scoring, tiebreak_generator
+from afluent import report_writer, sqlite_report, timing
 
 
 METHOD_NAMES = ["tarantula", "ochiai", "ochiai2", "dstar"]
@@ -23,45 +28,97 @@ PALETTE = {
 }
 
 
+# pylint: disable=R0902, R0904
 class Spectrum:
     """Store all the information for individual files and lines coverage."""
 
+    # pylint: disable=R0913
     def __init__(
-        self, config, dstar_pow=3, tiebreaker="random", eval_mode=False
+        self,
+        config,
+        dstar_pow=3,
+        tiebreaker="random",
+        eval_mode=False,
+        *,
+        cache=None,
+        workers=1,
+        lazy_tiebreak=False,
+        timer=None,
+        prune=False,
     ) -> None:
         """Initialize a spectrum object.
 
         Args:
             config (dict): per-test coverage information
             dstar_pow (int): power to use when calculating scores using dstar
+            tiebreaker (Union[str, List[str]]): name of the tiebreaker, or a
+            cascade of tiebreakers where each one only settles the ties left by
+            the previous ones
+            cache (TiebreakCache, optional): tiebreaker datasets stored by
+            previous sessions
+            workers (int): number of processes used to calculate tiebreakers
+            lazy_tiebreak (bool): calculate tiebreaker datasets when ranking,
+            only for the files of lines that tie inside the reported ranks
+            timer (PhaseTimer, optional): timer to add the time of every phase
+            of the analysis to
+            prune (bool): only create lines covered by a failing test case, the
+            others score 0 with every method and are only counted per file
         """
         self.config = config
+        self.matrix = coverage_matrix.CoverageMatrix()
         self.reassembled_data: Dict[str, proj_file.ProjFile] = {}
         self.sorted_lines: List[line.Line] = []
+        self.ranking_method = line.DSTAR
         self.totals = {"passed": 0, "failed": 0, "skipped": 0}
         self.dstar_pow = dstar_pow
-        self.tiebreaker = tiebreaker
+        if isinstance(tiebreaker, str):
+            tiebreaker = [tiebreaker]
+        self.tiebreakers: List[str] = list(tiebreaker)
+        self.tiebreaker = self.tiebreakers[0]
         self.eval_mode = eval_mode
+        self.cache = cache
+        self.workers = workers
+        self.lazy_tiebreak = lazy_tiebreak and not eval_mode
+        # eval reports rank every line
+        self.prune = prune and not eval_mode
+        # number of lines left out of every file by pruning
+        self.pruned_lines: Dict[str, int] = {}
+        # pruning was requested but would have changed the ranking
+        self.prune_skipped = False
+        # number of ranks already settled by lazy tiebreakers for every method
+        self.resolved_ranks: Dict[str, int] = {}
+        self.timer = timer if timer is not None else timing.PhaseTimer()
+        # seconds spent analyzing the tiebreakers of every file
+        self.analysis_times: Dict[str, float] = {}
         self.reassemble()
         self.calculate_sus()
 
     def generate_report(
-        self, methods: List[str], max_items=-1
+        self, methods: List[str], max_items=-1, full_ranking=False
     ) -> List[Tuple[Any, ...]]:
         """Generate a list of tuples containing report information."""
         report_list = []
-        # Gather up all the line objects in one list
-        all_lines: List[line.Line] = []
-        for file_obj in self.reassembled_data.values():
-            all_lines.extend(file_obj.lines.values())
-        # Sort the lines based on the first method name used in the list
-        sorted_lines = Spectrum.generate_rankings(
-            all_lines, methods[0], tiebreaker=self.tiebreaker
-        )
-        # store as an instance variable to generate reports later
-        self.sorted_lines = sorted_lines
-        if max_items > 0:
-            sorted_lines = sorted_lines[:max_items]
+        # lazy tiebreakers only need to settle the ties in the displayed ranks
+        self.resolve_tiebreakers(methods[0], -1 if full_ranking else max_items)
+        if max_items > 0 and not full_ranking:
+            if methods[0] != self.ranking_method:
+                self.sorted_lines = []
+            self.ranking_method = methods[0]
+            with self.timer.phase("ranking"):
+                # only the displayed lines have to be ranked
+                sorted_lines = Spectrum.select_top(
+                    self.collect_lines(),
+                    methods[0],
+                    max_items,
+                    tiebreaker=self.tiebreakers,
+                )
+        else:
+            # Sort the lines based on the first method name used in the list
+            # and store as an instance variable to generate reports later, a
+            # ranking calculated ahead for a report is displayed as it is
+            sorted_lines = self.rank_all_lines(methods[0])
+            if max_items > 0:
+                sorted_lines = sorted_lines[:max_items]
         # pylint: disable=C0200
         for line_index in range(0, len(sorted_lines)):
             line_obj = sorted_lines[line_index]
@@ -77,47 +134,377 @@ class Spectrum:
             report_list.append(tuple(current_row))
         return report_list
 
+    def rank_all_lines(self, method: Optional[str] = None) -> List[line.Line]:
+        """Return every line ranked by the given method or the method of the last report.
+
+        The full ranking is only calculated when it wasn't calculated for the
+        same method before.
+        """
+        if method is not None and method != self.ranking_method:
+            self.ranking_method = method
+            self.sorted_lines = []
+        if not self.sorted_lines and self.reassembled_data:
+            self.resolve_tiebreakers(self.ranking_method, -1)
+            with self.timer.phase("ranking"):
+                self.sorted_lines = Spectrum.generate_rankings(
+                    self.collect_lines(),
+                    self.ranking_method,
+                    tiebreaker=self.tiebreakers,
+                )
+        return self.sorted_lines
+
+    def collect_lines(self) -> List[line.Line]:
+        """Gather up all the line objects in one list."""
+        all_lines: List[line.Line] = []
+        for file_obj in self.reassembled_data.values():
+            all_lines.extend(file_obj.lines.values())
+        return all_lines
+
     def reassemble(self):
         """Reassemble the coverage information on a file and line basis."""
         # Config is empty, return nothing
         if not self.config:
             return
-        # iterate through every test case in the spectrum report
-        for test_case_name, spectrum_dict in self.config.items():
-            test_result = spectrum_dict["result"]
-            # increment the totals
-            self.totals[test_result] += 1
-            for file_name, lines_covered in spectrum_dict["coverage"].items():
-                if file_name not in self.reassembled_data:
-                    # Initialize a new object of one doesn't already exist
-                    file_obj = proj_file.ProjFile(file_name)
-                    if self.eval_mode:
-                        # populate all tieberaker datasets
-                        file_obj.get_logical_tiebreaker_dataset()
-                        file_obj.get_enhanced_tiebreaker_dataset()
-                        file_obj.get_cyclomatic_tiebreaker_dataset()
-                    elif self.tiebreaker == "logical":
-                        # collect logical tiebreak dataset only
-                        file_obj.get_logical_tiebreaker_dataset()
-                    elif self.tiebreaker == "enhanced":
-                        # collect enhanced tiebreak dataset only
-                        file_obj.get_enhanced_tiebreaker_dataset()
-                    elif self.tiebreaker == "cyclomatic":
-                        # collect cyclometer dataset only
-                        file_obj.get_cyclomatic_tiebreaker_dataset()
-                    # * Random tiebreaker doesn't need dataset
-                    self.reassembled_data[file_name] = file_obj
-                self.reassembled_data[file_name].update_file(
-                    lines_covered, test_result, test_case_name
+        cone = None
+        if self.prune:
+            results = collections.Counter(
+                spectrum_dict["result"] for spectrum_dict in self.config.values()
+            )
+            if Spectrum.cone_ranks_equally(results):
+                cone = Spectrum.failure_cone(self.config.values())
+            else:
+                self.skip_pruning()
+        self.add_tests(self.config.items(), cone)
+        # every measured file is known, so tiebreakers can be analyzed together
+        self.prepare_tiebreakers()
+
+    def add_tests(
+        self,
+        tests: Iterable[Tuple[str, Dict[str, Any]]],
+        cone: Optional[Dict[str, Set[int]]] = None,
+    ):
+        """Add the coverage of test cases to the files and lines of the spectrum.
+
+        Args:
+            tests (Iterable[Tuple[str, Dict[str, Any]]]): name of every test case
+            with its coverage and result, consumed only once
+            cone (Dict[str, Set[int]], optional): lines covered by failing test
+            cases, the only lines created when it's given
+        """
+        pruned: Dict[str, Set[int]] = {}
+        with self.timer.phase("reassemble"):
+            # iterate through every test case in the spectrum report
+            for test_case_name, spectrum_dict in tests:
+                test_result = spectrum_dict["result"]
+                # increment the totals
+                self.totals[test_result] += 1
+                for file_name, lines_covered in spectrum_dict["coverage"].items():
+                    if cone is not None:
+                        lines_covered = Spectrum.split_cone(
+                            lines_covered,
+                            cone.get(file_name, set()),
+                            pruned.setdefault(file_name, set()),
+                        )
+                        if not lines_covered:
+                            continue
+                    file_obj = self.reassembled_data.get(file_name)
+                    if file_obj is None:
+                        # Initialize a new object of one doesn't already exist
+                        file_obj = proj_file.ProjFile(file_name, self.matrix)
+                        self.reassembled_data[file_name] = file_obj
+                    file_obj.update_file(lines_covered, test_result, test_case_name)
+        for file_name, line_numbers in pruned.items():
+            if line_numbers:
+                self.pruned_lines[file_name] = len(line_numbers)
+
+    @staticmethod
+    def cone_ranks_equally(totals: Dict[str, int]) -> bool:
+        """Return True when pruning the lines outside the failure cone keeps the ranking.
+
+        Lines that no failing test case covers score 0, the lowest score, with
+        ochiai and dstar once a test case failed, but tarantula and ochiai2 score
+        every line 1 when no test case passed.
+
+        Args:
+            totals (Dict[str, int]): number of passed, failed and skipped test cases
+        """
+        return totals["passed"] > 0 and totals["failed"] > 0
+
+    def skip_pruning(self):
+        """Keep every line because pruning would change the ranking."""
+        self.prune = False
+        self.prune_skipped = True
+
+    @staticmethod
+    def failure_cone(tests: Iterable[Dict[str, Any]]) -> Dict[str, Set[int]]:
+        """Return the lines covered by at least one failing test case, keyed by path."""
+        cone: Dict[str, Set[int]] = {}
+        for spectrum_dict in tests:
+            if spectrum_dict["result"] == "failed":
+                for file_name, lines_covered in spectrum_dict["coverage"].items():
+                    cone.setdefault(file_name, set()).update(lines_covered)
+        return cone
+
+    @staticmethod
+    def split_cone(
+        lines_covered: List[int], file_cone: Set[int], pruned: Set[int]
+    ) -> List[int]:
+        """Return the covered lines inside the failure cone and add the rest to pruned."""
+        inside = [
+            line_number for line_number in lines_covered if line_number in file_cone
+        ]
+        if len(inside) < len(lines_covered):
+            pruned.update(
+                line_number
+                for line_number in lines_covered
+                if line_number not in file_cone
+            )
+        return inside
+
+    def prune_lines(self):
+        """Remove the lines that no failing test case covers and count them per file."""
+        for file_name in list(self.reassembled_data):
+            file_obj = self.reassembled_data[file_name]
+            pruned = [
+                line_number
+                for line_number, line_obj in file_obj.lines.items()
+                if not line_obj.failed_cover
+            ]
+            for line_number in pruned:
+                del file_obj.lines[line_number]
+            if pruned:
+                self.pruned_lines[file_name] = (
+                    self.pruned_lines.get(file_name, 0) + len(pruned)
                 )
+            if not file_obj.lines:
+                del self.reassembled_data[file_name]
+
+    def prepare_tiebreakers(self):
+        """Calculate the tiebreaker datasets that are needed before ranking."""
+        if self.eval_mode:
+            # populate all tieberaker datasets from a single parse
+            self.load_tiebreakers(TIEBREAKERS)
+        elif not self.lazy_tiebreak:
+            # collect the chosen tiebreak datasets only
+            self.load_tiebreakers(self.tiebreakers)
+        # * Random tiebreaker doesn't need dataset
+
+    @classmethod
+    def from_tests(
+        cls, tests: Iterable[Tuple[str, Dict[str, Any]]], **spectrum_options
+    ) -> "Spectrum":
+        """Create a spectrum from a stream of test cases without keeping them.
+
+        Args:
+            tests (Iterable[Tuple[str, Dict[str, Any]]]): name of every test case
+            with its coverage and result
+            spectrum_options: keyword arguments of the Spectrum initializer
+        """
+        spectrum_obj = cls({}, **spectrum_options)
+        spectrum_obj.add_tests(tests)
+        if spectrum_obj.prune:
+            # a stream is only read once, so the cone isn't known in advance
+            if Spectrum.cone_ranks_equally(spectrum_obj.totals):
+                spectrum_obj.prune_lines()
+            else:
+                spectrum_obj.skip_pruning()
+        spectrum_obj.prepare_tiebreakers()
+        spectrum_obj.calculate_sus()
+        return spectrum_obj
+
+    @classmethod
+    def from_rows(
+        cls,
+        matrix: coverage_matrix.CoverageMatrix,
+        coverage_rows: Dict[str, Dict[int, Tuple[bytearray, List[int]]]],
+        totals: Dict[str, int],
+        **spectrum_options,
+    ) -> "Spectrum":
+        """Create a spectrum from lines that are already reassembled.
+
+        Args:
+            matrix (CoverageMatrix): registry of the test cases in the spectrum
+            coverage_rows (Dict[str, Dict[int, Tuple[bytearray, List[int]]]]):
+            bitset row and passed, failed and skipped counts of every line keyed
+            by path and line number
+            totals (Dict[str, int]): number of passed, failed and skipped test cases
+            spectrum_options: keyword arguments of the Spectrum initializer
+        """
+        spectrum_obj = cls({}, **spectrum_options)
+        spectrum_obj.matrix = matrix
+        spectrum_obj.totals = dict(totals)
+        if spectrum_obj.prune and not Spectrum.cone_ranks_equally(totals):
+            spectrum_obj.skip_pruning()
+        for file_name, file_rows in coverage_rows.items():
+            file_obj = proj_file.ProjFile(file_name, matrix)
+            for line_number, (row, counts) in file_rows.items():
+                if spectrum_obj.prune and not counts[coverage_matrix.FAILED]:
+                    spectrum_obj.pruned_lines[file_name] = (
+                        spectrum_obj.pruned_lines.get(file_name, 0) + 1
+                    )
+                    continue
+                line_obj = line.Line(file_name, line_number, matrix)
+                line_obj.row = row
+                line_obj.cover_counts = list(counts)
+                file_obj.lines[line_number] = line_obj
+            if file_obj.lines:
+                spectrum_obj.reassembled_data[file_name] = file_obj
+        spectrum_obj.prepare_tiebreakers()
+        spectrum_obj.calculate_sus()
+        return spectrum_obj
+
+    def load_tiebreakers(
+        self, tiebreakers: List[str], file_names: Optional[Iterable[str]] = None
+    ):
+        """Get the tiebreaker datasets of measured files.
+
+        Datasets are taken from the cache when possible, the remaining files
+        are analyzed in a pool of worker processes when more than one worker
+        is configured.
+
+        Args:
+            tiebreakers (List[str]): names of the tiebreakers to calculate
+            file_names (Iterable[str], optional): files to calculate the
+            datasets for, defaults to every measured file
+        """
+        if file_names is None:
+            file_names = self.reassembled_data.keys()
+        tiebreakers = [name for name in tiebreakers if name != line.RANDOM]
+        if not tiebreakers:
+            return
+        with self.timer.phase("tiebreakers"):
+            self.calculate_missing_datasets(tiebreakers, file_names)
+
+    def calculate_missing_datasets(
+        self, tiebreakers: List[str], file_names: Iterable[str]
+    ):
+        """Take tiebreaker datasets from the cache or analyze the files missing them."""
+        pending = {}
+        for file_name in file_names:
+            file_obj = self.reassembled_data[file_name]
+            missing = file_obj.load_cached_datasets(tiebreakers, self.cache)
+            if missing:
+                pending[file_name] = missing
+        results = Spectrum.calculate_tiebreakers(
+            pending, self.workers, self.analysis_times
+        )
+        for file_name, datasets in results.items():
+            self.reassembled_data[file_name].set_tiebreaker_datasets(
+                datasets, self.cache
+            )
+        for file_name in file_names:
+            # lines that already exist get the values of the new datasets
+            self.reassembled_data[file_name].assign_tiebreakers()
+        if self.cache is not None:
+            self.cache.evict()
+
+    # pylint: disable=W0640
+    def resolve_tiebreakers(self, method: str, max_items=-1):
+        """Calculate lazy tiebreaker datasets for the files of tied lines.
+
+        Only ties between lines that end up in the first `max_items` ranks are
+        considered. Every tiebreaker in the cascade is only calculated for the
+        lines that the previous ones left tied.
+
+        Args:
+            method (str): name of the suspiciousness score used for ranking
+            max_items (int): number of ranks that have to be decided, every
+            rank when it's not positive
+        """
+        cascade = [name for name in self.tiebreakers if name != line.RANDOM]
+        if not self.lazy_tiebreak or not cascade:
+            return
+        with self.timer.phase("ranking"):
+            self.resolve_ties(method, cascade, max_items)
+
+    def resolve_ties(self, method: str, cascade: List[str], max_items=-1):
+        """Calculate the tiebreakers of a cascade for the lines tied in the first ranks."""
+        resolved = self.resolved_ranks.get(method, 0)
+        if resolved < 0 or 0 < max_items <= resolved:
+            return
+        self.resolved_ranks[method] = max_items if max_items > 0 else -1
+        all_lines = self.collect_lines()
+        if 0 < max_items < len(all_lines):
+            # lines scoring below the last displayed line can't be displayed
+            cutoff_score = heapq.nlargest(
+                max_items, (line_obj.sus_scores[method] for line_obj in all_lines)
+            )[-1]
+            all_lines = [
+                line_obj
+                for line_obj in all_lines
+                if line_obj.sus_scores[method] >= cutoff_score
+            ]
+        else:
+            max_items = len(all_lines)
+        tied_groups = Spectrum.split_ties(
+            all_lines, lambda line_obj: line_obj.sus_scores[method], 0, max_items
+        )
+        for tiebreaker in cascade:
+            if not tied_groups:
+                break
+            tied_files = {
+                line_obj.path for _, group in tied_groups for line_obj in group
+            }
+            self.load_tiebreakers([tiebreaker], tied_files)
+            remaining_groups = []
+            for start, group in tied_groups:
+                remaining_groups.extend(
+                    Spectrum.split_ties(
+                        group,
+                        lambda line_obj: line_obj.tiebreakers[tiebreaker],
+                        start,
+                        max_items,
+                    )
+                )
+            tied_groups = remaining_groups
 
     def calculate_sus(self):
         """Iterate through reassembeled data and calculate the suspiciousness of every line."""
-        for _, current_file in self.reassembled_data.items():
-            for _, current_line in current_file.lines.items():
-                current_line.sus_all(
-                    self.totals["passed"], self.totals["failed"], power=self.dstar_pow
+        with self.timer.phase("calculate_sus"):
+            all_lines: List[line.Line] = []
+            for current_file in self.reassembled_data.values():
+                all_lines.extend(current_file.lines.values())
+            scoring.score_lines(
+                all_lines,
+                self.totals["passed"],
+                self.totals["failed"],
+                power=self.dstar_pow,
+            )
+
+    def memory_sizes(self) -> Dict[str, Dict[str, int]]:
+        """Return the number and approximate size in bytes of the analysis structures.
+
+        Sizes cover the registry of test cases, the line objects with their
+        coverage rows and scores, and the tiebreaker datasets of every file.
+        """
+        seen: Set[int] = set()
+        line_bytes = 0
+        lines_num = 0
+        dataset_entries = 0
+        dataset_bytes = 0
+        for file_obj in self.reassembled_data.values():
+            for line_obj in file_obj.lines.values():
+                lines_num += 1
+                line_bytes += sys.getsizeof(line_obj) + sum(
+                    timing.deep_size(getattr(line_obj, name), seen)
+                    for name in ("row", "cover_counts", "sus_scores", "tiebreakers")
                 )
+            for tiebreaker in (line.CYCLOMATIC, line.LOGICAL, line.ENHANCED):
+                dataset = file_obj.tiebreaker_dataset(tiebreaker)
+                dataset_entries += len(dataset)
+                dataset_bytes += timing.deep_size(dataset, seen)
+        return {
+            "matrix": {
+                "tests": len(self.matrix),
+                "bytes": timing.deep_size(vars(self.matrix), seen),
+            },
+            "lines": {
+                "files": len(self.reassembled_data),
+                "lines": lines_num,
+                "bytes": line_bytes,
+            },
+            "tiebreak_datasets": {"entries": dataset_entries, "bytes": dataset_bytes},
+        }
 
     def as_dict(self):
         """Return the spectrum information as a JSON writable dictionary."""
@@ -127,36 +514,71 @@ class Spectrum:
 
         return data_dict
 
-    def print_report(self, methods: List[str], items_num: int):
+    def print_report(self, methods: List[str], items_num: int, full_ranking=False):
         """Print a nicely formatted suspiciousness report using the chosen method."""
         for method_name in methods:
             if method_name not in METHOD_NAMES:
                 raise Exception(f"ERROR: Invalid method name {method_name}")
-        print()
         header_text = "============================ AFLuent Report ==============================="
-        table_headers = [
-            PALETTE["location_line"]("File Path"),
-            PALETTE["location_line"]("Line Number"),
-        ]
-        for method_name in methods:
-            table_headers.append(PALETTE["location_line"](f"{method_name} Score"))
-        print(f"{PALETTE['location_line'](header_text)}")
-        print(
-            tabulate(
-                self.generate_report(methods, max_items=items_num),
-                headers=table_headers,
-                tablefmt="rst",
+        with self.timer.phase("rendering"):
+            print()
+            table_headers = [
+                PALETTE["location_line"]("File Path"),
+                PALETTE["location_line"]("Line Number"),
+            ]
+            for method_name in methods:
+                table_headers.append(PALETTE["location_line"](f"{method_name} Score"))
+            print(f"{PALETTE['location_line'](header_text)}")
+            print(
+                tabulate(
+                    self.generate_report(
+                        methods, max_items=items_num, full_ranking=full_ranking
+                    ),
+                    headers=table_headers,
+                    tablefmt="rst",
+                )
             )
-        )
+            if self.pruned_lines:
+                print(
+                    f"{sum(self.pruned_lines.values())} lines never covered by a "
+                    + "failing test case were left out, they score 0 with every method."
+                )
+            if self.prune_skipped:
+                print(
+                    "Pruning was skipped, lines that no failing test case covers "
+                    + "only score 0 with every method when test cases passed and failed."
+                )
 
-    def store_report(self, report_type):
-        """Create and store a report file."""
+    def store_report(self, report_type, combined_eval=False):
+        """Create and store a report file.
+
+        Args:
+            report_type (str): one of `json`, `csv`, `sqlite` or `eval`
+            combined_eval (bool): store every eval combination in a single file
+        """
+        with self.timer.phase("report"):
+            self.write_report(report_type, combined_eval)
+
+    def covering_tests(self) -> str:
+        """Return the test cases named by the lines, `all` or only the `failed` ones.
+
+        An aggregated spectrum only registers the failing test cases, the
+        coverage counts of its lines still include every test case.
+        """
+        if len(self.matrix) < sum(self.totals.values()):
+            return "failed"
+        return "all"
+
+    def write_report(self, report_type, combined_eval=False):
+        """Write a report file of the given type to the current directory."""
         if report_type == "json":
             data_dict = {}
-            lines_list = list(map(lambda x: x.as_dict(), self.sorted_lines))
+            lines_list = list(map(lambda x: x.as_dict(), self.rank_all_lines()))
             data_dict["ranking"] = lines_list
-            with open("afluent_report.json", "w+", encoding="utf-8") as outfile:
-                json.dump(data_dict, outfile, indent=4)
+            data_dict["covering_tests"] = self.covering_tests()
+            if self.prune:
+                data_dict["pruned_lines"] = self.pruned_lines
+            report_writer.write_json("afluent_report.json", data_dict)
         elif report_type == "csv":
             header = [
                 "Path",
@@ -166,74 +588,324 @@ class Spectrum:
                 "Ochiai2 Score",
                 "Dstar Score",
             ]
-            with open("afluent_report.csv", "w+", encoding="utf-8") as outfile:
+            with report_writer.atomic_write("afluent_report.csv") as outfile:
                 csv_writer = csv.writer(outfile)
                 csv_writer.writerow(header)
-                lines_list = list(map(lambda x: x.as_csv(), self.sorted_lines))
+                lines_list = list(map(lambda x: x.as_csv(), self.rank_all_lines()))
                 csv_writer.writerows(lines_list)
 
+        elif report_type == "sqlite":
+            sqlite_report.write_report(
+                "afluent_report.sqlite",
+                self.rank_all_lines(),
+                self.matrix,
+                {
+                    "method": self.ranking_method,
+                    "covering_tests": self.covering_tests(),
+                    "tiebreakers": ",".join(self.tiebreakers),
+                    "pruned_lines": str(sum(self.pruned_lines.values())),
+                    "dstar_pow": str(self.dstar_pow),
+                    **{
+                        f"{result}_total": str(total)
+                        for result, total in self.totals.items()
+                    },
+                },
+            )
         elif report_type == "eval":
-            self.produce_full_eval_report()
+            self.produce_full_eval_report(combined=combined_eval)
         else:
             raise Exception(f"Error:Unknown report type {report_type}.")
 
+    def produce_full_eval_report(self, combined=False):
+        """Produce csv reports for all equation tie breaker combinatoins.
+
+        Args:
+            combined (bool): store the rank of every line for all combinations
+            in a single file instead of one file per combination
+        """
+        with self.timer.phase("ranking"):
+            rankings = self.eval_rankings()
+        if combined:
+            Spectrum.write_combined_eval_report(
+                "afluent_eval_report.csv", self.collect_lines(), rankings
+            )
+            return
+        # every combination goes to its own file, so they are written in parallel
+        with concurrent.futures.ThreadPoolExecutor() as executor:
+            futures = [
+                executor.submit(
+                    Spectrum.write_eval_report,
+                    f"{method}_{tiebreaker}_report.csv",
+                    method,
+                    tiebreaker,
+                    ranked_lines,
+                )
+                for (method, tiebreaker), ranked_lines in rankings.items()
+            ]
+            for future in futures:
+                # surface errors raised while writing
+                future.result()
+
     # pylint: disable=W0640
-    def produce_full_eval_report(self):
-        """Produce csv reports for all equation tie breaker combinatoins."""
+    def eval_rankings(self) -> Dict[Tuple[str, str], List[line.Line]]:
+        """Rank the lines for every combination of method and tiebreaker.
+
+        Lines are sorted once per method, tiebreakers only reorder the lines
+        inside groups of tied scores.
+
+        Returns:
+            Dict[Tuple[str, str], List[line.Line]]: ranked lines keyed by
+            method and tiebreaker names
+        """
+        rankings: Dict[Tuple[str, str], List[line.Line]] = {}
+        all_lines = self.collect_lines()
         for method in METHOD_NAMES:
-            for tiebreaker in TIEBREAKERS:
-                ranked_lines = Spectrum.generate_rankings(
-                    self.sorted_lines, method, tiebreaker=tiebreaker
+            # ties stay in a random order when no tiebreaker reorders them
+            random.shuffle(all_lines)
+            by_score = sorted(
+                all_lines, key=lambda x: x.sus_scores[method], reverse=True
+            )
+            tied_groups = [
+                list(group)
+                for _, group in itertools.groupby(
+                    by_score, key=lambda x: x.sus_scores[method]
                 )
-                file_to_store = f"{method}_{tiebreaker}_report.csv"
-                header = [
-                    "Path",
-                    "Line number",
-                    f"{method} score",
-                    f"{tiebreaker} score",
-                ]
-                with open(file_to_store, "w+", encoding="utf-8") as outfile:
-                    csv_writer = csv.writer(outfile)
-                    csv_writer.writerow(header)
-                    lines_list = list(
-                        map(
-                            lambda x: [
-                                x.path,
-                                x.number,
-                                x.sus_scores[method],
-                                x.tiebreakers[tiebreaker],
-                            ],
-                            ranked_lines,
+            ]
+            for tiebreaker in TIEBREAKERS:
+                if tiebreaker == line.RANDOM:
+                    rankings[(method, tiebreaker)] = by_score
+                    continue
+                ranked_lines: List[line.Line] = []
+                for group in tied_groups:
+                    if len(group) > 1:
+                        group = sorted(
+                            group, key=lambda x: x.tiebreakers[tiebreaker], reverse=True
                         )
-                    )
-                    csv_writer.writerows(lines_list)
+                    ranked_lines.extend(group)
+                rankings[(method, tiebreaker)] = ranked_lines
+        return rankings
+
+    @staticmethod
+    def write_eval_report(
+        file_to_store: str, method: str, tiebreaker: str, ranked_lines: List[line.Line]
+    ):
+        """Store the ranking of one method and tiebreaker combination in a csv file."""
+        header = [
+            "Path",
+            "Line number",
+            f"{method} score",
+            f"{tiebreaker} score",
+        ]
+        with report_writer.atomic_write(file_to_store) as outfile:
+            csv_writer = csv.writer(outfile)
+            csv_writer.writerow(header)
+            csv_writer.writerows(
+                [
+                    x.path,
+                    x.number,
+                    x.sus_scores[method],
+                    x.tiebreakers[tiebreaker],
+                ]
+                for x in ranked_lines
+            )
+
+    @staticmethod
+    def write_combined_eval_report(
+        file_to_store: str,
+        all_lines: List[line.Line],
+        rankings: Dict[Tuple[str, str], List[line.Line]],
+    ):
+        """Store the scores and ranks of every combination in one csv file.
+
+        Args:
+            file_to_store (str): path of the csv file
+            all_lines (List[line.Line]): lines to store, one row each
+            rankings (Dict[Tuple[str, str], List[line.Line]]): ranked lines keyed
+            by method and tiebreaker names
+        """
+        header = ["Path", "Line number"]
+        header.extend(f"{method} score" for method in METHOD_NAMES)
+        header.extend(f"{tiebreaker} score" for tiebreaker in TIEBREAKERS)
+        header.extend(f"{method}_{tiebreaker} rank" for method, tiebreaker in rankings)
+        # one column of ranks per combination, in the order of the rows
+        rank_columns = []
+        for ranked_lines in rankings.values():
+            ranks = {
+                id(line_obj): rank for rank, line_obj in enumerate(ranked_lines, 1)
+            }
+            rank_columns.append([ranks[id(line_obj)] for line_obj in all_lines])
+        with report_writer.atomic_write(file_to_store) as outfile:
+            csv_writer = csv.writer(outfile)
+            csv_writer.writerow(header)
+            for row_index, line_obj in enumerate(all_lines):
+                row = [line_obj.path, line_obj.number]
+                row.extend(line_obj.sus_scores[method] for method in METHOD_NAMES)
+                row.extend(line_obj.tiebreakers[name] for name in TIEBREAKERS)
+                row.extend(column[row_index] for column in rank_columns)
+                csv_writer.writerow(row)
 
     @staticmethod
     def generate_rankings(
-        all_lines: List[line.Line], method: str, tiebreaker="random"
+        all_lines: List[line.Line],
+        method: str,
+        tiebreaker: Union[str, List[str]] = "random",
     ) -> List[line.Line]:
         """Return a list of line objects ranked from the most to least suspicious.
 
         Args:
             method (str): name of the suspiciousness score to use for sorting
+            tiebreaker (Union[str, List[str]]): name of the tiebreaker, or a
+            cascade of tiebreakers applied in order
         """
-        # If random, just sort by the sus scores
-        if tiebreaker == "random":
-            # Introduce some randomness before sorting
+        if isinstance(tiebreaker, str):
+            tiebreaker = [tiebreaker]
+        cascade = [name for name in tiebreaker if name != line.RANDOM]
+        # If random, introduce some randomness before sorting so that the
+        # remaining ties end up in a random order
+        if len(cascade) < len(tiebreaker):
             random.shuffle(all_lines)
+        # If random only, just sort by the sus scores
+        if not cascade:
             all_lines.sort(
                 key=lambda x: x.sus_scores[method],
                 reverse=True,
             )
         # Otherwise, use the tiebreaker scores
+        elif len(cascade) == 1:
+            all_lines.sort(
+                key=lambda x: (x.sus_scores[method], x.tiebreakers[cascade[0]]),
+                reverse=True,
+            )
         else:
             all_lines.sort(
-                key=lambda x: (x.sus_scores[method], x.tiebreakers[tiebreaker]),
+                key=lambda x: (x.sus_scores[method],)
+                + tuple(x.tiebreakers[name] for name in cascade),
                 reverse=True,
             )
         # store the sorted list as an attribute
         return all_lines
 
+    @staticmethod
+    def select_top(
+        all_lines: List[line.Line],
+        method: str,
+        max_items: int,
+        tiebreaker: Union[str, List[str]] = "random",
+    ) -> List[line.Line]:
+        """Return the most suspicious lines without ranking every line.
+
+        The result is the same as the first `max_items` lines returned by
+        generate_rankings. With a random tiebreaker, only the lines tied with
+        the last selected line are sampled randomly.
+
+        Args:
+            all_lines (List[line.Line]): line objects to select from
+            method (str): name of the suspiciousness score to use for sorting
+            max_items (int): number of lines to select
+            tiebreaker (Union[str, List[str]]): name of the tiebreaker, or a
+            cascade of tiebreakers applied in order
+        """
+        if isinstance(tiebreaker, str):
+            tiebreaker = [tiebreaker]
+        cascade = [name for name in tiebreaker if name != line.RANDOM]
+
+        def rank_key(line_obj: line.Line) -> Tuple[float, ...]:
+            return (line_obj.sus_scores[method],) + tuple(
+                line_obj.tiebreakers[name] for name in cascade
+            )
+
+        if len(cascade) == len(tiebreaker):
+            # heap selection keeps the order of ties like a stable sort
+            return heapq.nlargest(max_items, all_lines, key=rank_key)
+        if max_items >= len(all_lines):
+            return Spectrum.generate_rankings(all_lines, method, tiebreaker)
+        cutoff_key = heapq.nlargest(max_items, map(rank_key, all_lines))[-1]
+        selected = []
+        cutoff_group = []
+        for line_obj in all_lines:
+            key = rank_key(line_obj)
+            if key > cutoff_key:
+                selected.append(line_obj)
+            elif key == cutoff_key:
+                cutoff_group.append(line_obj)
+        # every line above the cutoff is displayed, in a random order of ties
+        random.shuffle(selected)
+        selected.sort(key=rank_key, reverse=True)
+        selected.extend(random.sample(cutoff_group, max_items - len(selected)))
+        return selected
+
+    @staticmethod
+    def split_ties(
+        lines: List[line.Line],
+        key: Callable[[line.Line], float],
+        start: int,
+        max_items: int,
+    ) -> List[Tuple[int, List[line.Line]]]:
+        """Group lines by a ranking key and return the groups that stay tied.
+
+        Args:
+            lines (List[line.Line]): lines that share every previous ranking key
+            key (Callable[[line.Line], float]): next ranking key of a line
+            start (int): rank of the first line in the group
+            max_items (int): groups starting at or after this rank are dropped
+
+        Returns:
+            List[Tuple[int, List[line.Line]]]: rank of the first line and lines
+            of every group with more than one line
+        """
+        by_value: Dict[float, List[line.Line]] = {}
+        for line_obj in lines:
+            by_value.setdefault(key(line_obj), []).append(line_obj)
+        tied_groups = []
+        for value in sorted(by_value, reverse=True):
+            if start >= max_items:
+                break
+            group = by_value[value]
+            if len(group) > 1:
+                tied_groups.append((start, group))
+            start += len(group)
+        return tied_groups
+
+    @staticmethod
+    def calculate_tiebreakers(
+        pending: Dict[str, List[str]],
+        workers=1,
+        analysis_times: Optional[Dict[str, float]] = None,
+    ) -> Dict[str, Dict[str, Dict[int, Any]]]:
+        """Analyze files and return their tiebreaker datasets keyed by file name.
+
+        Args:
+            pending (Dict[str, List[str]]): names of the tiebreakers to
+            calculate for every file
+            workers (int): number of worker processes to use, the files are
+            analyzed in the current process when it's one
+            analysis_times (Dict[str, float], optional): seconds spent
+            analyzing every file, the time of new analyses is added to it
+        """
+        if workers <= 1 or len(pending) <= 1:
+            results = [
+                tiebreak_generator.calculate_timed_datasets(file_name, tiebreakers)
+                for file_name, tiebreakers in pending.items()
+            ]
+        else:
+            workers = min(workers, len(pending))
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers
+            ) as executor:
+                results = list(
+                    executor.map(
+                        tiebreak_generator.calculate_timed_datasets,
+                        pending.keys(),
+                        pending.values(),
+                    )
+                )
+        datasets = {}
+        for file_name, (file_datasets, seconds) in zip(pending, results):
+            datasets[file_name] = file_datasets
+            if analysis_times is not None:
+                analysis_times[file_name] = analysis_times.get(file_name, 0.0) + seconds
+        return datasets
+
     @staticmethod
     def calculate_severity(method: str, sus_score: float, rank: int, out_of: int):
         """Return a function to format strings according to score severity.
@@ -0,0 +1,126 @@
+"""Store the ranking of a spectrum in an indexed SQLite database."""
+
+import sqlite3
+
+from typing import Dict, Iterator, List, Tuple
+
+from afluent import coverage_matrix, line, report_writer
+
+METHODS = [line.TARAN, line.OCHIAI, line.OCHIAI2, line.DSTAR]
+TIEBREAKERS = [line.CYCLOMATIC, line.LOGICAL, line.ENHANCED]
+
+SCHEMA = [
+    "CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+    "CREATE TABLE files (id INTEGER PRIMARY KEY, path TEXT NOT NULL)",
+    "CREATE TABLE lines (id INTEGER PRIMARY KEY, file_id INTEGER NOT NULL, "
+    + "number INTEGER NOT NULL, passed_cover INTEGER NOT NULL, "
+    + "failed_cover INTEGER NOT NULL, skipped_cover INTEGER NOT NULL, "
+    + ", ".join(f"{method} REAL NOT NULL" for method in METHODS)
+    + ", "
+    + ", ".join(f"{tiebreaker} REAL NOT NULL" for tiebreaker in TIEBREAKERS)
+    + ")",
+    "CREATE TABLE rankings (method TEXT NOT NULL, rank INTEGER NOT NULL, "
+    + "line_id INTEGER NOT NULL, PRIMARY KEY (method, rank)) WITHOUT ROWID",
+    "CREATE TABLE tests (id INTEGER PRIMARY KEY, name TEXT NOT NULL, "
+    + "outcome TEXT NOT NULL)",
+    "CREATE TABLE coverage (line_id INTEGER NOT NULL, test_id INTEGER NOT NULL, "
+    + "PRIMARY KEY (line_id, test_id)) WITHOUT ROWID",
+]
+# created once the rows are inserted, which is faster than updating them per row
+INDEXES = [
+    "CREATE UNIQUE INDEX files_path ON files (path)",
+    "CREATE UNIQUE INDEX lines_location ON lines (file_id, number)",
+    "CREATE INDEX rankings_line ON rankings (line_id)",
+    "CREATE INDEX tests_name ON tests (name)",
+    "CREATE INDEX coverage_test ON coverage (test_id, line_id)",
+] + [f"CREATE INDEX lines_{method} ON lines ({method} DESC)" for method in METHODS]
+
+
+def write_report(
+    path: str,
+    ranked_lines: List[line.Line],
+    matrix: coverage_matrix.CoverageMatrix,
+    meta: Dict[str, str],
+) -> None:
+    """Store ranked lines, their scores and the test cases covering them.
+
+    The ranking is stored under the name of the method in `meta["method"]`.
+
+    The database is built in a temporary file that replaces the report once
+    it's complete, so journaling is turned off while writing.
+
+    Args:
+        path (str): path of the database file
+        ranked_lines (List[line.Line]): every line from the most to least suspicious
+        matrix (CoverageMatrix): registry of the test cases covering the lines
+        meta (Dict[str, str]): information about the ranking, like the method
+    """
+    with report_writer.replacing(path) as temp_path:
+        connection = sqlite3.connect(temp_path)
+        try:
+            connection.execute("PRAGMA journal_mode = OFF")
+            connection.execute("PRAGMA synchronous = OFF")
+            for statement in SCHEMA:
+                connection.execute(statement)
+            insert_rows(connection, ranked_lines, matrix, meta)
+            for statement in INDEXES:
+                connection.execute(statement)
+            connection.commit()
+        finally:
+            connection.close()
+
+
+def insert_rows(
+    connection: sqlite3.Connection,
+    ranked_lines: List[line.Line],
+    matrix: coverage_matrix.CoverageMatrix,
+    meta: Dict[str, str],
+) -> None:
+    """Insert the rows of every table, lines get their ids in the ranked order."""
+    connection.executemany("INSERT INTO meta VALUES (?, ?)", sorted(meta.items()))
+    file_ids: Dict[str, int] = {}
+    for line_obj in ranked_lines:
+        file_ids.setdefault(line_obj.path, len(file_ids) + 1)
+    connection.executemany(
+        "INSERT INTO files VALUES (?, ?)",
+        ((file_id, file_path) for file_path, file_id in file_ids.items()),
+    )
+    connection.executemany(
+        "INSERT INTO lines VALUES ("
+        + ", ".join("?" * (6 + len(METHODS) + len(TIEBREAKERS)))
+        + ")",
+        (
+            (
+                line_id,
+                file_ids[line_obj.path],
+                line_obj.number,
+                *line_obj.cover_counts,
+                *(line_obj.sus_scores[method] for method in METHODS),
+                *(line_obj.tiebreakers[tiebreaker] for tiebreaker in TIEBREAKERS),
+            )
+            for line_id, line_obj in enumerate(ranked_lines, 1)
+        ),
+    )
+    connection.executemany(
+        "INSERT INTO rankings VALUES (?, ?, ?)",
+        ((meta["method"], rank, rank) for rank in range(1, len(ranked_lines) + 1)),
+    )
+    connection.executemany(
+        "INSERT INTO tests VALUES (?, ?, ?)",
+        (
+            (test_id, name, coverage_matrix.OUTCOME_NAMES[matrix.outcome(test_id)])
+            for test_id, name in enumerate(matrix.names)
+        ),
+    )
+    connection.executemany(
+        "INSERT INTO coverage VALUES (?, ?)", membership(ranked_lines, matrix)
+    )
+
+
+def membership(
+    ranked_lines: List[line.Line], matrix: coverage_matrix.CoverageMatrix
+) -> Iterator[Tuple[int, int]]:
+    """Yield the line id and test case id of every line covered by a test case."""
+    for line_id, line_obj in enumerate(ranked_lines, 1):
+        for test_id in matrix.iter_ids(line_obj.row):
+            yield line_id, test_id
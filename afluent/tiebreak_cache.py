@@ -0,0 +1,113 @@
+"""Store tiebreaker datasets on disk keyed by the content of the analyzed file."""
+
+import hashlib
+import json
+import os
+import tempfile
+
+from typing import Any, Dict, Optional
+
+from afluent import tiebreak_generator
+
+# default size limit of the cache directory in bytes
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+ENTRY_SUFFIX = ".json"
+
+
+def content_hash(file_path: str) -> str:
+    """Return the sha256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as infile:
+        for chunk in iter(lambda: infile.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TiebreakCache:
+    """Keep tiebreaker datasets between sessions in a size-bounded directory."""
+
+    def __init__(self, directory: str, max_size: int = DEFAULT_MAX_SIZE) -> None:
+        """Initialize a cache object.
+
+        Args:
+            directory (str): path of the cache directory, created when missing
+            max_size (int, optional): size limit of the cache entries in bytes.
+            Defaults to DEFAULT_MAX_SIZE.
+        """
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(self.directory, exist_ok=True)
+
+    def entry_path(self, digest: str, tiebreaker: str) -> str:
+        """Return the path of the entry of one tiebreaker dataset.
+
+        Args:
+            digest (str): content hash of the analyzed file
+            tiebreaker (str): name of the tiebreaker
+        """
+        key = hashlib.sha256(
+            f"{tiebreak_generator.ANALYZER_VERSION}:{tiebreaker}:{digest}".encode(
+                "utf-8"
+            )
+        ).hexdigest()
+        return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+    def get(self, digest: str, tiebreaker: str) -> Optional[Dict[int, Any]]:
+        """Return a stored tiebreaker dataset or None if it isn't cached.
+
+        Args:
+            digest (str): content hash of the analyzed file
+            tiebreaker (str): name of the tiebreaker
+        """
+        path = self.entry_path(digest, tiebreaker)
+        try:
+            with open(path, "r", encoding="utf-8") as infile:
+                stored = json.load(infile)
+            # mark the entry as recently used for eviction
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return {int(line_number): value for line_number, value in stored.items()}
+
+    def put(self, digest: str, tiebreaker: str, data: Dict[int, Any]) -> None:
+        """Store a tiebreaker dataset, replacing the entry atomically.
+
+        Args:
+            digest (str): content hash of the analyzed file
+            tiebreaker (str): name of the tiebreaker
+            data (Dict[int, Any]): tiebreaker value of every line in the file
+        """
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, "w", encoding="utf-8") as outfile:
+                json.dump(data, outfile)
+            os.replace(temp_path, self.entry_path(digest, tiebreaker))
+        except OSError:
+            # a cache that can't be written to shouldn't stop the analysis
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def evict(self) -> None:
+        """Remove the least recently used entries until the cache fits its size limit."""
+        entries = []
+        total_size = 0
+        with os.scandir(self.directory) as directory_entries:
+            for entry in directory_entries:
+                if not entry.name.endswith(ENTRY_SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total_size += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                # another session sharing the directory removed it first
+                pass
+            total_size -= size
@@ -1,12 +1,20 @@
 """Define complexity generators and criteria to calculate complexity."""
 
-from typing import Any, Dict, List
+import time
+
+from typing import Any, Dict, List, Optional, Tuple
 import libcst as cst
 from libcst import metadata
 from libcst import matchers
 import radon  # type: ignore[import]
 import radon.complexity as cc  # type: ignore[import]
 
+from afluent import line
+
+# Version of the generated datasets, increase it whenever an analysis changes
+# so that cached datasets from older versions are no longer used
+ANALYZER_VERSION = "1"
+
 MUTANTS = [
     matchers.BitInvert,
     matchers.Not,
@@ -65,22 +73,94 @@ ENHANCED_MUTANTS = [
     matchers.Float,
 ] + MUTANTS
 
+LOGICAL_MUTANT_TYPES = frozenset(mutant.__name__ for mutant in MUTANTS)
+ENHANCED_MUTANT_TYPES = frozenset(mutant.__name__ for mutant in ENHANCED_MUTANTS)
+
+
+class MutantCounter(cst.CSTVisitor):
+    """Count the possible mutants of every subtree in a single traversal.
+
+    Counts are calculated bottom-up when leaving a node, so the total of a node
+    is its own match plus the totals of its children. Every node is only
+    visited once, no matter how many subtrees containing it are counted.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the counter with no counted subtrees."""
+        super().__init__()
+        # node -> (number of MUTANTS, number of ENHANCED_MUTANTS) in its subtree
+        self.totals: Dict[cst.CSTNode, Tuple[int, int]] = {}
+        self.stack: List[List[int]] = []
+
+    def on_visit(self, node: cst.CSTNode) -> bool:
+        """Skip subtrees that were already counted."""
+        if node in self.totals:
+            self.add_to_parent(self.totals[node])
+            return False
+        self.stack.append([0, 0])
+        return True
+
+    def on_leave(self, original_node: cst.CSTNode) -> None:
+        """Store the total of a node and add it to its parent."""
+        if original_node in self.totals:
+            return
+        logical, enhanced = self.stack.pop()
+        node_type = type(original_node).__name__
+        if node_type in LOGICAL_MUTANT_TYPES:
+            logical += 1
+        if node_type in ENHANCED_MUTANT_TYPES:
+            enhanced += 1
+        self.totals[original_node] = (logical, enhanced)
+        self.add_to_parent((logical, enhanced))
+
+    def add_to_parent(self, node_totals: Tuple[int, int]) -> None:
+        """Add the totals of a finished subtree to the node being visited."""
+        if self.stack:
+            self.stack[-1][0] += node_totals[0]
+            self.stack[-1][1] += node_totals[1]
+
+    def count(self, node: cst.CSTNode, mutant_set) -> int:
+        """Return the number of possible mutants of a set in a node.
+
+        Args:
+            node (CSTNode): root of the subtree to count
+            mutant_set (list): either MUTANTS or ENHANCED_MUTANTS
+        """
+        if node not in self.totals:
+            node.visit(self)
+        if mutant_set is MUTANTS:
+            return self.totals[node][0]
+        if mutant_set is ENHANCED_MUTANTS:
+            return self.totals[node][1]
+        # any other set of matchers falls back to searching the subtree
+        total = 0
+        for mutant in mutant_set:
+            total += len(matchers.findall(node, mutant()))
+        return total
+
 
 class FullVisitor(cst.CSTVisitor):
     """Locate specific nodes and organize by line number and calculate their complexity."""
 
     METADATA_DEPENDENCIES = (metadata.PositionProvider,)
 
-    def __init__(self, filler_dict: dict) -> None:
+    def __init__(
+        self, filler_dict: dict, counter: Optional[MutantCounter] = None
+    ) -> None:
         """Initialize the class as a visitor.
 
         Args:
             filler_dict (dict): empty dictionary containing all line numbers of
             a file.
+            counter (MutantCounter, optional): counter shared with other
+            visitors of the same module
         """
         super().__init__()
         self.mutants_by_location = filler_dict
         self.score: Dict[int, float] = {}
+        if counter is None:
+            counter = MutantCounter()
+        self.counter = counter
 
     def visit_If(self, node: cst.If) -> None:
         """Store the metadata of if statements when visited."""
@@ -119,7 +199,7 @@ class FullVisitor(cst.CSTVisitor):
             "start": self.get_metadata(metadata.PositionProvider, node).start.line,
             "end": self.get_metadata(metadata.PositionProvider, node).end.line,
             "type": node_type,
-            "complexity": COMPLEXITY_FUNC[node_type](node),
+            "complexity": COMPLEXITY_FUNC[node_type](node, self.counter),
         }
         return metadata_dict
 
@@ -168,60 +248,64 @@ class FullVisitor(cst.CSTVisitor):
         return round(score, 5)
 
     @staticmethod
-    def count_mutants(node, mutant_set):
+    def count_mutants(node, mutant_set, counter=None):
         """Count the number of possible mutants in a node using the MUTANTS variable."""
-        total = 0
-        for mutant in mutant_set:
-            total += len(matchers.findall(node, mutant()))
-        return total
+        if counter is None:
+            counter = MutantCounter()
+        return counter.count(node, mutant_set)
 
+    # pylint: disable=W0613
     @staticmethod
-    def get_funcdef_complexity(node):
+    def get_funcdef_complexity(node, counter=None):
         """Calculate the complexity of a function definition."""
         return len(node.params.params)
 
     @staticmethod
-    def get_if_complexity(node):
+    def get_if_complexity(node, counter=None):
         """Calculate the complexity of an if statement."""
         # complexity of if statement= number of mutants in the test condition
         if node.test:
-            total = FullVisitor.count_mutants(node.test, ENHANCED_MUTANTS)
+            total = FullVisitor.count_mutants(node.test, ENHANCED_MUTANTS, counter)
             return total
         return 0
 
     @staticmethod
-    def get_statement_complexity(node):
+    def get_statement_complexity(node, counter=None):
         """Calculate the complexity of a general statement."""
         # Complexity of a statement = number of mutants
-        total = FullVisitor.count_mutants(node, ENHANCED_MUTANTS)
+        total = FullVisitor.count_mutants(node, ENHANCED_MUTANTS, counter)
         return total
 
     @staticmethod
-    def get_while_complexity(node):
+    def get_while_complexity(node, counter=None):
         """Calculate the complexity of a while loop."""
         if node.test:
-            total = FullVisitor.count_mutants(node.test, ENHANCED_MUTANTS)
+            total = FullVisitor.count_mutants(node.test, ENHANCED_MUTANTS, counter)
             return total
         return 0
 
     @staticmethod
-    def get_for_complexity(node):
+    def get_for_complexity(node, counter=None):
         """Calculate the complexity of a for loop."""
         target_mutants = 0
         iterable_mutants = 0
         if node.target:
-            target_mutants = FullVisitor.count_mutants(node.target, ENHANCED_MUTANTS)
+            target_mutants = FullVisitor.count_mutants(
+                node.target, ENHANCED_MUTANTS, counter
+            )
         if node.iter:
-            iterable_mutants = FullVisitor.count_mutants(node.iter, ENHANCED_MUTANTS)
+            iterable_mutants = FullVisitor.count_mutants(
+                node.iter, ENHANCED_MUTANTS, counter
+            )
         return target_mutants + iterable_mutants
 
     @staticmethod
-    def get_with_complexity(node):
+    def get_with_complexity(node, counter=None):
         """Calculate the complexity of a with statement."""
         total = 0
         if node.items:
             for with_item in node.items:
-                total += FullVisitor.count_mutants(with_item, ENHANCED_MUTANTS)
+                total += FullVisitor.count_mutants(with_item, ENHANCED_MUTANTS, counter)
         return 0
 
 
@@ -240,15 +324,22 @@ class StatementVisitor(cst.CSTVisitor):
 
     METADATA_DEPENDENCIES = (metadata.PositionProvider,)
 
-    def __init__(self, filler_dict: dict) -> None:
+    def __init__(
+        self, filler_dict: dict, counter: Optional[MutantCounter] = None
+    ) -> None:
         """Initialize the class as a visitor.
 
         Args:
             filler_dict (dict): empty dictionary containing all line numbers of
             a file.
+            counter (MutantCounter, optional): counter shared with other
+            visitors of the same module
         """
         super().__init__()
         self.mutants_by_location = filler_dict
+        if counter is None:
+            counter = MutantCounter()
+        self.counter = counter
 
     def visit_SimpleStatementLine(self, node: cst.SimpleStatementLine) -> None:
         """Store the metadata of general statements when visited."""
@@ -265,7 +356,7 @@ class StatementVisitor(cst.CSTVisitor):
         }
         if node_type == "SimpleStatementLine":
             metadata_dict["complexity"] = StatementVisitor.get_statement_complexity(
-                node
+                node, self.counter
             )
         return metadata_dict
 
@@ -278,19 +369,34 @@ class StatementVisitor(cst.CSTVisitor):
                 self.mutants_by_location[line_num] = node_metadata["complexity"]
 
     @staticmethod
-    def get_statement_complexity(node):
+    def get_statement_complexity(node, counter=None):
         """Calculate the complexity of a general statement."""
         # Complexity of a statement = number of mutants
-        total = StatementVisitor.count_mutants(node)
+        total = StatementVisitor.count_mutants(node, counter)
         return total
 
     @staticmethod
-    def count_mutants(node):
+    def count_mutants(node, counter=None):
         """Count the number of possible mutants in a node using the MUTANTS variable."""
-        total = 0
-        for mutant in MUTANTS:
-            total += len(matchers.findall(node, mutant()))
-        return total
+        if counter is None:
+            counter = MutantCounter()
+        return counter.count(node, MUTANTS)
+
+
+def read_source(file_path: str) -> str:
+    """Read the text of a python file under test."""
+    with open(file_path, "r", encoding="utf-8") as infile:
+        return infile.read()
+
+
+def wrap_module(file_text: str) -> metadata.MetadataWrapper:
+    """Parse source text once and wrap it for metadata resolution.
+
+    The module is parsed here and never shared, so the wrapper can skip the
+    defensive deep copy it would otherwise make of the tree.
+    """
+    module_obj = cst.parse_module(file_text)
+    return metadata.MetadataWrapper(module_obj, unsafe_skip_copy=True)
 
 
 # pylint: disable=R0903
@@ -305,13 +411,27 @@ class EnhancedTieBreaker:
 
     def calculate_mutant_density(self):
         """Get the full file mutant density dataset."""
-        with open(self.path, "r", encoding="utf-8") as infile:
-            file_text = infile.read()
-            module_obj = cst.parse_module(file_text)
-        lines_num = len(file_text.splitlines())
-        filler_dict = {i: [] for i in range(1, lines_num + 1)}
-        wrapper = metadata.MetadataWrapper(module_obj)
-        finder = FullVisitor(filler_dict)
+        file_text = read_source(self.path)
+        self.calculate_from_module(wrap_module(file_text), len(file_text.splitlines()))
+
+    def calculate_from_module(
+        self,
+        wrapper: metadata.MetadataWrapper,
+        lines_num: int,
+        counter: Optional[MutantCounter] = None,
+    ):
+        """Get the full file mutant density dataset from an already parsed module.
+
+        Args:
+            wrapper (MetadataWrapper): parsed module of the file
+            lines_num (int): number of lines in the file
+            counter (MutantCounter, optional): mutant counts shared with other
+            tiebreakers of the same module
+        """
+        filler_dict: Dict[int, List[Dict[str, Any]]] = {
+            i: [] for i in range(1, lines_num + 1)
+        }
+        finder = FullVisitor(filler_dict, counter)
         wrapper.visit(finder)
         self.data = finder.mutants_by_location
         finder.calculate_score()
@@ -329,13 +449,25 @@ class LogicalTieBreaker:
 
     def calculate_mutant_density(self):
         """Get the full file mutant density dataset."""
-        with open(self.path, "r", encoding="utf-8") as infile:
-            file_text = infile.read()
-            module_obj = cst.parse_module(file_text)
-        lines_num = len(file_text.splitlines())
+        file_text = read_source(self.path)
+        self.calculate_from_module(wrap_module(file_text), len(file_text.splitlines()))
+
+    def calculate_from_module(
+        self,
+        wrapper: metadata.MetadataWrapper,
+        lines_num: int,
+        counter: Optional[MutantCounter] = None,
+    ):
+        """Get the full file mutant density dataset from an already parsed module.
+
+        Args:
+            wrapper (MetadataWrapper): parsed module of the file
+            lines_num (int): number of lines in the file
+            counter (MutantCounter, optional): mutant counts shared with other
+            tiebreakers of the same module
+        """
         filler_dict = {i: 0 for i in range(1, lines_num + 1)}
-        wrapper = metadata.MetadataWrapper(module_obj)
-        finder = StatementVisitor(filler_dict)
+        finder = StatementVisitor(filler_dict, counter)
         wrapper.visit(finder)
         self.score = finder.mutants_by_location
 
@@ -351,10 +483,16 @@ class CyclomaticComplexityGenerator:
 
     def calculate_syntax_complexity(self):
         """Get the full dataset for cyclomatic complexity."""
-        with open(self.path, "r", encoding="utf-8") as infile:
-            file_string = infile.read()
-            lines_num = len(file_string.splitlines())
-            complexity_data = cc.sorted_results(cc.cc_visit(file_string), cc.LINES)
+        self.calculate_from_source(read_source(self.path))
+
+    def calculate_from_source(self, file_string: str):
+        """Get the full dataset for cyclomatic complexity from the file text.
+
+        Args:
+            file_string (str): text of the file
+        """
+        lines_num = len(file_string.splitlines())
+        complexity_data = cc.sorted_results(cc.cc_visit(file_string), cc.LINES)
         filler_dict = {i: 0 for i in range(1, lines_num + 1)}
         # reassemble complexity data to follow this format
         # List(Tuple(line_start:int, line_end:int, complexity_score:int))
@@ -365,3 +503,72 @@ class CyclomaticComplexityGenerator:
                 for number in range(item.lineno, item.endline + 1):
                     filler_dict[number] = item.complexity
         self.data = filler_dict
+
+
+# pylint: disable=R0903
+class CombinedTieBreaker:
+    """Calculate several tiebreaker datasets from a single read and parse of a file."""
+
+    def __init__(self, file_path: str) -> None:
+        """Initialize the generator."""
+        self.path = file_path
+        self.data: Dict[str, Dict[int, Any]] = {}
+
+    def calculate_all(self, tiebreakers=(line.CYCLOMATIC, line.LOGICAL, line.ENHANCED)):
+        """Get the datasets of the requested tiebreakers.
+
+        The file is read once and parsed by libcst at most once, with position
+        metadata and mutant counts resolved a single time and shared by the
+        logical and enhanced visitors. Radon works on the same text for the
+        cyclomatic dataset.
+
+        Args:
+            tiebreakers (Iterable[str]): names of the tiebreakers to calculate
+        """
+        file_text = read_source(self.path)
+        lines_num = len(file_text.splitlines())
+        if line.LOGICAL in tiebreakers or line.ENHANCED in tiebreakers:
+            wrapper = wrap_module(file_text)
+            counter = MutantCounter()
+            if line.LOGICAL in tiebreakers:
+                logical_generator = LogicalTieBreaker(self.path)
+                logical_generator.calculate_from_module(wrapper, lines_num, counter)
+                self.data[line.LOGICAL] = logical_generator.score
+            if line.ENHANCED in tiebreakers:
+                enhanced_generator = EnhancedTieBreaker(self.path)
+                enhanced_generator.calculate_from_module(wrapper, lines_num, counter)
+                self.data[line.ENHANCED] = enhanced_generator.score
+        if line.CYCLOMATIC in tiebreakers:
+            cc_generator = CyclomaticComplexityGenerator(self.path)
+            cc_generator.calculate_from_source(file_text)
+            self.data[line.CYCLOMATIC] = cc_generator.data
+
+
+def calculate_datasets(
+    file_path: str, tiebreakers: List[str]
+) -> Dict[str, Dict[int, Any]]:
+    """Return the requested tiebreaker datasets of a file.
+
+    Defined at module level so that it can be sent to a process pool.
+
+    Args:
+        file_path (str): path of the file to analyze
+        tiebreakers (List[str]): names of the tiebreakers to calculate
+    """
+    generator = CombinedTieBreaker(file_path)
+    generator.calculate_all(tiebreakers)
+    return generator.data
+
+
+def calculate_timed_datasets(
+    file_path: str, tiebreakers: List[str]
+) -> Tuple[Dict[str, Dict[int, Any]], float]:
+    """Return the requested tiebreaker datasets of a file and the seconds they took.
+
+    Args:
+        file_path (str): path of the file to analyze
+        tiebreakers (List[str]): names of the tiebreakers to calculate
+    """
+    start = time.perf_counter()
+    datasets = calculate_datasets(file_path, tiebreakers)
+    return datasets, time.perf_counter() - start
@@ -0,0 +1,147 @@
+"""Measure the wall time and memory spent in the phases of a session."""
+
+import contextlib
+import gc
+import sys
+import threading
+import time
+import tracemalloc
+
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+
+class PhaseTimer:
+    """Accumulate the wall time of named phases.
+
+    Phases can be nested, the time of a nested phase is only counted once in
+    the nested phase and not in the phase around it. Phases are nested per
+    thread, so reports written in the background are measured on their own
+    and added to the same totals. When memory is traced
+    with tracemalloc, the high-water mark of the traced memory and the number
+    of objects are recorded at the end of every phase as well.
+    """
+
+    def __init__(self, trace_memory=False) -> None:
+        """Initialize a timer without any measured phase.
+
+        Args:
+            trace_memory (bool): record the memory of every phase while
+            tracemalloc is tracing
+        """
+        self.totals: Dict[str, float] = {}
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.trace_memory = trace_memory
+        self.memory: Dict[str, Dict[str, int]] = {}
+        # peak memory of every running phase before a nested phase reset it
+        self.peaks: List[int] = []
+
+    @property
+    def nested(self) -> List[float]:
+        """Time spent in the nested phases of every running phase of the current thread."""
+        if not hasattr(self.local, "nested"):
+            self.local.nested = []
+        return self.local.nested
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Measure the code running inside the context as part of a phase.
+
+        Args:
+            name (str): name of the phase, repeated phases are added up
+        """
+        # the traced peak is shared by all threads, only the main one records it
+        tracing = (
+            self.trace_memory
+            and tracemalloc.is_tracing()
+            and threading.current_thread() is threading.main_thread()
+        )
+        if tracing:
+            self.start_peak()
+        nested = self.nested
+        start = time.perf_counter()
+        nested.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.add(name, elapsed - nested.pop())
+            if nested:
+                nested[-1] += elapsed
+            if tracing:
+                self.mark(name, self.peaks.pop())
+
+    def start_peak(self) -> None:
+        """Keep the peak memory of the running phase and start measuring a new one."""
+        if not hasattr(tracemalloc, "reset_peak"):
+            # before Python 3.9 the peak covers everything since tracing started
+            self.peaks.append(0)
+            return
+        if self.peaks:
+            self.peaks[-1] = max(self.peaks[-1], tracemalloc.get_traced_memory()[1])
+        self.peaks.append(0)
+        tracemalloc.reset_peak()
+
+    def mark(self, name: str, peak_bytes: int = 0) -> None:
+        """Record the memory of a phase, keeping the highest peak of repeated phases.
+
+        Args:
+            name (str): name of the phase
+            peak_bytes (int): peak memory reached before the traced peak was last
+            reset during the phase
+        """
+        if not tracemalloc.is_tracing():
+            return
+        current_bytes, traced_peak = tracemalloc.get_traced_memory()
+        peak_bytes = max(peak_bytes, traced_peak)
+        if self.peaks:
+            # the peak of a nested phase is part of the phase around it
+            self.peaks[-1] = max(self.peaks[-1], peak_bytes)
+        previous = self.memory.get(name, {})
+        self.memory[name] = {
+            "peak_bytes": max(peak_bytes, previous.get("peak_bytes", 0)),
+            "current_bytes": current_bytes,
+            "objects": len(gc.get_objects()),
+        }
+
+    def add(self, name: str, seconds: float) -> None:
+        """Add time measured elsewhere to a phase."""
+        with self.lock:
+            self.totals[name] = self.totals.get(name, 0.0) + seconds
+
+    def merge(self, totals: Dict[str, float]) -> None:
+        """Add up the phases measured by another timer, like a pytest-xdist worker."""
+        for name, seconds in totals.items():
+            self.add(name, seconds)
+
+    def as_dict(self) -> Dict[str, float]:
+        """Return the time of every phase in seconds as a json writable dictionary."""
+        return {name: round(seconds, 6) for name, seconds in self.totals.items()}
+
+
+def deep_size(obj: Any, seen: Optional[Set[int]] = None) -> int:
+    """Return the approximate size in bytes of an object and the objects it contains.
+
+    Only containers of the builtin types are followed, objects shared by
+    several containers are counted once for the same set of seen ids.
+
+    Args:
+        obj (Any): object to measure
+        seen (Set[int], optional): ids of objects that were already counted
+    """
+    if seen is None:
+        seen = set()
+    size = 0
+    pending = [obj]
+    while pending:
+        current = pending.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+        if isinstance(current, dict):
+            pending.extend(current.keys())
+            pending.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            pending.extend(current)
+    return size
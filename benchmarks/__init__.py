@@ -0,0 +1 @@
+"""Measure the performance of AFLuent on synthetic spectra and modules."""
@@ -0,0 +1,196 @@
+"""Benchmark reassembling, scoring, ranking and reporting of synthetic spectra.
+
+Run with `python -m benchmarks.bench_spectrum --scale small --scale large`.
+"""
+
+import argparse
+import os
+import tempfile
+
+from typing import Any, Dict, List, Optional
+
+from afluent import spectrum_parser
+
+from benchmarks import harness, synthetic
+
+# number of test cases, files and lines per file of every preset scale, the
+# default density makes the largest scales reach millions of line entries
+SCALES = {
+    "small": {"tests_num": 50, "files_num": 5, "lines_per_file": 50},
+    "medium": {"tests_num": 200, "files_num": 10, "lines_per_file": 100},
+    "large": {"tests_num": 1000, "files_num": 20, "lines_per_file": 200},
+    "xlarge": {"tests_num": 2000, "files_num": 50, "lines_per_file": 200},
+}
+REPORTS = ["json", "csv", "sqlite", "eval"]
+# number of lines ranked by the top selection, like the default terminal report
+TOP_ITEMS = 20
+
+
+def run_pipeline(
+    config: Dict[str, Dict[str, Any]], reports: List[str], trace_memory=False
+) -> Dict[str, Dict[str, Any]]:
+    """Run every phase of the analysis once and return their measurements.
+
+    Reports are written to the current directory.
+
+    Args:
+        config (Dict[str, Dict[str, Any]]): per-test coverage information
+        reports (List[str]): types of the reports to store
+        trace_memory (bool): record the peak memory of every phase
+    """
+    measurements: Dict[str, Dict[str, Any]] = {}
+
+    def timed(phase, function, *args):
+        result, measurements[phase] = harness.measure(
+            function, *args, trace_memory=trace_memory
+        )
+        return result
+
+    spectrum_obj = spectrum_parser.Spectrum({})
+    spectrum_obj.config = config
+    timed("reassemble", spectrum_obj.reassemble)
+    timed("calculate_sus", spectrum_obj.calculate_sus)
+    all_lines = spectrum_obj.collect_lines()
+    spectrum_obj.sorted_lines = timed(
+        "generate_rankings",
+        spectrum_parser.Spectrum.generate_rankings,
+        all_lines,
+        "dstar",
+        "random",
+    )
+    timed(
+        "select_top",
+        spectrum_parser.Spectrum.select_top,
+        all_lines,
+        "dstar",
+        TOP_ITEMS,
+        "random",
+    )
+    for report in reports:
+        if report == "eval":
+            spectrum_obj.eval_mode = True
+            timed(
+                "tiebreakers",
+                spectrum_obj.load_tiebreakers,
+                spectrum_parser.TIEBREAKERS,
+            )
+        timed(f"store_report_{report}", spectrum_obj.store_report, report)
+    return measurements
+
+
+def benchmark_scale(
+    name: str,
+    parameters: Dict[str, Any],
+    reports: List[str],
+    repeat: int = 1,
+    trace_memory=True,
+) -> Dict[str, Any]:
+    """Measure every phase on the spectrum of one scale.
+
+    Args:
+        name (str): name of the scale in the results
+        parameters (Dict[str, Any]): keyword arguments of generate_spectrum
+        reports (List[str]): types of the reports to store
+        repeat (int): number of timed runs, the fastest one is reported
+        trace_memory (bool): add a run that records the peak memory of every phase
+    """
+    original_directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        # tiebreakers of the eval report need the files under test on disk
+        paths = synthetic.write_modules(
+            directory, parameters["files_num"], parameters["lines_per_file"]
+        )
+        config = synthetic.generate_spectrum(**parameters, paths=paths)
+        line_entries = sum(
+            len(covered_lines)
+            for test_info in config.values()
+            for covered_lines in test_info["coverage"].values()
+        )
+        harness.progress(f"{name}: {line_entries} line entries")
+        os.chdir(directory)
+        try:
+            timing_runs = [run_pipeline(config, reports) for _ in range(repeat)]
+            memory_run: Optional[Dict[str, Dict[str, Any]]] = None
+            if trace_memory:
+                memory_run = run_pipeline(config, reports, trace_memory=True)
+        finally:
+            os.chdir(original_directory)
+    return {
+        "scale": name,
+        "parameters": parameters,
+        "line_entries": line_entries,
+        "phases": harness.summarize(timing_runs, memory_run),
+    }
+
+
+def create_parser() -> argparse.ArgumentParser:
+    """Create the parser of the benchmark command line."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the spectrum analysis of AFLuent on synthetic spectra."
+    )
+    parser.add_argument(
+        "--scale",
+        dest="scales",
+        action="append",
+        choices=list(SCALES),
+        help="Preset size of the spectrum, can be repeated, default to small and medium.",
+    )
+    parser.add_argument(
+        "--tests", type=int, help="Number of test cases of a custom scale."
+    )
+    parser.add_argument("--files", type=int, help="Number of files of a custom scale.")
+    parser.add_argument("--lines", type=int, help="Lines per file of a custom scale.")
+    parser.add_argument(
+        "--failure-ratio",
+        type=float,
+        default=0.05,
+        help="Share of failing test cases, default to 0.05.",
+    )
+    parser.add_argument(
+        "--density",
+        type=float,
+        default=0.25,
+        help="Share of the lines of every file covered by a test case, default to 0.25.",
+    )
+    parser.add_argument(
+        "--reports",
+        nargs="*",
+        default=REPORTS,
+        choices=REPORTS,
+        help="Reports to store after ranking, default to all of them.",
+    )
+    harness.add_common_arguments(parser)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the benchmarks of the requested scales and store the results."""
+    args = create_parser().parse_args(argv)
+    scales = {name: dict(SCALES[name]) for name in args.scales or []}
+    custom = {
+        "tests_num": args.tests,
+        "files_num": args.files,
+        "lines_per_file": args.lines,
+    }
+    if any(value is not None for value in custom.values()):
+        # missing dimensions of a custom scale are taken from the small one
+        scales["custom"] = {
+            key: SCALES["small"][key] if value is None else value
+            for key, value in custom.items()
+        }
+    if not scales:
+        scales = {name: dict(SCALES[name]) for name in ("small", "medium")}
+    results = []
+    for name, parameters in scales.items():
+        parameters.update(failure_ratio=args.failure_ratio, density=args.density)
+        results.append(
+            benchmark_scale(
+                name, parameters, args.reports, max(1, args.repeat), args.trace_memory
+            )
+        )
+    harness.write_results(args.output, "spectrum", results)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,170 @@
+"""Benchmark the tiebreaker analyzers on modules of increasing size and nesting.
+
+Run with `python -m benchmarks.bench_tiebreak --case nested-deep`.
+"""
+
+import argparse
+import ast
+import os
+import tempfile
+
+from typing import Any, Dict, List, Optional
+
+from afluent import line, tiebreak_generator
+
+from benchmarks import harness, synthetic
+
+# number of functions, nesting depth and statements per block of every case
+CASES = {
+    "flat-small": {"functions": 10, "depth": 1, "statements": 5},
+    "flat-large": {"functions": 200, "depth": 1, "statements": 5},
+    "nested-medium": {"functions": 20, "depth": 4, "statements": 3},
+    "nested-deep": {"functions": 10, "depth": 12, "statements": 2},
+    "large": {"functions": 100, "depth": 6, "statements": 3},
+}
+DEFAULT_CASES = ["flat-small", "nested-medium", "nested-deep"]
+TIEBREAKERS = [line.CYCLOMATIC, line.LOGICAL, line.ENHANCED]
+
+
+def run_analyzers(path: str, trace_memory=False) -> Dict[str, Dict[str, Any]]:
+    """Run every analyzer once on a module and return the measurements of each step.
+
+    Parsing is measured apart from the visitors, every analyzer gets a module
+    of its own because a parsed module is only visited once.
+
+    Args:
+        path (str): path of the module to analyze
+        trace_memory (bool): record the peak memory of every step
+    """
+    measurements: Dict[str, Dict[str, Any]] = {}
+
+    def timed(step, function, *args):
+        result, measurements[step] = harness.measure(
+            function, *args, trace_memory=trace_memory
+        )
+        return result
+
+    file_text = tiebreak_generator.read_source(path)
+    lines_num = len(file_text.splitlines())
+    # radon parses the text itself, its visitor time is what's left of the total
+    timed("cyclomatic.parse", ast.parse, file_text)
+    timed(
+        "cyclomatic.analysis",
+        tiebreak_generator.CyclomaticComplexityGenerator(path).calculate_from_source,
+        file_text,
+    )
+    measurements["cyclomatic.visit"] = {
+        "seconds": max(
+            0.0,
+            round(
+                measurements["cyclomatic.analysis"]["seconds"]
+                - measurements["cyclomatic.parse"]["seconds"],
+                6,
+            ),
+        ),
+        "peak_bytes": measurements["cyclomatic.analysis"]["peak_bytes"],
+    }
+    for name, analyzer in (
+        (line.LOGICAL, tiebreak_generator.LogicalTieBreaker),
+        (line.ENHANCED, tiebreak_generator.EnhancedTieBreaker),
+    ):
+        wrapper = timed(f"{name}.parse", tiebreak_generator.wrap_module, file_text)
+        timed(f"{name}.visit", analyzer(path).calculate_from_module, wrapper, lines_num)
+    timed("combined", tiebreak_generator.calculate_datasets, path, TIEBREAKERS)
+    return measurements
+
+
+def benchmark_module(
+    name: str, path: str, repeat: int = 1, trace_memory=True
+) -> Dict[str, Any]:
+    """Measure every analyzer on one module.
+
+    Args:
+        name (str): name of the case in the results
+        path (str): path of the module to analyze
+        repeat (int): number of timed runs, the fastest one is reported
+        trace_memory (bool): add a run that records the peak memory of every step
+    """
+    with open(path, "r", encoding="utf-8") as infile:
+        lines_num = len(infile.read().splitlines())
+    harness.progress(f"{name}: {lines_num} lines")
+    timing_runs = [run_analyzers(path) for _ in range(repeat)]
+    memory_run: Optional[Dict[str, Dict[str, Any]]] = None
+    if trace_memory:
+        memory_run = run_analyzers(path, trace_memory=True)
+    return {
+        "case": name,
+        "lines": lines_num,
+        "phases": harness.summarize(timing_runs, memory_run),
+    }
+
+
+def create_parser() -> argparse.ArgumentParser:
+    """Create the parser of the benchmark command line."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the tiebreaker analyzers of AFLuent."
+    )
+    parser.add_argument(
+        "--case",
+        dest="cases",
+        action="append",
+        choices=list(CASES),
+        help="Generated module to analyze, can be repeated, default to "
+        + ", ".join(DEFAULT_CASES)
+        + ".",
+    )
+    parser.add_argument(
+        "--functions", type=int, help="Number of functions of a custom module."
+    )
+    parser.add_argument(
+        "--depth", type=int, help="Nesting depth of the functions of a custom module."
+    )
+    parser.add_argument(
+        "--statements", type=int, help="Statements per block of a custom module."
+    )
+    parser.add_argument(
+        "--module",
+        dest="modules",
+        action="append",
+        default=[],
+        help="Path of an existing python module to analyze, can be repeated.",
+    )
+    harness.add_common_arguments(parser)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the benchmarks of the requested modules and store the results."""
+    args = create_parser().parse_args(argv)
+    cases = {name: dict(CASES[name]) for name in args.cases or []}
+    custom = {
+        "functions": args.functions,
+        "depth": args.depth,
+        "statements": args.statements,
+    }
+    if any(value is not None for value in custom.values()):
+        # missing dimensions of a custom module are taken from the small one
+        cases["custom"] = {
+            key: CASES["flat-small"][key] if value is None else value
+            for key, value in custom.items()
+        }
+    if not cases and not args.modules:
+        cases = {name: dict(CASES[name]) for name in DEFAULT_CASES}
+    repeat = max(1, args.repeat)
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for name, parameters in cases.items():
+            path = os.path.join(directory, f"{name}.py")
+            with open(path, "w", encoding="utf-8") as outfile:
+                outfile.write(synthetic.generate_module(**parameters))
+            result = benchmark_module(name, path, repeat, args.trace_memory)
+            result["parameters"] = parameters
+            results.append(result)
+    for path in args.modules:
+        results.append(benchmark_module(path, path, repeat, args.trace_memory))
+    harness.write_results(args.output, "tiebreak", results)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,120 @@
+"""Measure wall time and peak memory of benchmark phases and store the results."""
+
+import argparse
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+from datetime import datetime, timezone
+from importlib import metadata
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+def measure(
+    function: Callable[..., Any], *args, trace_memory=False, **kwargs
+) -> Tuple[Any, Dict[str, Any]]:
+    """Run a function once and return its result with its wall time and peak memory.
+
+    Tracing allocations slows the function down, so the peak memory is only
+    recorded when asked for and the timing of that run shouldn't be used.
+
+    Args:
+        function (Callable[..., Any]): phase to measure
+        trace_memory (bool): record the peak of the memory allocated by the phase
+    """
+    gc.collect()
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = function(*args, **kwargs)
+    finally:
+        seconds = time.perf_counter() - start
+        peak_bytes = None
+        if trace_memory:
+            _, peak_bytes = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+    return result, {"seconds": round(seconds, 6), "peak_bytes": peak_bytes}
+
+
+def summarize(
+    timing_runs: List[Dict[str, Dict[str, Any]]],
+    memory_run: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Combine repeated timings and a traced run into one entry per phase.
+
+    Args:
+        timing_runs (List[Dict[str, Dict[str, Any]]]): measurements of every
+        phase for each untraced run
+        memory_run (Dict[str, Dict[str, Any]], optional): measurements of a run
+        that traced memory allocations
+    """
+    phases = {}
+    for phase in timing_runs[0]:
+        samples = [run[phase]["seconds"] for run in timing_runs]
+        phases[phase] = {
+            "seconds": min(samples),
+            "median_seconds": round(statistics.median(samples), 6),
+            "samples": samples,
+            "peak_bytes": memory_run[phase]["peak_bytes"] if memory_run else None,
+        }
+    return phases
+
+
+def environment() -> Dict[str, Any]:
+    """Describe the interpreter and the AFLuent version that ran the benchmarks."""
+    try:
+        version = metadata.version("afluent")
+    except metadata.PackageNotFoundError:
+        version = None
+    return {
+        "afluent": version,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def write_results(path: str, suite: str, results: List[Dict[str, Any]]) -> None:
+    """Store benchmark results as json, on the standard output when path is `-`.
+
+    Args:
+        path (str): path of the output file
+        suite (str): name of the benchmark suite
+        results (List[Dict[str, Any]]): measurements of every benchmark case
+    """
+    document = {"suite": suite, "environment": environment(), "results": results}
+    if path == "-":
+        json.dump(document, sys.stdout, indent=4)
+        print()
+        return
+    with open(path, "w+", encoding="utf-8") as outfile:
+        json.dump(document, outfile, indent=4)
+
+
+def add_common_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the options shared by every benchmark suite to its parser."""
+    parser.add_argument(
+        "--repeat", type=int, default=1, help="Number of timed runs, default to 1."
+    )
+    parser.add_argument(
+        "--no-memory",
+        dest="trace_memory",
+        action="store_false",
+        help="Skip the run that records the peak memory of every phase.",
+    )
+    parser.add_argument(
+        "--output",
+        default="-",
+        help="Path of the json results, default to the standard output.",
+    )
+
+
+def progress(message: str) -> None:
+    """Report the progress of a benchmark without mixing it with the results."""
+    print(message, file=sys.stderr, flush=True)
@@ -0,0 +1,141 @@
+"""Generate synthetic spectra and source files to run benchmarks on."""
+
+import os
+import random
+
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# pylint: disable=R0913
+def generate_spectrum(
+    tests_num: int,
+    files_num: int,
+    lines_per_file: int,
+    failure_ratio: float = 0.05,
+    density: float = 0.25,
+    *,
+    seed: int = 0,
+    paths: Optional[List[str]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Return per-test coverage in the format collected by the plugin.
+
+    Every test case covers a random sample of the lines of every file, and
+    every failing test case also covers a single faulty line.
+
+    Args:
+        tests_num (int): number of test cases
+        files_num (int): number of files under test
+        lines_per_file (int): number of lines in every file
+        failure_ratio (float): share of the test cases that fail, at least one
+        fails when it's positive
+        density (float): share of the lines of a file covered by every test case
+        seed (int): seed of the random generator, the same parameters and seed
+        always give the same spectrum
+        paths (List[str], optional): paths of the files, made up when missing
+    """
+    generator = random.Random(seed)
+    if paths is None:
+        paths = [f"synthetic/module_{index}.py" for index in range(files_num)]
+    covered_num = max(1, min(lines_per_file, round(lines_per_file * density)))
+    failed_num = 0
+    if failure_ratio > 0:
+        failed_num = max(1, round(tests_num * failure_ratio))
+    fault = (paths[0], generator.randint(1, lines_per_file))
+    spectrum = {}
+    for test_index in range(tests_num):
+        failed = test_index < failed_num
+        spectrum[f"test_synthetic.py_test_{test_index}"] = {
+            "coverage": generate_coverage(
+                generator, paths, lines_per_file, covered_num, fault if failed else None
+            ),
+            "result": "failed" if failed else "passed",
+        }
+    return spectrum
+
+
+def generate_coverage(
+    generator: random.Random,
+    paths: List[str],
+    lines_per_file: int,
+    covered_num: int,
+    fault: Optional[Tuple[str, int]] = None,
+) -> Dict[str, List[int]]:
+    """Return the sorted lines covered by one test case in every file.
+
+    Args:
+        generator (Random): source of the sampled lines
+        paths (List[str]): paths of the files
+        lines_per_file (int): number of lines in every file
+        covered_num (int): number of lines covered in every file
+        fault (Tuple[str, int], optional): path and number of a line that has
+        to be covered
+    """
+    coverage = {
+        path: generator.sample(range(1, lines_per_file + 1), covered_num)
+        for path in paths
+    }
+    if fault is not None and fault[1] not in coverage[fault[0]]:
+        coverage[fault[0]].append(fault[1])
+    for covered_lines in coverage.values():
+        covered_lines.sort()
+    return coverage
+
+
+def write_modules(directory: str, files_num: int, lines_per_file: int) -> List[str]:
+    """Write files under test with one statement per line and return their paths.
+
+    Args:
+        directory (str): directory to write the files in
+        files_num (int): number of files
+        lines_per_file (int): number of lines in every file
+    """
+    paths = []
+    for file_index in range(files_num):
+        path = os.path.join(directory, f"module_{file_index}.py")
+        with open(path, "w", encoding="utf-8") as outfile:
+            for line_number in range(1, lines_per_file + 1):
+                outfile.write(
+                    f"value_{line_number} = {line_number} * 2 + {line_number % 7}\n"
+                )
+        paths.append(os.path.abspath(path))
+    return paths
+
+
+# headers of the nested blocks of generated functions, cycled by depth
+BLOCKS = [
+    "if value > {depth} and total_{depth} != {depth}:",
+    "for item_{depth} in items:",
+    "while total_{depth} < value * {depth}:",
+    "with open(items[{depth}]) as handle_{depth}:",
+]
+
+
+def generate_module(functions: int, depth: int, statements: int) -> str:
+    """Return the text of a python module with nested blocks in every function.
+
+    Args:
+        functions (int): number of functions in the module
+        depth (int): number of blocks nested in every function
+        statements (int): number of statements in every block, each with
+        several operators that count as possible mutants
+    """
+    source_lines = []
+    for function_index in range(functions):
+        source_lines.append(f"def function_{function_index}(value, items):")
+        source_lines.append("    total_0 = value + 1")
+        for level in range(depth + 1):
+            indent = "    " * (level + 1)
+            if level > 0:
+                source_lines.append(
+                    "    " * level
+                    + BLOCKS[(level - 1) % len(BLOCKS)].format(depth=level - 1)
+                )
+                source_lines.append(f"{indent}total_{level} = total_{level - 1} + 1")
+            for statement in range(statements):
+                source_lines.append(
+                    f"{indent}result_{statement} = "
+                    + f"(total_{level} * {statement} - value) % 7 <= items[{statement}]"
+                )
+        source_lines.append("    return total_0")
+        source_lines.append("")
+    return "\n".join(source_lines) + "\n"
@@ -0,0 +1,178 @@
+"""Include test cases on aggregator module."""
+import json
+import sqlite3
+
+import pytest
+
+from afluent import aggregator, spectrum_parser
+
+CONFIG = {
+    "test_one": {
+        "coverage": {"tests/test_data/sample_file.py": [1, 2, 3, 4]},
+        "result": "failed",
+    },
+    "test_two": {
+        "coverage": {"tests/test_data/sample_file.py": [1, 2]},
+        "result": "passed",
+    },
+    "test_three": {
+        "coverage": {"tests/test_data/sample_file.py": [1, 5]},
+        "result": "skipped",
+    },
+    "test_four": {
+        "coverage": {"tests/test_data/sample_file.py": [3, 5]},
+        "result": "failed",
+    },
+}
+
+
+def line_summary(spectrum_object):
+    """Return the counts, scores and failing test cases of every line."""
+    return {
+        (line_obj.path, line_obj.number): (
+            line_obj.cover_counts,
+            line_obj.sus_scores,
+            sorted(line_obj.failed_by),
+        )
+        for line_obj in spectrum_object.collect_lines()
+    }
+
+
+def test_aggregator_matches_reassembled_spectrum():
+    """Check that folded test cases give the scores of a reassembled spectrum."""
+    aggregator_object = aggregator.SpectrumAggregator()
+    for test_name, test_info in CONFIG.items():
+        aggregator_object.add(test_name, test_info)
+    aggregator_object.close()
+    folded = aggregator_object.spectrum()
+    expected = spectrum_parser.Spectrum(CONFIG)
+    assert folded.totals == expected.totals
+    assert line_summary(folded) == line_summary(expected)
+    assert sorted(folded.matrix.names) == ["test_four", "test_one"]
+    assert not any(line_obj.passed_by for line_obj in folded.collect_lines())
+    # only pytest-xdist workers keep the coverage of failing test cases
+    assert not aggregator_object.failed_coverage
+
+
+def test_aggregator_merges_packed_workers():
+    """Check that the counters of several workers add up to a single session."""
+    workers = [
+        aggregator.SpectrumAggregator(keep_failed_coverage=True) for _ in range(2)
+    ]
+    for index, (test_name, test_info) in enumerate(CONFIG.items()):
+        workers[index % 2].add(test_name, test_info)
+    controller = aggregator.SpectrumAggregator()
+    for worker in workers:
+        worker.close()
+        controller.merge(worker.pack())
+    controller.close()
+    assert line_summary(controller.spectrum()) == line_summary(
+        spectrum_parser.Spectrum(CONFIG)
+    )
+
+
+def test_aggregator_raises_fold_errors():
+    """Check that an error on the worker thread is raised when closing."""
+    aggregator_object = aggregator.SpectrumAggregator()
+    aggregator_object.add("test_one", {"coverage": {}, "result": "unknown"})
+    with pytest.raises(Exception, match="Unable to aggregate"):
+        aggregator_object.close()
+
+
+def test_aggregator_takes_snapshots_after_first_failure():
+    """Check that snapshots start with the first failure and repeat every N tests."""
+    snapshots = []
+
+    def snapshot(aggregator_object, finished):
+        snapshots.append((dict(aggregator_object.totals), finished))
+
+    aggregator_object = aggregator.SpectrumAggregator(
+        snapshot_every=2, snapshot=snapshot
+    )
+    results = ["passed", "passed", "failed", "passed", "passed", "skipped"]
+    for index, result in enumerate(results):
+        aggregator_object.add(
+            f"test_{index}",
+            {"coverage": {"sample.py": [index + 1]}, "result": result},
+        )
+    aggregator_object.close()
+    assert snapshots == [
+        ({"passed": 2, "failed": 1, "skipped": 0}, False),
+        ({"passed": 4, "failed": 1, "skipped": 0}, False),
+        ({"passed": 4, "failed": 1, "skipped": 1}, True),
+    ]
+
+
+def test_aggregator_top_lines_match_ranking():
+    """Check that the live top lines are the head of the final ranking."""
+    aggregator_object = aggregator.SpectrumAggregator()
+    for test_name, test_info in CONFIG.items():
+        aggregator_object.add(test_name, test_info)
+    aggregator_object.close()
+    top_lines = aggregator_object.top_lines("ochiai", 3)
+    expected = spectrum_parser.Spectrum(CONFIG).rank_all_lines("ochiai")[:3]
+    assert [line_obj.sus_scores for line_obj in top_lines] == [
+        line_obj.sus_scores for line_obj in expected
+    ]
+    assert all(line_obj.failed_by for line_obj in top_lines)
+
+
+def test_aggregator_spectrum_prunes_lines():
+    """Check that lines without failing coverage are only counted when pruning."""
+    aggregator_object = aggregator.SpectrumAggregator()
+    for test_name, test_info in CONFIG.items():
+        aggregator_object.add(test_name, test_info)
+    aggregator_object.close()
+    pruned = aggregator_object.spectrum(prune=True)
+    assert sorted(line_obj.number for line_obj in pruned.collect_lines()) == [
+        1,
+        2,
+        3,
+        4,
+        5,
+    ]
+    assert not pruned.pruned_lines
+    aggregator_object.fold(
+        "test_five",
+        {"coverage": {"tests/test_data/sample_file.py": [6, 7]}, "result": "passed"},
+    )
+    pruned = aggregator_object.spectrum(prune=True)
+    assert pruned.pruned_lines == {"tests/test_data/sample_file.py": 2}
+
+
+def test_aggregated_reports_count_every_test_case(tmp_path, monkeypatch):
+    """Check that reports of an aggregated spectrum count the passed coverage."""
+    aggregator_object = aggregator.SpectrumAggregator()
+    for test_name, test_info in CONFIG.items():
+        aggregator_object.add(test_name, test_info)
+    aggregator_object.close()
+    folded = aggregator_object.spectrum()
+    monkeypatch.chdir(tmp_path)
+    folded.store_report("json")
+    folded.store_report("sqlite")
+    with open("afluent_report.json", "r", encoding="utf-8") as infile:
+        report = json.load(infile)
+    assert report["covering_tests"] == "failed"
+    first_line = next(entry for entry in report["ranking"] if entry["number"] == 1)
+    assert first_line["passed_by"] == []
+    assert first_line["cover_counts"] == {"passed": 1, "failed": 1, "skipped": 1}
+    with sqlite3.connect("afluent_report.sqlite") as connection:
+        meta = dict(connection.execute("SELECT key, value FROM meta"))
+        counts = connection.execute(
+            "SELECT passed_cover, failed_cover, skipped_cover FROM lines "
+            + "WHERE number = 1"
+        ).fetchone()
+    assert meta["covering_tests"] == "failed"
+    assert counts == (1, 1, 1)
+    assert spectrum_parser.Spectrum(CONFIG).covering_tests() == "all"
+
+
+def test_top_lines_without_passed_tests():
+    """Check that live rankings score every line when no test case passed yet."""
+    aggregator_object = aggregator.SpectrumAggregator()
+    aggregator_object.add("test_one", CONFIG["test_one"])
+    aggregator_object.add("test_three", CONFIG["test_three"])
+    aggregator_object.close()
+    top = aggregator_object.top_lines("tarantula", 10)
+    assert sorted(line_obj.number for line_obj in top) == [1, 2, 3, 4, 5]
+    assert {line_obj.sus_scores["tarantula"] for line_obj in top} == {1}
@@ -0,0 +1,83 @@
+"""Include test cases on the benchmark suites."""
+
+import ast
+import json
+
+from benchmarks import bench_spectrum, bench_tiebreak, synthetic
+
+
+def test_generate_spectrum_parameters():
+    """Check that a synthetic spectrum follows its parameters and seed."""
+    spectrum = synthetic.generate_spectrum(20, 3, 40, failure_ratio=0.1, density=0.5)
+    assert len(spectrum) == 20
+    assert [test_info["result"] for test_info in spectrum.values()].count("failed") == 2
+    for test_info in spectrum.values():
+        assert len(test_info["coverage"]) == 3
+        for covered_lines in test_info["coverage"].values():
+            assert covered_lines == sorted(covered_lines)
+            assert 20 <= len(covered_lines) <= 21
+    assert spectrum == synthetic.generate_spectrum(
+        20, 3, 40, failure_ratio=0.1, density=0.5
+    )
+
+
+def test_spectrum_benchmark_writes_results(tmp_path):
+    """Check that every phase of a custom scale is measured and stored as json."""
+    output = tmp_path / "results.json"
+    assert (
+        bench_spectrum.main(
+            ["--tests", "10", "--files", "2", "--lines", "20", "--output", str(output)]
+        )
+        == 0
+    )
+    results = json.loads(output.read_text(encoding="utf-8"))
+    assert results["suite"] == "spectrum"
+    assert [result["scale"] for result in results["results"]] == ["custom"]
+    phases = results["results"][0]["phases"]
+    assert {
+        "reassemble",
+        "calculate_sus",
+        "generate_rankings",
+        "tiebreakers",
+        "store_report_eval",
+    } <= set(phases)
+    assert all(phase["peak_bytes"] > 0 for phase in phases.values())
+
+
+def test_generate_module_nesting():
+    """Check that a generated module parses with the requested nesting depth."""
+    module_text = synthetic.generate_module(3, 6, 2)
+    functions = ast.parse(module_text).body
+    assert len(functions) == 3
+    block = functions[0]
+    depth = 0
+    while any(
+        isinstance(node, (ast.If, ast.For, ast.While, ast.With)) for node in block.body
+    ):
+        block = [
+            node
+            for node in block.body
+            if isinstance(node, (ast.If, ast.For, ast.While, ast.With))
+        ][0]
+        depth += 1
+    assert depth == 6
+
+
+def test_tiebreak_benchmark_writes_results(tmp_path):
+    """Check that parsing and visiting are measured apart for every analyzer."""
+    output = tmp_path / "results.json"
+    module_path = tmp_path / "module.py"
+    module_path.write_text(synthetic.generate_module(2, 2, 2), encoding="utf-8")
+    assert (
+        bench_tiebreak.main(
+            ["--module", str(module_path), "--no-memory", "--output", str(output)]
+        )
+        == 0
+    )
+    results = json.loads(output.read_text(encoding="utf-8"))
+    assert results["suite"] == "tiebreak"
+    phases = results["results"][0]["phases"]
+    for analyzer in ("cyclomatic", "logical", "enhanced"):
+        assert f"{analyzer}.parse" in phases
+        assert f"{analyzer}.visit" in phases
+    assert phases["combined"]["peak_bytes"] is None
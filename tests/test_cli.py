@@ -0,0 +1,76 @@
+"""Include test cases on cli module."""
+import json
+import os
+
+import pytest
+
+from afluent import cli, spectrum_io, spectrum_parser
+
+SAMPLE_FILE = os.path.abspath("tests/test_data/sample_file.py")
+CONFIG = {
+    "test_one": {
+        "coverage": {SAMPLE_FILE: [1, 2, 3, 4]},
+        "result": "failed",
+    },
+    "test_two": {
+        "coverage": {SAMPLE_FILE: [1, 2, 5]},
+        "result": "passed",
+    },
+}
+
+
+@pytest.mark.parametrize("saved_format", ["json", "log", "binary"])
+def test_cli_stores_report_from_saved_spectrum(
+    saved_format, tmp_path, monkeypatch, capsys
+):
+    """Check that every saved spectrum format is ranked and reported offline."""
+    spectrum_path = str(tmp_path / "spectrum")
+    if saved_format == "json":
+        with open(spectrum_path, "w", encoding="utf-8") as outfile:
+            json.dump(CONFIG, outfile, indent=4)
+    elif saved_format == "log":
+        spectrum_log = spectrum_io.SpectrumLog(spectrum_path)
+        for test_name, test_info in CONFIG.items():
+            spectrum_log.append(test_name, test_info)
+        spectrum_log.close()
+    else:
+        spectrum_io.write_binary_spectrum(
+            spectrum_path, spectrum_parser.Spectrum(CONFIG)
+        )
+    monkeypatch.chdir(tmp_path)
+    exit_status = cli.main(
+        [spectrum_path, "--ochiai", "--tiebreaker", "logical", "--report", "csv"]
+    )
+    assert exit_status == 0
+    assert "AFLuent Report" in capsys.readouterr().out
+    with open("afluent_report.csv", encoding="utf-8") as infile:
+        assert len(infile.readlines()) == 6
+
+
+def test_cli_saves_binary_spectrum(tmp_path, monkeypatch):
+    """Check that the command line converts a per-test report to a binary spectrum."""
+    report_path = str(tmp_path / "report.json")
+    with open(report_path, "w", encoding="utf-8") as outfile:
+        json.dump(CONFIG, outfile)
+    monkeypatch.chdir(tmp_path)
+    assert cli.main([report_path, "--save", "spectrum.afl"]) == 0
+    loaded = spectrum_io.read_binary_spectrum("spectrum.afl")
+    assert loaded.totals == {"passed": 1, "failed": 1, "skipped": 0}
+
+
+def test_cli_saves_unpruned_spectrum(tmp_path, monkeypatch):
+    """Check that pruning the ranking keeps every line in the saved spectrum."""
+    report_path = str(tmp_path / "report.json")
+    with open(report_path, "w", encoding="utf-8") as outfile:
+        json.dump(CONFIG, outfile)
+    monkeypatch.chdir(tmp_path)
+    assert cli.main([report_path, "--prune", "--save", "spectrum.afl"]) == 0
+    loaded = spectrum_io.read_binary_spectrum("spectrum.afl", prune=False)
+    assert list(loaded.reassembled_data[SAMPLE_FILE].lines) == [1, 2, 3, 4, 5]
+
+
+def test_cli_rejects_unknown_tiebreaker(capsys):
+    """Check that an unknown tiebreaker in a cascade is rejected."""
+    with pytest.raises(SystemExit):
+        cli.main(["spectrum.afl", "--tiebreaker", "logical,something"])
+    assert "invalid choice" in capsys.readouterr().err
@@ -0,0 +1,124 @@
+"""Include test cases on collectors module."""
+import inspect
+import os
+import sys
+import threading
+
+import pytest
+
+from afluent import collectors
+
+
+def measured_function(value):
+    """Return a value after running a few lines to measure."""
+    doubled = value * 2
+    if doubled > 10:
+        return doubled
+    return value
+
+
+def body_lines():
+    """Return the line numbers of the statements in measured_function."""
+    first_line = inspect.getsourcelines(measured_function)[1]
+    return {first_line + offset for offset in (2, 3, 5)}
+
+
+def measure(collector):
+    """Measure a call of measured_function and return its covered lines."""
+    session_spectrum = {}
+    collector.start_test("test_case")
+    measured_function(3)
+    session_spectrum["test_case"] = {
+        "coverage": collector.stop_test("test_case"),
+        "result": "passed",
+    }
+    collector.finish(session_spectrum)
+    return set(session_spectrum["test_case"]["coverage"][os.path.abspath(__file__)])
+
+
+@pytest.mark.parametrize("name", [collectors.COVERAGE, collectors.CONTEXTS])
+def test_coverage_collectors_measure_lines(name):
+    """Check that coverage based collectors measure the lines of a call."""
+    collector = collectors.create_collector(name)
+    assert collector.name == name
+    assert body_lines() <= measure(collector)
+    assert collector.tracer() in ("CTracer", "PyTracer")
+    overhead = collector.overhead()
+    assert set(overhead) == {"start", "stop", "extract"}
+    assert all(seconds > 0 for seconds in overhead.values())
+
+
+def test_context_collector_separates_test_cases():
+    """Check that every test case gets exactly the lines it ran with contexts."""
+    collector = collectors.create_collector(collectors.CONTEXTS)
+    first_line = inspect.getsourcelines(measured_function)[1]
+    function_lines = set(range(first_line, first_line + 6))
+    session_spectrum = {}
+    for test_name, value in (("test_small", 3), ("test_large", 12)):
+        collector.start_test(test_name)
+        measured_function(value)
+        session_spectrum[test_name] = {
+            "coverage": collector.stop_test(test_name),
+            "result": "passed",
+        }
+        # runs between test cases, outside of their contexts
+        measured_function(0)
+    collector.finish(session_spectrum)
+    covered = {
+        test_name: set(test_info["coverage"][os.path.abspath(__file__)])
+        & function_lines
+        for test_name, test_info in session_spectrum.items()
+    }
+    assert covered == {
+        "test_small": {first_line + offset for offset in (2, 3, 5)},
+        "test_large": {first_line + offset for offset in (2, 3, 4)},
+    }
+
+
+@pytest.mark.skipif(
+    not hasattr(sys, "monitoring"), reason="sys.monitoring requires Python 3.12"
+)
+def test_monitoring_collector_measures_lines():
+    """Check that the sys.monitoring collector measures the lines of a call."""
+    collector = collectors.create_collector(collectors.MONITORING)
+    assert collector.describe() == "monitoring (sys.monitoring)"
+    assert body_lines() <= measure(collector)
+
+
+@pytest.mark.skipif(
+    not hasattr(sys, "monitoring"), reason="sys.monitoring requires Python 3.12"
+)
+def test_monitoring_collector_ignores_threads():
+    """Check that lines run by an ignored thread are left to the test case."""
+    collector = collectors.create_collector(collectors.MONITORING)
+    release = threading.Event()
+
+    def run_ignored():
+        release.wait()
+        measured_function(3)
+
+    ignored = threading.Thread(target=run_ignored)
+    ignored.start()
+    collector.ignore_thread(ignored.ident)
+    collector.start_test("test_case")
+    release.set()
+    ignored.join()
+    assert os.path.abspath(__file__) not in collector.measured
+    measured_function(3)
+    coverage_lines = collector.stop_test("test_case")
+    collector.finish({})
+    assert body_lines() <= set(coverage_lines[os.path.abspath(__file__)])
+
+
+def test_monitoring_collector_requires_python_312():
+    """Check that an error is thrown when sys.monitoring isn't available."""
+    if hasattr(sys, "monitoring"):
+        pytest.skip("sys.monitoring is available")
+    with pytest.raises(Exception):
+        collectors.create_collector(collectors.MONITORING)
+
+
+def test_create_collector_throws_error():
+    """Check that an error is thrown when an unknown collector is requested."""
+    with pytest.raises(Exception):
+        collectors.create_collector("something")
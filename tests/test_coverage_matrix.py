@@ -0,0 +1,42 @@
+"""Test the coverage_matrix module and CoverageMatrix class."""
+
+import pytest
+
+from afluent import coverage_matrix
+
+
+def test_add_test_registers_names():
+    """Check that test cases get consecutive ids and keep their outcome."""
+    matrix = coverage_matrix.CoverageMatrix()
+    assert matrix.add_test("test1", "passed") == 0
+    assert matrix.add_test("test2", "failed") == 1
+    assert matrix.add_test("test3", "skipped") == 2
+    assert matrix.add_test("test1", "passed") == 0
+    assert len(matrix) == 3
+    assert matrix.outcome(0) == coverage_matrix.PASSED
+    assert matrix.outcome(1) == coverage_matrix.FAILED
+    assert matrix.outcome(2) == coverage_matrix.SKIPPED
+
+
+def test_add_test_unknown_result():
+    """Check that an error is thrown when an unknown result is passed."""
+    matrix = coverage_matrix.CoverageMatrix()
+    with pytest.raises(Exception):
+        matrix.add_test("test1", "notSet")
+
+
+def test_names_for():
+    """Check that names are recovered from a bitset row by outcome."""
+    matrix = coverage_matrix.CoverageMatrix()
+    for index in range(20):
+        matrix.add_test(f"test{index}", "failed" if index % 3 == 0 else "passed")
+    # bits 0, 3, 9 and 17 are set
+    row = bytearray([0b00001001, 0b00000010, 0b00000010])
+    assert list(matrix.iter_ids(row)) == [0, 3, 9, 17]
+    assert matrix.names_for(row, coverage_matrix.FAILED) == [
+        "test0",
+        "test3",
+        "test9",
+    ]
+    assert matrix.names_for(row, coverage_matrix.PASSED) == ["test17"]
+    assert not matrix.names_for(row, coverage_matrix.SKIPPED)
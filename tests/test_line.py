@@ -2,7 +2,7 @@
 
 import pytest
 
-from afluent import line
+from afluent import coverage_matrix, line
 
 
 def test_globals():
@@ -146,3 +146,24 @@ def test_sus_text():
 # def test_something():
 #     """Purposefully fail to check report."""
 #     assert False
+
+
+def test_line_cover_shared_matrix():
+    """Check that lines sharing a matrix count and name their covering tests."""
+    matrix = coverage_matrix.CoverageMatrix()
+    first_line = line.Line("sample/path/to/file.py", 14, matrix)
+    second_line = line.Line("sample/path/to/file.py", 15, matrix)
+    first_id = matrix.add_test("test1", "passed")
+    second_id = matrix.add_test("test2", "failed")
+    first_line.cover(first_id)
+    first_line.cover(second_id)
+    first_line.cover(second_id)
+    second_line.cover(second_id)
+    assert first_line.passed_cover == 1
+    assert first_line.failed_cover == 1
+    assert second_line.passed_cover == 0
+    assert second_line.failed_cover == 1
+    assert first_line.as_dict()["passed_by"] == ["test1"]
+    assert first_line.as_dict()["failed_by"] == ["test2"]
+    assert second_line.as_dict()["failed_by"] == ["test2"]
+    assert not second_line.as_dict()["skipped_by"]
@@ -0,0 +1,179 @@
+"""Include test cases on the hooks of the main module."""
+
+import json
+from types import SimpleNamespace
+
+from afluent import main, spectrum_io
+
+WORKER_SPECTRA = [
+    {
+        "test_a": {"coverage": {"src/one.py": [1, 2]}, "result": "passed"},
+        "test_b": {"coverage": {"src/one.py": [2, 3]}, "result": "failed"},
+    },
+    {
+        "test_c": {
+            "coverage": {"src/one.py": [2], "src/two.py": [5]},
+            "result": "failed",
+        },
+    },
+]
+
+
+class OptionRecorder:
+    """Record the default of every option added by the plugin."""
+
+    def __init__(self):
+        """Initialize a recorder without options."""
+        self.defaults = {}
+
+    def getgroup(self, *args):  # pylint: disable=W0613
+        """Return the recorder as the group of the options."""
+        return self
+
+    def addoption(self, *args, **kwargs):  # pylint: disable=W0613
+        """Keep the default of the option, the first one added for its dest."""
+        self.defaults.setdefault(kwargs["dest"], kwargs.get("default"))
+
+
+# pylint: disable=R0903
+class FakeConfig:
+    """Provide the options of a pytest configuration."""
+
+    def __init__(self, workerinput=None, **options):
+        """Initialize a configuration with the default options, updated by options."""
+        recorder = OptionRecorder()
+        main.pytest_addoption(recorder)
+        self.options = {**recorder.defaults, **options}
+        self.cache = None
+        if workerinput is not None:
+            self.workerinput = workerinput
+            self.workeroutput = {}
+
+    def getoption(self, name):
+        """Return the value of an option."""
+        return self.options[name]
+
+
+def worker_node(plugin):
+    """Return a pytest-xdist node carrying the output sent by a worker plugin."""
+    workeroutput = {}
+    plugin.send_worker_output(workeroutput)
+    return SimpleNamespace(workeroutput=workeroutput)
+
+
+def test_testnodedown_merges_worker_spectra():
+    """Check that the spectra and node ids of every worker are merged."""
+    controller = main.Afluent(FakeConfig(afl_reuse=True))
+    for worker_id, worker_spectrum in enumerate(WORKER_SPECTRA):
+        worker = main.Afluent(
+            FakeConfig(workerinput={"workerid": f"gw{worker_id}"}, afl_reuse=True)
+        )
+        worker.session_spectrum.update(worker_spectrum)
+        worker.test_nodes = {
+            test_name: [f"test_file.py::{test_name}", "test_file.py"]
+            for test_name in worker_spectrum
+        }
+        worker.reused_nodes = {f"test_reused.py::test_{worker_id}"}
+        controller.pytest_testnodedown(worker_node(worker), None)
+    assert set(controller.session_spectrum) == {"test_a", "test_b", "test_c"}
+    assert controller.session_spectrum["test_c"] == {
+        "coverage": {"src/one.py": [2], "src/two.py": [5]},
+        "result": "failed",
+    }
+    assert set(controller.test_nodes) == {"test_a", "test_b", "test_c"}
+    assert controller.reused_nodes == {
+        "test_reused.py::test_0",
+        "test_reused.py::test_1",
+    }
+
+
+def test_testnodedown_merges_worker_aggregates():
+    """Check that the counters aggregated by every worker are added up."""
+    controller = main.Afluent(FakeConfig(afl_incremental=True))
+    for worker_id, worker_spectrum in enumerate(WORKER_SPECTRA):
+        config = FakeConfig(
+            workerinput={"workerid": f"gw{worker_id}"}, afl_incremental=True
+        )
+        worker = main.Afluent(config)
+        for test_name, test_info in worker_spectrum.items():
+            worker.aggregator.add(test_name, test_info)
+        worker.finish_collection()
+        controller.pytest_testnodedown(worker_node(worker), None)
+    controller.aggregator.close()
+    assert controller.aggregator.totals == {"passed": 1, "failed": 2, "skipped": 0}
+    assert controller.aggregator.rows["src/one.py"][2][1] == [1, 2, 0]
+    assert controller.aggregator.rows["src/two.py"][5][1] == [0, 1, 0]
+    assert set(controller.aggregator.matrix.names) == {"test_b", "test_c"}
+
+
+def test_testnodedown_without_output():
+    """Check that a node without output, like a crashed worker, is ignored."""
+    controller = main.Afluent(FakeConfig())
+    controller.pytest_testnodedown(SimpleNamespace(), None)
+    controller.pytest_testnodedown(SimpleNamespace(workeroutput={}), None)
+    assert not controller.session_spectrum
+    assert not controller.test_nodes
+
+
+def test_sessionfinish_of_worker_sends_output():
+    """Check that a worker sends its spectrum instead of ranking the lines."""
+    config = FakeConfig(workerinput={"workerid": "gw0"})
+    worker = main.Afluent(config)
+    worker.session_spectrum.update(WORKER_SPECTRA[0])
+    worker.pytest_sessionfinish(SimpleNamespace(config=config), 1)
+    assert (
+        spectrum_io.unpack_spectrum(config.workeroutput[main.WORKER_OUTPUT_KEY])
+        == WORKER_SPECTRA[0]
+    )
+    assert main.WORKER_TIMINGS_KEY in config.workeroutput
+    assert main.WORKER_NODES_KEY not in config.workeroutput
+
+
+def test_logged_tests_are_streamed(tmp_path, monkeypatch):
+    """Check that logged test cases are read from the log instead of memory."""
+    monkeypatch.chdir(tmp_path)
+    plugin = main.Afluent(
+        FakeConfig(afl_log=str(tmp_path / "spectrum.jsonl"), per_test=True)
+    )
+    for test_name, test_info in WORKER_SPECTRA[0].items():
+        plugin.log.append(test_name, test_info)
+    plugin.session_spectrum.update(WORKER_SPECTRA[1])
+    plugin.finish_collection()
+    assert not plugin.session_spectrum
+    full_spectrum = plugin.create_spectrum()
+    assert full_spectrum.totals == {"passed": 1, "failed": 2, "skipped": 0}
+    plugin.write_per_test_report()
+    with open("afluent_per_test_report.json", "r", encoding="utf-8") as infile:
+        assert json.load(infile) == {**WORKER_SPECTRA[0], **WORKER_SPECTRA[1]}
+
+
+def test_timings_list_unfinished_reports(tmp_path, monkeypatch):
+    """Check that the reports not written in time are recorded in the timings."""
+    monkeypatch.chdir(tmp_path)
+    main.Afluent(FakeConfig()).store_timings(1.0, 0.5, unfinished=["json report"])
+    with open("afluent_timings.json", "r", encoding="utf-8") as infile:
+        assert json.load(infile)["unfinished_reports"] == ["json report"]
+
+
+def test_aggregator_conflict_names_given_option(capsys):
+    """Check that the warning about a conflicting option names the option given."""
+    plugin = main.Afluent(FakeConfig(afl_live=5, per_test=True))
+    assert plugin.aggregator is None
+    assert "--afl-live can't be used with --per-test-report" in capsys.readouterr().out
+    plugin = main.Afluent(FakeConfig(afl_incremental=True, per_test=True))
+    assert plugin.aggregator is None
+    assert "--afl-incremental can't be used" in capsys.readouterr().out
+
+
+def test_pruned_session_saves_every_line(tmp_path, monkeypatch):
+    """Check that the spectrum file of a pruned session keeps the pruned lines."""
+    monkeypatch.chdir(tmp_path)
+    config = FakeConfig(afl_prune=True, afl_spectrum_file="spectrum.afl")
+    config.pluginmanager = SimpleNamespace(
+        get_plugin=lambda name: SimpleNamespace(_sessionstarttime=0.0)
+    )
+    plugin = main.Afluent(config)
+    plugin.session_spectrum.update(WORKER_SPECTRA[0])
+    plugin.pytest_sessionfinish(SimpleNamespace(config=config), 1)
+    loaded = spectrum_io.read_binary_spectrum("spectrum.afl")
+    assert list(loaded.reassembled_data["src/one.py"].lines) == [1, 2, 3]
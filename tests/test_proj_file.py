@@ -127,6 +127,37 @@ def test_get_datasets():
     }
 
 
+def test_get_tiebreaker_datasets_single_parse():
+    """Check that the combined analysis matches the separate datasets."""
+    separate_projfile = proj_file.ProjFile("./tests/test_data/sample_file.py")
+    separate_projfile.get_cyclomatic_tiebreaker_dataset()
+    separate_projfile.get_logical_tiebreaker_dataset()
+    separate_projfile.get_enhanced_tiebreaker_dataset()
+    combined_projfile = proj_file.ProjFile("./tests/test_data/sample_file.py")
+    combined_projfile.get_tiebreaker_datasets(["cyclomatic", "logical", "enhanced"])
+    assert (
+        combined_projfile.cyclomatic_complexity_data
+        == separate_projfile.cyclomatic_complexity_data
+    )
+    assert (
+        combined_projfile.logical_tiebreak_data
+        == separate_projfile.logical_tiebreak_data
+    )
+    assert (
+        combined_projfile.enhanced_tiebreak_data
+        == separate_projfile.enhanced_tiebreak_data
+    )
+
+
+def test_get_tiebreaker_datasets_only_requested():
+    """Check that only the requested datasets are calculated."""
+    test_projfile = proj_file.ProjFile("./tests/test_data/sample_file.py")
+    test_projfile.get_tiebreaker_datasets(["logical", "random"])
+    assert test_projfile.logical_tiebreak_data
+    assert not test_projfile.cyclomatic_complexity_data
+    assert not test_projfile.enhanced_tiebreak_data
+
+
 # def test_projfile_as_dict():
 #     """Check that as_dict() return a correct dictionary."""
 #     file_name = "samplename.py"
@@ -0,0 +1,105 @@
+"""Include test cases on report_writer module."""
+
+import json
+import os
+import threading
+
+import pytest
+
+from afluent import report_writer
+
+
+def test_atomic_write_replaces_file(tmp_path):
+    """Check that the new content replaces the file without temporary files left."""
+    path = tmp_path / "afluent_report.json"
+    path.write_text("old", encoding="utf-8")
+    report_writer.write_json(str(path), {"ranking": []})
+    assert json.loads(path.read_text(encoding="utf-8")) == {"ranking": []}
+    assert [entry.name for entry in tmp_path.iterdir()] == ["afluent_report.json"]
+
+
+def test_atomic_write_keeps_previous_file_on_error(tmp_path):
+    """Check that an interrupted write leaves the previous file untouched."""
+    path = tmp_path / "afluent_report.csv"
+    path.write_text("old", encoding="utf-8")
+    with pytest.raises(RuntimeError):
+        with report_writer.atomic_write(str(path)) as outfile:
+            outfile.write("partial")
+            raise RuntimeError("interrupted")
+    assert path.read_text(encoding="utf-8") == "old"
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {},
+        {
+            "test_a": {"coverage": {"src/one.py": [1, 2]}, "result": "passed"},
+            "test_b": {"coverage": {}, "result": "failed"},
+        },
+    ],
+)
+def test_write_json_items_matches_json_dump(tmp_path, data):
+    """Check that a streamed object is written like json.dump writes it."""
+    path = tmp_path / "afluent_per_test_report.json"
+    report_writer.write_json_items(str(path), iter(data.items()))
+    assert path.read_text(encoding="utf-8") == json.dumps(data, indent=4)
+
+
+def test_report_writer_runs_in_background():
+    """Check that jobs run on other threads and are waited for."""
+    writer = report_writer.ReportWriter()
+    threads = []
+    writer.submit("json report", lambda: threads.append(threading.current_thread()))
+    assert writer.wait(5) == []
+    assert threads and threads[0] is not threading.main_thread()
+    assert "json report" in writer.seconds
+
+
+def test_report_writer_bounded_wait():
+    """Check that the wait returns the unfinished jobs once the timeout is reached."""
+    writer = report_writer.ReportWriter()
+    release = threading.Event()
+    writer.submit("eval report", release.wait)
+    assert writer.wait(0.05) == ["eval report"]
+    release.set()
+    assert writer.wait(5) == []
+
+
+def test_report_writer_raises_errors():
+    """Check that errors of background jobs are raised by the wait."""
+    writer = report_writer.ReportWriter()
+
+    def fail():
+        raise ValueError("disk full")
+
+    writer.submit("csv report", fail)
+    with pytest.raises(Exception, match="csv report: disk full"):
+        writer.wait(5)
+
+
+def test_report_writer_without_background():
+    """Check that jobs run right away when writing in the background is disabled."""
+    writer = report_writer.ReportWriter(background=False)
+    calls = []
+    writer.submit("json report", calls.append, 1)
+    assert calls == [1]
+    assert writer.wait(0) == []
+
+
+def test_discard_pending_removes_unfinished_writes(tmp_path):
+    """Check that the temporary file of a write still in progress is removed."""
+    path = tmp_path / "afluent_report.json"
+    path.write_text("old", encoding="utf-8")
+    with pytest.raises(FileNotFoundError):
+        with report_writer.atomic_write(str(path)) as outfile:
+            temp_path = outfile.name
+            assert temp_path in report_writer.PENDING_PATHS
+            report_writer.discard_pending()
+            assert not os.path.exists(temp_path)
+            # the job goes on writing the removed file, which can't replace the report
+            outfile.write("{}")
+    assert temp_path not in report_writer.PENDING_PATHS
+    assert [entry.name for entry in tmp_path.iterdir()] == ["afluent_report.json"]
+    assert path.read_text(encoding="utf-8") == "old"
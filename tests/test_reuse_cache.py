@@ -0,0 +1,106 @@
+"""Include test cases on reuse_cache module."""
+
+from afluent import reuse_cache
+
+
+def create_records(tmp_path):
+    """Create two source files and the test cases covering them."""
+    source = tmp_path / "test_sample.py"
+    source.write_text("def test_one():\n    pass\n", encoding="utf-8")
+    covered = tmp_path / "sample.py"
+    covered.write_text("x = 1\ny = 2\n", encoding="utf-8")
+    return {
+        "test_sample.py::test_one": {
+            "test": "test_sample.py_test_one",
+            "source": str(source),
+            "result": "passed",
+            "coverage": {str(covered): [1, 2]},
+        },
+        "test_sample.py::test_two": {
+            "test": "test_sample.py_test_two",
+            "source": str(source),
+            "result": "failed",
+            "coverage": {str(covered): [1]},
+        },
+    }
+
+
+def test_store_and_load_round_trip(tmp_path):
+    """Check that the stored test cases are loaded back keyed by node id."""
+    records = create_records(tmp_path)
+    cache = reuse_cache.ReuseCache(str(tmp_path / "cache"))
+    cache.store(records)
+    loaded = reuse_cache.ReuseCache(str(tmp_path / "cache")).load()
+    assert loaded.keys() == records.keys()
+    assert loaded["test_sample.py::test_one"]["coverage"] == (
+        records["test_sample.py::test_one"]["coverage"]
+    )
+
+
+def test_reusable_skips_failed_tests(tmp_path):
+    """Check that failing and last-failed test cases are never reused."""
+    records = create_records(tmp_path)
+    reuse_cache.ReuseCache(str(tmp_path / "cache")).store(records)
+    cache = reuse_cache.ReuseCache(str(tmp_path / "cache"))
+    assert list(cache.reusable(cache.load())) == ["test_sample.py::test_one"]
+    assert not cache.reusable(cache.load(), ["test_sample.py::test_one"])
+
+
+def test_reusable_detects_changed_files(tmp_path):
+    """Check that editing a covered file or a test file invalidates the test cases."""
+    records = create_records(tmp_path)
+    reuse_cache.ReuseCache(str(tmp_path / "cache")).store(records)
+    (tmp_path / "sample.py").write_text("x = 3\ny = 2\n", encoding="utf-8")
+    cache = reuse_cache.ReuseCache(str(tmp_path / "cache"))
+    assert not cache.reusable(cache.load())
+    reuse_cache.ReuseCache(str(tmp_path / "cache")).store(records)
+    (tmp_path / "test_sample.py").unlink()
+    cache = reuse_cache.ReuseCache(str(tmp_path / "cache"))
+    assert not cache.reusable(cache.load())
+
+
+def test_empty_cache_reuses_nothing(tmp_path):
+    """Check that a cache without stored test cases reuses nothing."""
+    cache = reuse_cache.ReuseCache(str(tmp_path / "cache"))
+    assert not cache.load()
+    assert not cache.reusable(create_records(tmp_path))
+
+
+def test_store_keeps_records_of_other_sessions(tmp_path):
+    """Check that storing a subset of the test cases keeps the other ones."""
+    records = create_records(tmp_path)
+    other = tmp_path / "other.py"
+    other.write_text("z = 1\n", encoding="utf-8")
+    other_records = {
+        "test_other.py::test_three": {
+            "test": "test_other.py_test_three",
+            "source": records["test_sample.py::test_one"]["source"],
+            "result": "passed",
+            "coverage": {str(other): [1]},
+        }
+    }
+    reuse_cache.ReuseCache(str(tmp_path / "cache")).store(records)
+    reuse_cache.ReuseCache(str(tmp_path / "cache")).store(other_records)
+    cache = reuse_cache.ReuseCache(str(tmp_path / "cache"))
+    assert set(cache.load()) == set(records) | set(other_records)
+    assert set(cache.reusable(cache.load())) == {
+        "test_sample.py::test_one",
+        "test_other.py::test_three",
+    }
+    # a kept test case still sees the change of a file it covers
+    (tmp_path / "sample.py").write_text("x = 3\ny = 2\n", encoding="utf-8")
+    reuse_cache.ReuseCache(str(tmp_path / "cache")).store(other_records)
+    cache = reuse_cache.ReuseCache(str(tmp_path / "cache"))
+    assert list(cache.reusable(cache.load())) == ["test_other.py::test_three"]
+
+
+def test_store_drops_kept_records_of_changed_files(tmp_path):
+    """Check that a kept test case covering a file stored again with a new hash is dropped."""
+    records = create_records(tmp_path)
+    reuse_cache.ReuseCache(str(tmp_path / "cache")).store(records)
+    (tmp_path / "sample.py").write_text("x = 3\ny = 2\n", encoding="utf-8")
+    reuse_cache.ReuseCache(str(tmp_path / "cache")).store(
+        {"test_sample.py::test_one": records["test_sample.py::test_one"]}
+    )
+    cache = reuse_cache.ReuseCache(str(tmp_path / "cache"))
+    assert list(cache.load()) == ["test_sample.py::test_one"]
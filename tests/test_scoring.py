@@ -0,0 +1,67 @@
+"""Test the scoring module and batch suspiciousness calculation."""
+
+import pytest
+
+from afluent import line, scoring
+
+
+def test_score_all_matches_line_formulas():
+    """Check that batch scores equal the scores of the static line formulas."""
+    failed_cover = [1, 1, 3, 6, 3, 0, 6]
+    passed_cover = [0, 3, 2, 0, 2, 4, 4]
+    total_passed, total_failed = 4, 6
+    scores = scoring.score_all(
+        failed_cover, passed_cover, total_passed, total_failed, power=2
+    )
+    for index, (failed, passed) in enumerate(zip(failed_cover, passed_cover)):
+        assert scores[line.TARAN][index] == line.Line.tarantula(
+            failed, passed, total_passed, total_failed
+        )
+        assert scores[line.OCHIAI][index] == line.Line.ochiai(
+            failed, passed, total_failed
+        )
+        assert scores[line.DSTAR][index] == line.Line.dstar(
+            failed, passed, total_failed, power=2
+        )
+        assert scores[line.OCHIAI2][index] == line.Line.ochiai2(
+            failed, passed, total_passed, total_failed
+        )
+    # no passed coverage and all failures covered
+    assert scores[line.DSTAR][3] == float("inf")
+
+
+@pytest.mark.parametrize(
+    "total_passed,total_failed",
+    [(0, 3), (3, 0), (0, 0)],
+)
+def test_score_all_edge_totals(total_passed, total_failed):
+    """Check that zero totals follow the same guards as the line formulas."""
+    scores = scoring.score_all([0, 3], [1, 0], total_passed, total_failed)
+    assert scores[line.TARAN] == [
+        line.Line.tarantula(0, 1, total_passed, total_failed),
+        line.Line.tarantula(3, 0, total_passed, total_failed),
+    ]
+    assert scores[line.OCHIAI2] == [
+        line.Line.ochiai2(0, 1, total_passed, total_failed),
+        line.Line.ochiai2(3, 0, total_passed, total_failed),
+    ]
+
+
+def test_score_all_length_mismatch():
+    """Check that an error is thrown when count sequences differ in length."""
+    with pytest.raises(Exception):
+        scoring.score_all([1, 2], [1], 3, 3)
+
+
+def test_score_lines():
+    """Check that scores are stored on every line object."""
+    test_line = line.Line("sample/path/to/file.py", 14)
+    test_line.passed_by = ["test1", "test2"]
+    test_line.failed_by = ["test3", "test4", "test5"]
+    scoring.score_lines([test_line], 4, 6)
+    assert test_line.sus_scores == {
+        "tarantula": 0.5,
+        "ochiai": 0.5477,
+        "dstar": 5.4,
+        "ochiai2": line.Line.ochiai2(3, 2, 4, 6),
+    }
@@ -0,0 +1,200 @@
+"""Include test cases on spectrum_io module."""
+import json
+
+import pytest
+
+from afluent import spectrum_io, spectrum_parser
+
+
+SESSION_SPECTRUM = {
+    "test_a": {
+        "coverage": {"src/one.py": [3, 1, 2], "src/two.py": [7]},
+        "result": "passed",
+    },
+    "test_b": {
+        "coverage": {"src/two.py": [8, 7]},
+        "result": "failed",
+    },
+}
+
+
+def test_pack_spectrum_stores_paths_once():
+    """Check that every file path is stored once in the packed spectrum."""
+    packed = spectrum_io.pack_spectrum(SESSION_SPECTRUM)
+    assert packed["files"] == ["src/one.py", "src/two.py"]
+    assert packed["tests"] == [
+        ["test_a", "passed", [[0, [1, 2, 3]], [1, [7]]]],
+        ["test_b", "failed", [[1, [7, 8]]]],
+    ]
+
+
+def test_unpack_spectrum_round_trip():
+    """Check that unpacking a packed spectrum returns the same coverage."""
+    unpacked = spectrum_io.unpack_spectrum(spectrum_io.pack_spectrum(SESSION_SPECTRUM))
+    assert unpacked.keys() == SESSION_SPECTRUM.keys()
+    for test_name, test_info in SESSION_SPECTRUM.items():
+        assert unpacked[test_name]["result"] == test_info["result"]
+        for file_name, lines in test_info["coverage"].items():
+            assert unpacked[test_name]["coverage"][file_name] == sorted(lines)
+
+
+def test_merge_spectrum_from_workers():
+    """Check that spectra of several workers are merged into one."""
+    merged = {}
+    for test_name, test_info in SESSION_SPECTRUM.items():
+        spectrum_io.merge_spectrum(
+            merged, spectrum_io.pack_spectrum({test_name: test_info})
+        )
+    assert set(merged) == {"test_a", "test_b"}
+    assert merged["test_b"]["coverage"] == {"src/two.py": [7, 8]}
+
+
+def test_spectrum_log_round_trip(tmp_path):
+    """Check that every appended test case is read back from the log."""
+    log_path = str(tmp_path / "spectrum.jsonl")
+    spectrum_io.reset_log(log_path)
+    spectrum_log = spectrum_io.SpectrumLog(log_path)
+    for test_name, test_info in SESSION_SPECTRUM.items():
+        spectrum_log.append(test_name, test_info)
+    spectrum_log.close()
+    loaded = spectrum_io.load_log(log_path)
+    assert loaded == spectrum_io.unpack_spectrum(
+        spectrum_io.pack_spectrum(SESSION_SPECTRUM)
+    )
+
+
+def test_read_log_ignores_partial_record(tmp_path):
+    """Check that a record cut by an interrupted session is ignored and repaired."""
+    log_path = str(tmp_path / "spectrum.jsonl")
+    spectrum_log = spectrum_io.SpectrumLog(log_path)
+    spectrum_log.append("test_a", SESSION_SPECTRUM["test_a"])
+    spectrum_log.close()
+    with open(log_path, "a", encoding="utf-8") as log_file:
+        log_file.write('{"test":"test_b","res')
+    assert list(spectrum_io.load_log(log_path)) == ["test_a"]
+    spectrum_io.repair_log(log_path)
+    spectrum_log = spectrum_io.SpectrumLog(log_path)
+    spectrum_log.append("test_b", SESSION_SPECTRUM["test_b"])
+    spectrum_log.close()
+    assert list(spectrum_io.load_log(log_path)) == ["test_a", "test_b"]
+
+
+def test_repair_log_without_complete_record(tmp_path):
+    """Check that a log holding only a partial record is emptied."""
+    log_path = tmp_path / "spectrum.jsonl"
+    log_path.write_text('{"test":"test_a"', encoding="utf-8")
+    spectrum_io.repair_log(str(log_path))
+    assert log_path.read_text(encoding="utf-8") == ""
+    spectrum_io.repair_log(str(tmp_path / "missing.jsonl"))
+
+
+def test_binary_spectrum_round_trip(tmp_path):
+    """Check that a binary spectrum loads the same lines, counts and scores."""
+    config = {
+        "test_empty": {"coverage": {}, "result": "passed"},
+        "test_fail": {
+            "coverage": {"tests/test_data/sample_file.py": [1, 2, 3, 4]},
+            "result": "failed",
+        },
+        "test_pass": {
+            "coverage": {"tests/test_data/sample_file.py": [1, 2, 9]},
+            "result": "passed",
+        },
+    }
+    original = spectrum_parser.Spectrum(config)
+    spectrum_path = str(tmp_path / "spectrum.afl")
+    spectrum_io.write_binary_spectrum(spectrum_path, original)
+    loaded = spectrum_io.read_binary_spectrum(spectrum_path, tiebreaker="logical")
+    assert loaded.totals == original.totals
+    assert loaded.reassembled_data.keys() == original.reassembled_data.keys()
+    for file_name, file_obj in original.reassembled_data.items():
+        loaded_file = loaded.reassembled_data[file_name]
+        assert loaded_file.lines.keys() == file_obj.lines.keys()
+        for line_number, line_obj in file_obj.lines.items():
+            loaded_line = loaded_file.lines[line_number]
+            assert loaded_line.failed_by == line_obj.failed_by
+            assert loaded_line.passed_by == line_obj.passed_by
+            assert loaded_line.sus_scores == line_obj.sus_scores
+            assert loaded_line.tiebreakers["logical"] == (
+                loaded_file.logical_tiebreak_data[line_number]
+            )
+
+
+def test_write_binary_spectrum_rejects_pruned_spectrum(tmp_path):
+    """Check that a spectrum missing its pruned lines isn't stored."""
+    config = {
+        "test_fail": {
+            "coverage": {"tests/test_data/sample_file.py": [1, 2]},
+            "result": "failed",
+        },
+        "test_pass": {
+            "coverage": {"tests/test_data/sample_file.py": [1, 9]},
+            "result": "passed",
+        },
+    }
+    pruned = spectrum_parser.Spectrum(config, prune=True)
+    with pytest.raises(Exception, match="pruned"):
+        spectrum_io.write_binary_spectrum(str(tmp_path / "spectrum.afl"), pruned)
+    assert not (tmp_path / "spectrum.afl").exists()
+
+
+def test_write_binary_spectrum_keeps_previous_file(tmp_path, monkeypatch):
+    """Check that an interrupted write leaves the previous spectrum readable."""
+    config = {
+        "test_fail": {
+            "coverage": {"tests/test_data/sample_file.py": [1, 2]},
+            "result": "failed",
+        }
+    }
+    spectrum_path = str(tmp_path / "spectrum.afl")
+    spectrum_io.write_binary_spectrum(spectrum_path, spectrum_parser.Spectrum(config))
+
+    def interrupt(payload):
+        raise KeyboardInterrupt(len(payload))
+
+    monkeypatch.setattr(spectrum_io.zlib, "compress", interrupt)
+    with pytest.raises(KeyboardInterrupt):
+        spectrum_io.write_binary_spectrum(
+            spectrum_path, spectrum_parser.Spectrum(config)
+        )
+    assert [entry.name for entry in tmp_path.iterdir()] == ["spectrum.afl"]
+    monkeypatch.undo()
+    loaded = spectrum_io.read_binary_spectrum(spectrum_path)
+    assert loaded.totals == {"passed": 0, "failed": 1, "skipped": 0}
+
+
+def test_read_binary_spectrum_throws_error(tmp_path):
+    """Check that an error is thrown when a file isn't a binary spectrum."""
+    spectrum_path = tmp_path / "spectrum.afl"
+    spectrum_path.write_bytes(b"not a spectrum file at all")
+    with pytest.raises(Exception):
+        spectrum_io.read_binary_spectrum(str(spectrum_path))
+
+
+@pytest.mark.parametrize("chunk_size", [3, 64, 1 << 16])
+def test_read_per_test_report_streams_tests(tmp_path, chunk_size):
+    """Check that a per-test report is read one test case at a time."""
+    report_path = tmp_path / "report.json"
+    report_path.write_text(json.dumps(SESSION_SPECTRUM, indent=4), encoding="utf-8")
+    streamed = spectrum_io.read_per_test_report(str(report_path), chunk_size)
+    assert dict(streamed) == SESSION_SPECTRUM
+    report_path.write_text("{}", encoding="utf-8")
+    assert not list(spectrum_io.read_per_test_report(str(report_path), chunk_size))
+
+
+@pytest.mark.parametrize("content", ["", "\n  \n"])
+def test_load_spectrum_of_empty_file(tmp_path, content):
+    """Check that an empty per-test report or log loads an empty spectrum."""
+    spectrum_path = tmp_path / "afluent_per_test_report.json"
+    spectrum_path.write_text(content, encoding="utf-8")
+    loaded = spectrum_io.load_spectrum(str(spectrum_path))
+    assert not loaded.reassembled_data
+    assert loaded.totals == {"passed": 0, "failed": 0, "skipped": 0}
+
+
+def test_read_per_test_report_throws_error(tmp_path):
+    """Check that an error is thrown when the report isn't a json object."""
+    report_path = tmp_path / "report.json"
+    report_path.write_text("[1, 2]", encoding="utf-8")
+    with pytest.raises(Exception):
+        list(spectrum_io.read_per_test_report(str(report_path)))
@@ -1,6 +1,8 @@
 """Include test cases on spectrum_parser module."""
+import csv
+import sqlite3
 import pytest
-from afluent import spectrum_parser
+from afluent import aggregator, spectrum_parser
 
 
 def test_spectrum_init(test_data):
@@ -110,6 +112,381 @@ def test_spectrum_init_cyclomatic_tiebreaker():
     ].enhanced_tiebreak_data
 
 
+def test_spectrum_tiebreakers_in_worker_processes():
+    """Check that tiebreakers calculated by worker processes match serial ones."""
+    config = {
+        "test1": {
+            "coverage": {
+                "tests/test_data/sample_file.py": [6, 7, 8],
+                "afluent/line.py": [1, 2, 3],
+            },
+            "result": "failed",
+        }
+    }
+    serial_spectrum = spectrum_parser.Spectrum(config, eval_mode=True)
+    parallel_spectrum = spectrum_parser.Spectrum(config, eval_mode=True, workers=2)
+    for file_name, serial_file in serial_spectrum.reassembled_data.items():
+        parallel_file = parallel_spectrum.reassembled_data[file_name]
+        assert parallel_file.logical_tiebreak_data == serial_file.logical_tiebreak_data
+        assert (
+            parallel_file.enhanced_tiebreak_data == serial_file.enhanced_tiebreak_data
+        )
+        assert (
+            parallel_file.cyclomatic_complexity_data
+            == serial_file.cyclomatic_complexity_data
+        )
+        for line_number, serial_line in serial_file.lines.items():
+            assert parallel_file.lines[line_number].tiebreakers == (
+                serial_line.tiebreakers
+            )
+
+
+def test_spectrum_lazy_tiebreakers_only_for_tied_files():
+    """Check that lazy tiebreakers are only calculated for files with ties."""
+    config = {
+        "test1": {
+            "coverage": {"tests/test_data/sample_file.py": [1, 2, 3, 4]},
+            "result": "failed",
+        },
+        "test2": {
+            "coverage": {
+                "tests/test_data/sample_file.py": [1, 2],
+                "tests/test_data/__init__.py": [5],
+            },
+            "result": "passed",
+        },
+    }
+    spectrum_object = spectrum_parser.Spectrum(
+        config, tiebreaker="logical", lazy_tiebreak=True
+    )
+    tied_file = spectrum_object.reassembled_data["tests/test_data/sample_file.py"]
+    other_file = spectrum_object.reassembled_data["tests/test_data/__init__.py"]
+    assert not tied_file.logical_tiebreak_data
+    spectrum_object.resolve_tiebreakers("dstar", max_items=-1)
+    assert tied_file.logical_tiebreak_data
+    assert not other_file.logical_tiebreak_data
+    for line_number in (1, 2, 3, 4):
+        assert (
+            tied_file.lines[line_number].tiebreakers["logical"]
+            == tied_file.logical_tiebreak_data[line_number]
+        )
+
+
+def test_spectrum_lazy_tiebreakers_skip_ties_after_cutoff():
+    """Check that ties ranked after the displayed items are not calculated."""
+    config = {
+        "test1": {
+            "coverage": {
+                "tests/test_data/sample_file.py": [1, 2],
+                "tests/test_data/__init__.py": [5],
+            },
+            "result": "failed",
+        },
+        "test2": {
+            "coverage": {"tests/test_data/sample_file.py": [1, 2]},
+            "result": "passed",
+        },
+    }
+    spectrum_object = spectrum_parser.Spectrum(
+        config, tiebreaker="logical", lazy_tiebreak=True
+    )
+    spectrum_object.resolve_tiebreakers("dstar", max_items=1)
+    for file_obj in spectrum_object.reassembled_data.values():
+        assert not file_obj.logical_tiebreak_data
+
+
+def test_spectrum_tiebreaker_cascade_ranking():
+    """Check that later tiebreakers only order the ties left by earlier ones."""
+    config = {
+        "test1": {
+            "coverage": {"tests/test_data/sample_file.py": [1, 2, 3, 4]},
+            "result": "failed",
+        }
+    }
+    spectrum_object = spectrum_parser.Spectrum(
+        config, tiebreaker=["logical", "enhanced"]
+    )
+    file_obj = spectrum_object.reassembled_data["tests/test_data/sample_file.py"]
+    lines = list(file_obj.lines.values())
+    ranked = spectrum_parser.Spectrum.generate_rankings(
+        list(lines), "dstar", tiebreaker=["logical", "enhanced"]
+    )
+    assert ranked == sorted(
+        lines,
+        key=lambda x: (x.tiebreakers["logical"], x.tiebreakers["enhanced"]),
+        reverse=True,
+    )
+
+
+def test_spectrum_select_top_matches_full_ranking():
+    """Check that top lines selection agrees with ranking every line."""
+    config = {
+        "test1": {
+            "coverage": {"tests/test_data/sample_file.py": [1, 2, 3, 4, 5, 6]},
+            "result": "failed",
+        },
+        "test2": {
+            "coverage": {"tests/test_data/sample_file.py": [1, 2, 3]},
+            "result": "passed",
+        },
+    }
+    spectrum_object = spectrum_parser.Spectrum(config, tiebreaker="logical")
+    lines = spectrum_object.collect_lines()
+    ranked = spectrum_parser.Spectrum.generate_rankings(
+        list(lines), "dstar", tiebreaker="logical"
+    )
+    for max_items in range(1, 8):
+        assert (
+            spectrum_parser.Spectrum.select_top(
+                list(lines), "dstar", max_items, tiebreaker="logical"
+            )
+            == ranked[:max_items]
+        )
+
+
+def test_spectrum_select_top_random_cutoff_group():
+    """Check that random selection keeps every line above the cutoff group."""
+    config = {
+        "test1": {
+            "coverage": {"tests/test_data/sample_file.py": [1, 2, 3, 4, 5, 6]},
+            "result": "failed",
+        },
+        "test2": {
+            "coverage": {"tests/test_data/sample_file.py": [1, 2, 3]},
+            "result": "passed",
+        },
+    }
+    spectrum_object = spectrum_parser.Spectrum(config)
+    lines = spectrum_object.collect_lines()
+    for _ in range(10):
+        selected = spectrum_parser.Spectrum.select_top(list(lines), "dstar", 4)
+        assert len(selected) == 4
+        assert {line_obj.number for line_obj in selected[:3]} == {4, 5, 6}
+        assert selected[3].number in (1, 2, 3)
+
+
+def test_spectrum_store_report_ranks_every_line(tmp_path, monkeypatch):
+    """Check that a report stored after a short ranking includes every line."""
+    config = {
+        "test1": {
+            "coverage": {"tests/test_data/sample_file.py": [1, 2, 3, 4]},
+            "result": "failed",
+        }
+    }
+    spectrum_object = spectrum_parser.Spectrum(config)
+    spectrum_object.generate_report(["ochiai"], max_items=2)
+    monkeypatch.chdir(tmp_path)
+    spectrum_object.store_report("csv")
+    with open("afluent_report.csv", encoding="utf-8") as infile:
+        assert len(infile.readlines()) == 5
+
+
+def test_spectrum_store_sqlite_report(tmp_path, monkeypatch):
+    """Check that the sqlite report stores the ranking of the last report."""
+    config = {
+        "test1": {
+            "coverage": {"tests/test_data/sample_file.py": [1, 2, 3, 4]},
+            "result": "failed",
+        }
+    }
+    spectrum_object = spectrum_parser.Spectrum(config)
+    spectrum_object.generate_report(["tarantula"], max_items=2)
+    monkeypatch.chdir(tmp_path)
+    spectrum_object.store_report("sqlite")
+    with sqlite3.connect("afluent_report.sqlite") as connection:
+        meta = dict(connection.execute("SELECT key, value FROM meta"))
+        ranks = connection.execute(
+            "SELECT rank FROM rankings WHERE method = 'tarantula'"
+        ).fetchall()
+    assert meta["method"] == "tarantula"
+    assert meta["failed_total"] == "1"
+    assert len(ranks) == 4
+
+
+PRUNE_CONFIG = {
+    "test1": {
+        "coverage": {"tests/test_data/sample_file.py": [1, 2, 3]},
+        "result": "failed",
+    },
+    "test2": {
+        "coverage": {
+            "tests/test_data/sample_file.py": [1, 4, 5],
+            "tests/test_data/other_file.py": [1, 2],
+        },
+        "result": "passed",
+    },
+}
+
+
+def scored_lines(spectrum_object):
+    """Return the scores of every line keyed by path and line number."""
+    return {
+        (line_obj.path, line_obj.number): line_obj.sus_scores
+        for line_obj in spectrum_object.collect_lines()
+    }
+
+
+def test_spectrum_prune_keeps_failure_cone():
+    """Check that only lines covered by a failing test case are created."""
+    full = scored_lines(spectrum_parser.Spectrum(PRUNE_CONFIG))
+    spectrum_object = spectrum_parser.Spectrum(PRUNE_CONFIG, prune=True)
+    pruned = scored_lines(spectrum_object)
+    assert sorted(number for _, number in pruned) == [1, 2, 3]
+    assert spectrum_object.pruned_lines == {
+        "tests/test_data/sample_file.py": 2,
+        "tests/test_data/other_file.py": 2,
+    }
+    assert list(spectrum_object.reassembled_data) == ["tests/test_data/sample_file.py"]
+    for location, scores in full.items():
+        if location in pruned:
+            assert pruned[location] == scores
+        else:
+            assert all(score == 0 for score in scores.values())
+
+
+def test_spectrum_prune_streamed_tests():
+    """Check that a stream of test cases is pruned once it's reassembled."""
+    spectrum_object = spectrum_parser.Spectrum.from_tests(
+        iter(PRUNE_CONFIG.items()), prune=True
+    )
+    expected = spectrum_parser.Spectrum(PRUNE_CONFIG, prune=True)
+    assert scored_lines(spectrum_object) == scored_lines(expected)
+    assert spectrum_object.pruned_lines == expected.pruned_lines
+
+
+def create_without_passed(source, config):
+    """Create a pruned spectrum from a config, a stream or aggregated rows."""
+    if source == "config":
+        return spectrum_parser.Spectrum(config, prune=True)
+    if source == "stream":
+        return spectrum_parser.Spectrum.from_tests(iter(config.items()), prune=True)
+    aggregator_object = aggregator.SpectrumAggregator()
+    for test_name, test_info in config.items():
+        aggregator_object.add(test_name, test_info)
+    aggregator_object.close()
+    return aggregator_object.spectrum(prune=True)
+
+
+@pytest.mark.parametrize("source", ["config", "stream", "rows"])
+def test_spectrum_prune_skipped_without_passed_tests(source, capsys):
+    """Check that every line is ranked when pruning would change the ranking."""
+    config = {
+        "test1": PRUNE_CONFIG["test1"],
+        "test2": dict(PRUNE_CONFIG["test2"], result="skipped"),
+    }
+    full = spectrum_parser.Spectrum(config)
+    spectrum_object = create_without_passed(source, config)
+    assert spectrum_object.prune_skipped
+    assert not spectrum_object.pruned_lines
+    assert scored_lines(spectrum_object) == scored_lines(full)
+    # lines outside of the failure cone score 1 with tarantula and ochiai2
+    other_file = spectrum_object.reassembled_data["tests/test_data/other_file.py"]
+    assert other_file.lines[1].sus_scores["tarantula"] == 1
+    spectrum_object.print_report(["tarantula"], 3)
+    assert "Pruning was skipped" in capsys.readouterr().out
+
+
+def test_spectrum_prune_ignored_in_eval_mode():
+    """Check that eval reports keep every line."""
+    config = {
+        test_name: {
+            "coverage": {
+                "tests/test_data/sample_file.py": test_info["coverage"][
+                    "tests/test_data/sample_file.py"
+                ]
+            },
+            "result": test_info["result"],
+        }
+        for test_name, test_info in PRUNE_CONFIG.items()
+    }
+    spectrum_object = spectrum_parser.Spectrum(config, eval_mode=True, prune=True)
+    assert len(spectrum_object.collect_lines()) == 5
+    assert not spectrum_object.pruned_lines
+
+
+def test_spectrum_eval_rankings_match_full_rankings():
+    """Check that eval rankings agree with ranking every combination separately."""
+    config = {
+        "test1": {
+            "coverage": {"tests/test_data/sample_file.py": [1, 2, 3, 4, 5, 6]},
+            "result": "failed",
+        },
+        "test2": {
+            "coverage": {"tests/test_data/sample_file.py": [1, 2, 3]},
+            "result": "passed",
+        },
+    }
+    spectrum_object = spectrum_parser.Spectrum(config, eval_mode=True)
+    rankings = spectrum_object.eval_rankings()
+    assert len(rankings) == 16
+    for (method, tiebreaker), ranked_lines in rankings.items():
+        expected = spectrum_parser.Spectrum.generate_rankings(
+            list(ranked_lines), method, tiebreaker=tiebreaker
+        )
+        assert [
+            (x.sus_scores[method], x.tiebreakers[tiebreaker]) for x in ranked_lines
+        ] == [(x.sus_scores[method], x.tiebreakers[tiebreaker]) for x in expected]
+
+
+def test_spectrum_store_combined_eval_report(tmp_path, monkeypatch):
+    """Check that the combined eval report has a rank column per combination."""
+    config = {
+        "test1": {
+            "coverage": {"tests/test_data/sample_file.py": [1, 2, 3, 4]},
+            "result": "failed",
+        }
+    }
+    spectrum_object = spectrum_parser.Spectrum(config, eval_mode=True)
+    monkeypatch.chdir(tmp_path)
+    spectrum_object.store_report("eval", combined_eval=True)
+    with open("afluent_eval_report.csv", encoding="utf-8") as infile:
+        rows = list(csv.reader(infile))
+    assert len(rows) == 5
+    assert len(rows[0]) == 2 + 4 + 4 + 16
+    for column in range(10, 26):
+        assert sorted(int(row[column]) for row in rows[1:]) == [1, 2, 3, 4]
+
+
+def test_spectrum_store_eval_reports(tmp_path, monkeypatch):
+    """Check that a csv file is stored for every eval combination."""
+    config = {
+        "test1": {
+            "coverage": {"tests/test_data/sample_file.py": [1, 2, 3, 4]},
+            "result": "failed",
+        }
+    }
+    spectrum_object = spectrum_parser.Spectrum(config, eval_mode=True)
+    monkeypatch.chdir(tmp_path)
+    spectrum_object.store_report("eval")
+    assert len(list(tmp_path.glob("*_report.csv"))) == 16
+
+
+def test_spectrum_split_ties():
+    """Check that only tied groups starting before the cutoff are kept."""
+    config = {
+        "test1": {
+            "coverage": {"tests/test_data/sample_file.py": [1, 2, 3, 4, 5]},
+            "result": "failed",
+        }
+    }
+    spectrum_object = spectrum_parser.Spectrum(config)
+    lines = spectrum_object.reassembled_data["tests/test_data/sample_file.py"].lines
+    values = {1: 3, 2: 3, 3: 2, 4: 1, 5: 1}
+    groups = spectrum_parser.Spectrum.split_ties(
+        list(lines.values()), lambda x: values[x.number], 0, 3
+    )
+    assert [(start, [x.number for x in group]) for start, group in groups] == [
+        (0, [1, 2])
+    ]
+    groups = spectrum_parser.Spectrum.split_ties(
+        list(lines.values()), lambda x: values[x.number], 0, 4
+    )
+    assert [(start, [x.number for x in group]) for start, group in groups] == [
+        (0, [1, 2]),
+        (3, [4, 5]),
+    ]
+
+
 def test_spectrum_print_report_throws_error():
     """Check that an error is thrown when an unknown report is requested."""
     config = {
@@ -146,3 +523,34 @@ def test_calculate_severity(method, sus_score, rank, out_of, formatting_func):
         spectrum_parser.Spectrum.calculate_severity(method, sus_score, rank, out_of)
         == formatting_func
     )
+
+
+def test_spectrum_timer_records_phases(tmp_path, monkeypatch):
+    """Check that every phase of the analysis and file analysis is timed."""
+    config = {
+        "test1": {
+            "coverage": {"tests/test_data/sample_file.py": [1, 2, 3, 4]},
+            "result": "failed",
+        },
+        "test2": {
+            "coverage": {"tests/test_data/sample_file.py": [1, 2]},
+            "result": "passed",
+        },
+    }
+    spectrum_object = spectrum_parser.Spectrum(config, tiebreaker="logical")
+    spectrum_object.print_report(["dstar"], 2)
+    monkeypatch.chdir(tmp_path)
+    spectrum_object.store_report("csv")
+    assert {
+        "reassemble",
+        "tiebreakers",
+        "calculate_sus",
+        "ranking",
+        "rendering",
+        "report",
+    } <= set(spectrum_object.timer.totals)
+    assert list(spectrum_object.analysis_times) == ["tests/test_data/sample_file.py"]
+    sizes = spectrum_object.memory_sizes()
+    assert sizes["matrix"]["tests"] == 2
+    assert sizes["lines"]["lines"] == 4
+    assert sizes["tiebreak_datasets"]["entries"] > 0
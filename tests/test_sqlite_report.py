@@ -0,0 +1,71 @@
+"""Include test cases on sqlite_report module."""
+import sqlite3
+
+from afluent import spectrum_parser, sqlite_report
+
+
+def create_spectrum():
+    """Create a spectrum where lines 4 to 6 are only covered by a failing test."""
+    covered_lines = [[1, 2, 3, 4, 5, 6], [1, 2, 3], [1]]
+    config = {
+        f"test{index}": {
+            "coverage": {"tests/test_data/sample_file.py": lines},
+            "result": "failed" if index == 1 else "passed",
+        }
+        for index, lines in enumerate(covered_lines, 1)
+    }
+    return spectrum_parser.Spectrum(config)
+
+
+def test_write_report_tables(tmp_path):
+    """Check that ranks, scores and the covering test cases can be queried."""
+    spectrum_object = create_spectrum()
+    ranked_lines = spectrum_object.rank_all_lines("ochiai")
+    path = str(tmp_path / "afluent_report.sqlite")
+    sqlite_report.write_report(
+        path, ranked_lines, spectrum_object.matrix, {"method": "ochiai"}
+    )
+    with sqlite3.connect(path) as connection:
+        ranking = connection.execute(
+            "SELECT files.path, lines.number, lines.ochiai FROM rankings "
+            + "JOIN lines ON lines.id = rankings.line_id "
+            + "JOIN files ON files.id = lines.file_id "
+            + "WHERE rankings.method = 'ochiai' AND files.path LIKE 'tests/%' "
+            + "ORDER BY rankings.rank"
+        ).fetchall()
+        covering = connection.execute(
+            "SELECT tests.name, tests.outcome FROM lines "
+            + "JOIN files ON files.id = lines.file_id "
+            + "JOIN coverage ON coverage.line_id = lines.id "
+            + "JOIN tests ON tests.id = coverage.test_id "
+            + "WHERE files.path = ? AND lines.number = ? ORDER BY tests.name",
+            ("tests/test_data/sample_file.py", 2),
+        ).fetchall()
+        plan = connection.execute(
+            "EXPLAIN QUERY PLAN SELECT line_id FROM coverage WHERE test_id = 0"
+        ).fetchall()
+    assert [(row[0], row[1]) for row in ranking] == [
+        (line_obj.path, line_obj.number) for line_obj in ranked_lines
+    ]
+    assert [row[2] for row in ranking] == sorted(
+        (row[2] for row in ranking), reverse=True
+    )
+    assert covering == [("test1", "failed"), ("test2", "passed")]
+    assert "coverage_test" in str(plan)
+
+
+def test_write_report_replaces_previous_report(tmp_path):
+    """Check that writing a report again replaces the previous database."""
+    spectrum_object = create_spectrum()
+    path = str(tmp_path / "afluent_report.sqlite")
+    for _ in range(2):
+        sqlite_report.write_report(
+            path,
+            spectrum_object.rank_all_lines(),
+            spectrum_object.matrix,
+            {"method": "dstar"},
+        )
+    with sqlite3.connect(path) as connection:
+        assert connection.execute("SELECT COUNT(*) FROM lines").fetchone() == (6,)
+        assert connection.execute("SELECT COUNT(*) FROM coverage").fetchone() == (10,)
+    assert [entry.name for entry in tmp_path.iterdir()] == ["afluent_report.sqlite"]
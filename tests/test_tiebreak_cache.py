@@ -0,0 +1,80 @@
+"""Test the tiebreak_cache module and TiebreakCache class."""
+
+import os
+
+from afluent import proj_file, tiebreak_cache, tiebreak_generator
+
+
+def test_content_hash(tmp_path):
+    """Check that the hash only depends on the file content."""
+    first_file = tmp_path / "first.py"
+    second_file = tmp_path / "second.py"
+    first_file.write_text("x = 1\n", encoding="utf-8")
+    second_file.write_text("x = 1\n", encoding="utf-8")
+    assert tiebreak_cache.content_hash(str(first_file)) == tiebreak_cache.content_hash(
+        str(second_file)
+    )
+    second_file.write_text("x = 2\n", encoding="utf-8")
+    assert tiebreak_cache.content_hash(str(first_file)) != tiebreak_cache.content_hash(
+        str(second_file)
+    )
+
+
+def test_put_and_get(tmp_path):
+    """Check that stored datasets are returned with integer line numbers."""
+    cache = tiebreak_cache.TiebreakCache(str(tmp_path / "cache"))
+    assert cache.get("abc", "logical") is None
+    cache.put("abc", "logical", {1: 0, 2: 3})
+    cache.put("abc", "enhanced", {1: 0.5, 2: 4.5})
+    assert cache.get("abc", "logical") == {1: 0, 2: 3}
+    assert cache.get("abc", "enhanced") == {1: 0.5, 2: 4.5}
+    assert cache.get("abd", "logical") is None
+
+
+def test_version_changes_key(tmp_path, monkeypatch):
+    """Check that datasets of another analyzer version aren't used."""
+    cache = tiebreak_cache.TiebreakCache(str(tmp_path))
+    cache.put("abc", "logical", {1: 3})
+    monkeypatch.setattr(tiebreak_generator, "ANALYZER_VERSION", "other")
+    assert cache.get("abc", "logical") is None
+
+
+def test_get_corrupt_entry(tmp_path):
+    """Check that an unreadable entry is treated as missing."""
+    cache = tiebreak_cache.TiebreakCache(str(tmp_path))
+    with open(cache.entry_path("abc", "logical"), "w", encoding="utf-8") as outfile:
+        outfile.write("{not json")
+    assert cache.get("abc", "logical") is None
+
+
+def test_evict_least_recently_used(tmp_path):
+    """Check that the oldest entries are removed first when over the limit."""
+    cache = tiebreak_cache.TiebreakCache(str(tmp_path), max_size=0)
+    cache.put("old", "logical", {1: 3})
+    cache.put("new", "logical", {1: 3})
+    entry_size = os.path.getsize(cache.entry_path("old", "logical"))
+    os.utime(cache.entry_path("old", "logical"), (1, 1))
+    cache.max_size = entry_size
+    cache.evict()
+    assert cache.get("old", "logical") is None
+    assert cache.get("new", "logical") == {1: 3}
+
+
+def test_projfile_uses_cache(tmp_path, monkeypatch):
+    """Check that cached datasets skip the analysis of unchanged files."""
+    cache = tiebreak_cache.TiebreakCache(str(tmp_path))
+    first_projfile = proj_file.ProjFile("./tests/test_data/sample_file.py")
+    first_projfile.get_tiebreaker_datasets(["logical", "enhanced"], cache)
+
+    def fail_analysis(self, tiebreakers):
+        raise AssertionError("file should not be analyzed again")
+
+    monkeypatch.setattr(
+        tiebreak_generator.CombinedTieBreaker, "calculate_all", fail_analysis
+    )
+    second_projfile = proj_file.ProjFile("./tests/test_data/sample_file.py")
+    second_projfile.get_tiebreaker_datasets(["logical", "enhanced"], cache)
+    assert second_projfile.logical_tiebreak_data == first_projfile.logical_tiebreak_data
+    assert (
+        second_projfile.enhanced_tiebreak_data == first_projfile.enhanced_tiebreak_data
+    )
@@ -0,0 +1,55 @@
+"""Test the tiebreak_generator module and mutant counting."""
+
+import libcst as cst
+from libcst import matchers
+import pytest
+
+from afluent import tiebreak_generator
+
+
+def count_with_findall(node, mutant_set):
+    """Count mutants by searching the subtree once for every matcher."""
+    total = 0
+    for mutant in mutant_set:
+        total += len(matchers.findall(node, mutant()))
+    return total
+
+
+@pytest.mark.parametrize(
+    "mutant_set",
+    [tiebreak_generator.MUTANTS, tiebreak_generator.ENHANCED_MUTANTS],
+)
+def test_mutant_counter_matches_findall(mutant_set):
+    """Check that bottom-up counts equal the counts found by the matchers."""
+    with open("./tests/test_data/sample_file.py", "r", encoding="utf-8") as infile:
+        module_obj = cst.parse_module(infile.read())
+    counter = tiebreak_generator.MutantCounter()
+    # count the whole module first so nested nodes reuse the stored totals
+    assert counter.count(module_obj, mutant_set) == count_with_findall(
+        module_obj, mutant_set
+    )
+    statements = matchers.findall(module_obj, matchers.SimpleStatementLine())
+    assert statements
+    for statement in statements:
+        assert counter.count(statement, mutant_set) == count_with_findall(
+            statement, mutant_set
+        )
+
+
+def test_mutant_counter_nested_first():
+    """Check that counting an inner node first doesn't change outer totals."""
+    module_obj = cst.parse_module("if a + b > c:\n    x = [1, 2 * y]\n")
+    counter = tiebreak_generator.MutantCounter()
+    if_node = module_obj.body[0]
+    assert counter.count(if_node.test, tiebreak_generator.MUTANTS) == 2
+    assert counter.count(if_node, tiebreak_generator.MUTANTS) == 3
+    assert counter.count(
+        if_node, tiebreak_generator.ENHANCED_MUTANTS
+    ) == count_with_findall(if_node, tiebreak_generator.ENHANCED_MUTANTS)
+
+
+def test_mutant_counter_other_set():
+    """Check that sets other than the known ones are still counted."""
+    module_obj = cst.parse_module("x = a + b - c\n")
+    counter = tiebreak_generator.MutantCounter()
+    assert counter.count(module_obj, [matchers.Add]) == 1
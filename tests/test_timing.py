@@ -0,0 +1,88 @@
+"""Include test cases on timing module."""
+import sys
+import threading
+import time
+import tracemalloc
+
+from afluent import timing
+
+
+def test_phase_timer_adds_up_repeated_phases():
+    """Check that the time of a repeated phase is added up."""
+    timer = timing.PhaseTimer()
+    for _ in range(2):
+        with timer.phase("ranking"):
+            time.sleep(0.01)
+    assert timer.totals["ranking"] >= 0.02
+
+
+def test_phase_timer_excludes_nested_phases():
+    """Check that the time of a nested phase isn't counted in its parent."""
+    timer = timing.PhaseTimer()
+    with timer.phase("rendering"):
+        with timer.phase("ranking"):
+            time.sleep(0.05)
+    assert timer.totals["ranking"] >= 0.05
+    assert timer.totals["rendering"] < 0.05
+    assert not timer.nested
+
+
+def test_phase_timer_merge():
+    """Check that the phases of another timer are added to the existing ones."""
+    timer = timing.PhaseTimer()
+    timer.add("start", 1.0)
+    timer.merge({"start": 0.5, "stop": 0.25})
+    assert timer.as_dict() == {"start": 1.5, "stop": 0.25}
+
+
+def test_phase_timer_records_memory():
+    """Check that the peak memory of a nested phase is part of its parent."""
+    timer = timing.PhaseTimer(trace_memory=True)
+    tracemalloc.start()
+    try:
+        with timer.phase("ranking"):
+            with timer.phase("tiebreakers"):
+                data = bytearray(1 << 20)
+                del data
+    finally:
+        tracemalloc.stop()
+    assert timer.memory["tiebreakers"]["peak_bytes"] >= 1 << 20
+    assert (
+        timer.memory["ranking"]["peak_bytes"]
+        >= timer.memory["tiebreakers"]["peak_bytes"]
+    )
+    assert timer.memory["ranking"]["objects"] > 0
+
+
+def test_phase_timer_without_tracing():
+    """Check that no memory is recorded when tracemalloc isn't tracing."""
+    timer = timing.PhaseTimer(trace_memory=True)
+    with timer.phase("ranking"):
+        pass
+    timer.mark("tests")
+    assert not timer.memory
+
+
+def test_deep_size_counts_shared_objects_once():
+    """Check that the size of contained objects is included once."""
+    shared = list(range(1000))
+    seen = set()
+    single_size = timing.deep_size(shared, seen)
+    assert single_size > sys.getsizeof(shared)
+    assert timing.deep_size({"a": shared, "b": shared}, seen) < single_size
+
+
+def test_phase_timer_nests_phases_per_thread():
+    """Check that a phase on another thread isn't nested in the running phase."""
+    timer = timing.PhaseTimer()
+
+    def write_report():
+        with timer.phase("report"):
+            time.sleep(0.05)
+
+    with timer.phase("rendering"):
+        thread = threading.Thread(target=write_report)
+        thread.start()
+        thread.join()
+    assert timer.totals["report"] >= 0.05
+    assert timer.totals["rendering"] >= 0.05